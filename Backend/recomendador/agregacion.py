@@ -0,0 +1,522 @@
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import argparse
+import numpy as np
+
+'''Agregación en el servidor de histogramas, rejillas 2D y densidades para los gráficos recomendados'''
+
+# Cuando la recomendación es un histograma o un gráfico de densidad (Density plot, Violin
+# plot, Ridge line, 2D Density plot) y el dataset es Big, el front (dataLoader.js,
+# miscomponentesd3.js) no debería descargar y filtrar el CSV entero para acabar dibujando
+# unas decenas de barras o unas curvas. Aquí se calculan en Python y se devuelve un JSON
+# compacto:
+#   - histograma (Histograma, Histogram; una columna): bordes y cuentas;
+#   - rejilla (2D Density plot; dos columnas): bordes de cada eje y cuentas por celda en
+#     orden x + nx * y, el que espera d3.contours().size([nx, ny]);
+#   - densidad (Density plot, Violin plot, Ridge line; columna numérica y opcionalmente
+#     la categórica de los grupos): una curva de KDE de tamaño fijo por grupo, calculada
+#     por bins y FFT en densidad.py.
+# Para histogramas y rejillas el fichero se recorre por bloques dos veces: la primera
+# acumula por columna filas, mínimo, máximo, media y varianza (fusionando bloques) y una
+# muestra uniforme de tamaño fijo para el rango intercuartílico; con eso se eligen los
+# bins con la regla pedida (las fórmulas de np.histogram_bin_edges, aproximadas y con
+# un máximo de bins, o 'd3', bordes redondos como los ticks de d3) y la segunda cuenta cada bloque con np.bincount. El resultado ocupa
+# según el número de bins, que tiene un máximo, y no según las filas.
+# Las filas con un valor vacío o no numérico en alguna de las columnas no cuentan (en la
+# rejilla se descartan las dos coordenadas). Los resultados se guardan en CACHE_DIR con
+# clave (sha256 del fichero, gráfico, columnas y opciones); el sha256 se recuerda por
+# ruta, tamaño y fecha de modificación para no volver a leer el fichero en cada acierto.
+#
+#   python agregacion.py datos.csv --grafico Histograma --columnas edad
+#   python agregacion.py datos.parquet --grafico "2D Density plot" --columnas jan death --regla sqrt
+#   python agregacion.py datos.csv --grafico "Ridge line" --columnas inmigrations country_birth_region
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "cache_agregacion")
+
+# Directorio de los datasets que sirve el front (./datasets de questionaire-app/public)
+DATASETS_DIR = os.environ.get("DATASETS_DIR", os.path.join(BASE_DIR, "..", "..", "questionaire-app", "public",
+                                                           "datasets"))
+
+# Versión del formato del JSON guardado en la caché
+VERSION = 1
+
+FILAS_BLOQUE = 200000
+
+# Tamaño de la muestra para el rango intercuartílico (regla fd)
+MUESTRA_CUANTILES = 20000
+
+# Máximo de bins por eje
+BINS_MAXIMO = 512
+BINS_MAXIMO_2D = 128
+
+# Gráficos que se agregan y número de columnas de cada tipo de agregado
+GRAFICOS_HISTOGRAMA = ("Histograma", "Histogram")
+GRAFICOS_REJILLA = ("2D Density plot",)
+GRAFICOS_DENSIDAD = ("Density plot", "Violin plot", "Ridge line")
+GRAFICOS = GRAFICOS_HISTOGRAMA + GRAFICOS_REJILLA + GRAFICOS_DENSIDAD
+COLUMNAS_TIPO = {"histograma": (1,), "rejilla": (2,), "densidad": (1, 2)}
+
+REGLAS = ("auto", "fd", "scott", "sturges", "sqrt", "d3")
+
+# Bins que se piden a los ticks de d3 (como x.ticks(30) en renderHistogram)
+TICKS_D3 = 30
+
+
+def tipo_agregacion(grafico):
+    """
+    'histograma', 'rejilla', 'densidad' o None si el gráfico no se agrega.
+    """
+    if grafico in GRAFICOS_HISTOGRAMA:
+        return "histograma"
+    if grafico in GRAFICOS_REJILLA:
+        return "rejilla"
+    if grafico in GRAFICOS_DENSIDAD:
+        return "densidad"
+    return None
+
+
+def necesita_agregacion(grafico, dataset_size):
+    return dataset_size == "Big" and tipo_agregacion(grafico) is not None
+
+
+'''Lectura por bloques'''
+
+def _numeros(serie):
+    """
+    Columna de un bloque como float64; vacíos y valores no numéricos a NaN.
+    """
+    import pandas as pd
+    if not pd.api.types.is_numeric_dtype(serie.dtype) or pd.api.types.is_bool_dtype(serie.dtype):
+        from perfilado import _normalizar_numeros
+        serie = pd.to_numeric(_normalizar_numeros(serie.astype(str)), errors='coerce')
+    return serie.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _numeros_arrow(pa, columna):
+    if not (pa.types.is_integer(columna.type) or pa.types.is_floating(columna.type)
+            or pa.types.is_decimal(columna.type)):
+        raise ValueError(f"La columna es de tipo {columna.type}, no numérica")
+    return columna.cast(pa.float64()).to_numpy(zero_copy_only=False)
+
+
+def _categorias(serie):
+    """
+    Columna de texto de un bloque como (códigos, valores); los vacíos son ''.
+    """
+    import pandas as pd
+    codigos, valores = pd.factorize(serie.fillna(""))
+    return codigos.astype(np.int64), [str(v) for v in valores]
+
+
+def _categorias_arrow(pa, columna):
+    import pyarrow.compute as pc
+    columna = pc.fill_null(columna.cast(pa.string()), "").dictionary_encode()
+    return columna.indices.to_numpy(zero_copy_only=False).astype(np.int64), columna.dictionary.to_pylist()
+
+
+def leer_columnas(path, columnas, filas_bloque=FILAS_BLOQUE, sep=None, categoricas=()):
+    """
+    Bloques del fichero (CSV, Parquet o Arrow según la extensión) como listas de arrays
+    float64, una por columna. Las columnas de categoricas llegan como (códigos del
+    bloque, valores de cada código).
+    """
+    from perfilado import EXTENSIONES_PARQUET, EXTENSIONES_ARROW, _pyarrow, detectar_separador
+    extension = os.path.splitext(path)[1].lower()
+    if extension in EXTENSIONES_PARQUET or extension in EXTENSIONES_ARROW:
+        pa = _pyarrow()
+        if extension in EXTENSIONES_PARQUET:
+            import pyarrow.parquet as pq
+            fichero = pq.ParquetFile(path, memory_map=True)
+            nombres = fichero.schema_arrow.names
+            lotes = fichero.iter_batches(filas_bloque, columns=columnas)
+        else:
+            import pyarrow.ipc
+            lector = pyarrow.ipc.open_file(pa.memory_map(path))
+            nombres = lector.schema.names
+            lotes = (lector.get_batch(i).select(columnas) for i in range(lector.num_record_batches))
+        faltan = [col for col in columnas if col not in nombres]
+        if faltan:
+            raise ValueError(f"Columnas que no están en el fichero: {', '.join(faltan)}")
+        for lote in lotes:
+            yield [(_categorias_arrow if col in categoricas else _numeros_arrow)(pa, lote.column(col))
+                   for col in columnas]
+        return
+    import pandas as pd
+    encoding = "utf-8-sig"
+    for bloque in pd.read_csv(path, sep=sep or detectar_separador(path, encoding), usecols=columnas,
+                              dtype={col: str for col in categoricas}, chunksize=filas_bloque, encoding=encoding):
+        yield [_categorias(bloque[col]) if col in categoricas else _numeros(bloque[col]) for col in columnas]
+
+
+def _validas(bloque):
+    """
+    Arrays del bloque sin las filas con algún NaN (o infinito) y número de filas descartadas.
+    """
+    validas = np.isfinite(bloque[0])
+    for valores in bloque[1:]:
+        validas &= np.isfinite(valores)
+    if validas.all():
+        return bloque, 0
+    return [valores[validas] for valores in bloque], int((~validas).sum())
+
+
+'''Primera pasada: estadísticas por columna'''
+
+class Momentos:
+    """
+    Filas, mínimo, máximo, media y suma de cuadrados de las desviaciones acumulados por
+    bloques (fusión de Chan), más una muestra uniforme de tamaño fijo: se quedan los
+    valores con las claves aleatorias más pequeñas.
+    """
+
+    def __init__(self, rng, tamano_muestra=MUESTRA_CUANTILES):
+        self.n = 0
+        self.minimo, self.maximo = np.inf, -np.inf
+        self.media = self.m2 = 0.0
+        self.rng = rng
+        self.tamano_muestra = tamano_muestra
+        self.muestra = np.empty(0)
+        self.claves = np.empty(0)
+
+    def actualizar(self, valores):
+        n = len(valores)
+        if not n:
+            return
+        media = float(valores.mean())
+        m2 = float(((valores - media) ** 2).sum())
+        total = self.n + n
+        delta = media - self.media
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.media += delta * n / total
+        self.n = total
+        self.minimo = min(self.minimo, float(valores.min()))
+        self.maximo = max(self.maximo, float(valores.max()))
+
+        muestra = np.concatenate([self.muestra, valores])
+        claves = np.concatenate([self.claves, self.rng.random(n)])
+        if len(muestra) > self.tamano_muestra:
+            quedan = np.argpartition(claves, self.tamano_muestra)[:self.tamano_muestra]
+            muestra, claves = muestra[quedan], claves[quedan]
+        self.muestra, self.claves = muestra, claves
+
+    @property
+    def desviacion(self):
+        return math.sqrt(self.m2 / self.n) if self.n else 0.0
+
+    @property
+    def iqr(self):
+        if not len(self.muestra):
+            return 0.0
+        q1, q3 = np.percentile(self.muestra, [25, 75])
+        return float(q3 - q1)
+
+    def resumen(self):
+        return {"min": self.minimo, "max": self.maximo, "media": self.media, "desviacion": self.desviacion}
+
+
+'''Bins'''
+
+def _paso_d3(inicio, fin, n):
+    """
+    (factor, potencia) del paso de d3.ticks: factor * 10^potencia con factor 1, 2, 5 o 10.
+    """
+    paso = (fin - inicio) / n
+    potencia = math.floor(math.log10(paso))
+    error = paso / 10 ** potencia
+    factor = 10 if error >= math.sqrt(50) else 5 if error >= math.sqrt(10) else 2 if error >= math.sqrt(2) else 1
+    return factor, potencia
+
+
+def _bordes_d3(minimo, maximo, n=TICKS_D3):
+    factor, potencia = _paso_d3(minimo, maximo, n)
+    # Con potencia negativa se divide en vez de multiplicar para que 0.1 * 3 sea 0.3
+    escala = (lambda k: k * factor * 10 ** potencia) if potencia >= 0 else (lambda k: k * factor / 10 ** -potencia)
+    paso = factor * 10.0 ** potencia
+    primero, ultimo = math.floor(minimo / paso), math.ceil(maximo / paso)
+    if ultimo == primero:
+        ultimo += 1
+    return np.array([escala(k) for k in range(primero, ultimo + 1)], dtype=np.float64)
+
+
+def numero_bins(momentos, regla):
+    """
+    Bins de [min, max] con la regla, con las fórmulas de np.histogram_bin_edges: 'auto'
+    es el mínimo ancho entre fd y sturges (fd cae a sturges si el rango intercuartílico
+    es 0). Es una aproximación: fd y 'auto' usan el rango intercuartílico de la muestra
+    de Momentos (MUESTRA_CUANTILES valores) y no el de todas las filas, así que puede
+    salir algún bin de más o de menos que con NumPy. Además bordes limita el resultado a
+    maximo_bins, que 'sqrt' pasa enseguida (512 en vez de 548 con 300.000 filas).
+    """
+    n, rango = momentos.n, momentos.maximo - momentos.minimo
+    if rango <= 0:
+        return 1
+    sturges = math.ceil(math.log2(n)) + 1
+    if regla == "sturges":
+        return sturges
+    if regla == "sqrt":
+        return math.ceil(math.sqrt(n))
+    if regla == "scott":
+        ancho = (24 * math.sqrt(math.pi) / n) ** (1 / 3) * momentos.desviacion
+    elif regla in ("fd", "auto"):
+        ancho = 2 * momentos.iqr * n ** (-1 / 3)
+        if regla == "auto":
+            ancho = min(ancho, rango / sturges) if ancho > 0 else rango / sturges
+    else:
+        raise ValueError(f"Regla de bins desconocida: {regla!r} (se admiten {', '.join(REGLAS)} o un número)")
+    return math.ceil(rango / ancho) if ancho > 0 else 1
+
+
+def bordes(momentos, regla="auto", maximo_bins=BINS_MAXIMO):
+    """
+    Bordes equiespaciados de los bins. regla es una de REGLAS o un número de bins; el
+    número de bins se limita a maximo_bins.
+    """
+    minimo, maximo = momentos.minimo, momentos.maximo
+    if maximo <= minimo:
+        # Como np.histogram: un solo valor va en un bin de ancho 1 centrado en él
+        return np.array([minimo - 0.5, maximo + 0.5])
+    if regla == "d3":
+        resultado = _bordes_d3(minimo, maximo)
+        if len(resultado) - 1 <= maximo_bins:
+            return resultado
+        regla = maximo_bins
+    bins = int(regla) if isinstance(regla, (int, np.integer)) else numero_bins(momentos, regla)
+    if bins < 1:
+        raise ValueError(f"El número de bins tiene que ser positivo: {bins}")
+    return np.linspace(minimo, maximo, min(bins, maximo_bins) + 1)
+
+
+def indices_bins(valores, bordes):
+    """
+    Bin de cada valor con bordes equiespaciados; el último bin incluye su borde derecho
+    (como np.histogram). Los valores fuera de los bordes dan -1.
+    """
+    bins = len(bordes) - 1
+    inicio, fin = bordes[0], bordes[-1]
+    indices = ((valores - inicio) * (bins / (fin - inicio))).astype(np.intp)
+    np.clip(indices, 0, bins - 1, out=indices)
+    # El redondeo de la multiplicación puede dejar un valor en el bin de al lado
+    indices -= valores < bordes[indices]
+    indices += (valores >= bordes[indices + 1]) & (indices < bins - 1)
+    indices[(valores < inicio) | (valores > fin)] = -1
+    return indices
+
+
+'''Agregación'''
+
+def _agregar(bloques_fichero, columnas, regla, maximo_bins, semilla=0):
+    """
+    Dos pasadas sobre bloques_fichero() (una función que devuelve el generador de
+    bloques): momentos por columna y cuentas por bin (o celda).
+    """
+    rng = np.random.default_rng(semilla)
+    momentos = [Momentos(rng) for _ in columnas]
+    filas = descartadas = 0
+    for bloque in bloques_fichero():
+        filas += len(bloque[0])
+        bloque, sin_valor = _validas(bloque)
+        descartadas += sin_valor
+        for m, valores in zip(momentos, bloque):
+            m.actualizar(valores)
+    if not momentos[0].n:
+        raise ValueError(f"Ninguna fila tiene valores numéricos en {', '.join(columnas)}")
+
+    ejes = [bordes(m, regla, maximo_bins) for m in momentos]
+    formas = [len(e) - 1 for e in ejes]
+    cuentas = np.zeros(int(np.prod(formas)), dtype=np.int64)
+    for bloque in bloques_fichero():
+        bloque, _ = _validas(bloque)
+        celda, paso = 0, 1
+        for valores, eje, n in zip(bloque, ejes, formas):
+            celda = celda + indices_bins(valores, eje) * paso
+            paso *= n
+        cuentas += np.bincount(celda, minlength=len(cuentas))
+    return filas, descartadas, momentos, ejes, cuentas
+
+
+def agregar(path, grafico, columnas, regla=None, filas_bloque=FILAS_BLOQUE, sep=None, cache_dir=CACHE_DIR,
+            nucleo=None, trabajadores=None):
+    """
+    Agregado (dict para JSON) del gráfico sobre las columnas del fichero. regla es la de
+    los bins ('auto' por defecto) o, para las densidades, la del ancho de banda; nucleo
+    y trabajadores solo cuentan para las densidades. Con cache_dir se busca antes en la
+    caché y se guarda allí; cache_dir=None no la usa.
+    """
+    tipo = tipo_agregacion(grafico)
+    if tipo is None:
+        raise ValueError(f"El gráfico {grafico!r} no se agrega en el servidor (solo {', '.join(GRAFICOS)})")
+    columnas = list(columnas)
+    if len(columnas) not in COLUMNAS_TIPO[tipo]:
+        numero = " o ".join(map(str, COLUMNAS_TIPO[tipo]))
+        raise ValueError(f"{grafico} necesita {numero} columna(s) y llegaron {len(columnas)}")
+    if tipo == "densidad":
+        import densidad
+        regla = densidad.REGLA_ANCHO if regla is None else regla
+        nucleo = nucleo or densidad.NUCLEO
+        opciones = [regla, nucleo]
+    else:
+        regla = "auto" if regla is None else regla
+        if not (regla in REGLAS or isinstance(regla, (int, np.integer))):
+            raise ValueError(f"Regla de bins desconocida: {regla!r} (se admiten {', '.join(REGLAS)} o un número)")
+        opciones = [regla]
+
+    clave = None
+    if cache_dir is not None:
+        clave = clave_cache(huella(path, cache_dir), grafico, columnas, *opciones)
+        guardado = leer_cache(cache_dir, clave)
+        if guardado is not None:
+            return guardado
+
+    if tipo == "densidad":
+        agregado = _agregar_densidad(path, grafico, columnas, regla, nucleo, trabajadores, filas_bloque, sep)
+        if clave is not None:
+            guardar_cache(cache_dir, clave, agregado)
+        return agregado
+
+    maximo_bins = BINS_MAXIMO if tipo == "histograma" else BINS_MAXIMO_2D
+    try:
+        filas, descartadas, momentos, ejes, cuentas = _agregar(
+            lambda: leer_columnas(path, columnas, filas_bloque, sep), columnas, regla, maximo_bins)
+    except ValueError as e:
+        # Columnas que no existen (pandas) o no numéricas (Arrow): el error dice cuál
+        raise ValueError(f"No se puede agregar {', '.join(columnas)} de {os.path.basename(path)}: {e}") from e
+    agregado = {"version": VERSION, "grafico": grafico, "tipo": tipo, "columnas": columnas,
+                "regla": regla, "filas": filas, "descartadas": descartadas,
+                "estadisticas": {col: m.resumen() for col, m in zip(columnas, momentos)}}
+    if tipo == "histograma":
+        agregado.update(bordes=ejes[0].tolist(), cuentas=cuentas.tolist())
+    else:
+        agregado.update(forma=[len(e) - 1 for e in ejes], bordes_x=ejes[0].tolist(), bordes_y=ejes[1].tolist(),
+                        cuentas=cuentas.tolist())
+    if clave is not None:
+        guardar_cache(cache_dir, clave, agregado)
+    return agregado
+
+
+def _agregar_densidad(path, grafico, columnas, regla, nucleo, trabajadores, filas_bloque, sep):
+    from densidad import densidades
+    try:
+        filas, descartadas, eje, grupos = densidades(path, columnas[0], columnas[1] if len(columnas) > 1 else None,
+                                                     regla, nucleo, trabajadores=trabajadores,
+                                                     filas_bloque=filas_bloque, sep=sep)
+    except ValueError as e:
+        raise ValueError(f"No se puede agregar {', '.join(columnas)} de {os.path.basename(path)}: {e}") from e
+    return {"version": VERSION, "grafico": grafico, "tipo": "densidad", "columnas": columnas, "regla": regla,
+            "nucleo": nucleo, "filas": filas, "descartadas": descartadas, "x": eje.tolist(), "grupos": grupos}
+
+
+'''Caché en disco'''
+
+def _escribir_json(path, datos):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def huella(path, cache_dir=CACHE_DIR):
+    """
+    sha256 del fichero (la de cache_dataset), recordado en cache_dir/huellas.json por ruta
+    absoluta mientras no cambien su tamaño ni su fecha de modificación.
+    """
+    from cache_dataset import huella_fichero
+    estado = os.stat(path)
+    firma = [estado.st_size, estado.st_mtime_ns]
+    ruta = os.path.abspath(path)
+    indice = os.path.join(cache_dir, "huellas.json")
+    try:
+        with open(indice, encoding="utf-8") as f:
+            huellas = json.load(f)
+    except (OSError, ValueError):
+        huellas = {}
+    if huellas.get(ruta, [None])[:2] == firma:
+        return huellas[ruta][2]
+    resultado = huella_fichero(path)
+    huellas[ruta] = firma + [resultado]
+    os.makedirs(cache_dir, exist_ok=True)
+    _escribir_json(indice, huellas)
+    return resultado
+
+
+def clave_cache(huella_dataset, grafico, columnas, *opciones):
+    texto = json.dumps([VERSION, huella_dataset, grafico, list(columnas), *opciones], ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def leer_cache(cache_dir, clave):
+    try:
+        with open(os.path.join(cache_dir, f"{clave}.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Agregado en caché {clave} ilegible, se recalcula: {e}", file=sys.stderr)
+        return None
+
+
+def guardar_cache(cache_dir, clave, agregado):
+    os.makedirs(cache_dir, exist_ok=True)
+    _escribir_json(os.path.join(cache_dir, f"{clave}.json"), agregado)
+
+
+def resolver_dataset(nombre, directorio=DATASETS_DIR):
+    """
+    Ruta de un dataset por su nombre dentro de directorio; rechaza las que salen de él.
+    """
+    base = os.path.realpath(directorio)
+    path = os.path.realpath(os.path.join(base, nombre))
+    if os.path.commonpath([base, path]) != base or not os.path.isfile(path):
+        raise ValueError(f"Dataset no encontrado: {nombre}")
+    return path
+
+
+def _regla(texto):
+    """
+    Número de bins (entero), ancho de banda (real) o nombre de una regla.
+    """
+    if texto.isdigit():
+        return int(texto)
+    try:
+        return float(texto)
+    except ValueError:
+        return texto
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Histogramas, rejillas 2D y densidades de un CSV, Parquet o Arrow "
+                                                 "para el front")
+    parser.add_argument("fichero", help="Ruta del fichero, o nombre dentro de --datasets")
+    parser.add_argument("--grafico", required=True, help=f"Uno de: {', '.join(GRAFICOS)}")
+    # extend: también se puede repetir --columnas=NOMBRE, que admite nombres que empiezan por '-'
+    parser.add_argument("--columnas", nargs="+", action="extend", required=True,
+                        help="Una columna (histograma), dos (x y de la rejilla) o la numérica y la de "
+                             "grupos (densidad)")
+    parser.add_argument("--regla", type=_regla,
+                        help=f"Bins: {', '.join(REGLAS)} o un número (por defecto auto). Densidad: scott, silverman "
+                             "o el ancho de banda (por defecto scott)")
+    parser.add_argument("--nucleo", help="Núcleo de las densidades: epanechnikov (por defecto) o gaussiano")
+    parser.add_argument("--trabajadores", type=int, help="Procesos para las densidades con muchos grupos")
+    parser.add_argument("--datasets", metavar="DIR",
+                        help="Solo se aceptan ficheros dentro de este directorio (lo usa server.js)")
+    parser.add_argument("--sep", help="Separador del CSV (por defecto se detecta)")
+    parser.add_argument("--bloque", type=int, default=FILAS_BLOQUE, help="Filas por bloque")
+    parser.add_argument("--sin-cache", action="store_true", help="Ni lee ni guarda en la caché")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    try:
+        path = resolver_dataset(args.fichero, args.datasets) if args.datasets else args.fichero
+        agregado = agregar(path, args.grafico, args.columnas, args.regla, args.bloque, args.sep,
+                           None if args.sin_cache else CACHE_DIR, args.nucleo, args.trabajadores)
+    except (OSError, ValueError) as e:
+        print(json.dumps({"error": str(e)}, ensure_ascii=False))
+        sys.exit(1)
+    salida = json.dumps(agregado, ensure_ascii=False, separators=(",", ":"))
+    print(salida)
+    print(f"{agregado['filas']} filas agregadas en {time.perf_counter() - inicio:.2f} s "
+          f"({len(salida) / 1024:.1f} KB de JSON)", file=sys.stderr)
@@ -0,0 +1,298 @@
+import os
+import sys
+import json
+import numpy as np
+from modelo_nativo import ARBOLES_PATH, MANIFIESTO_MODELO_PATH, codec_de_manifiesto
+
+'''Evaluador del ensemble de árboles de XGBoost con NumPy, sin xgboost'''
+
+# Para predecir un vector 1x9 no hace falta xgboost: el modelo son 3300 árboles pequeños
+# (100 rondas x 33 clases). Aquí los volcamos a arrays planos (característica, umbral,
+# hijo izquierdo/derecho y valor de hoja por nodo, y raíz y clase por árbol) y los
+# evaluamos para un lote entero a la vez.
+# Si ningún árbol tiene más de 64 hojas (profundidad <= 6, la de xgboost por defecto) se
+# usan máscaras de bits al estilo QuickScorer: las hojas de cada árbol se numeran de
+# izquierda a derecha y cada nodo tiene una máscara que apaga las hojas de su subárbol
+# izquierdo. Un nodo manda a la derecha si x >= umbral, así que basta saber en qué tramo
+# de los umbrales de su característica cae cada valor: por característica y tramo se
+# precalcula el AND de las máscaras de todos los nodos que mandan a la derecha, y la
+# hoja de salida es el bit más bajo del AND de las nueve máscaras. Si algún árbol es más
+# profundo, todas las filas bajan por todos los árboles a la vez, un nivel por iteración.
+# En ambos casos el resultado coincide exactamente con XGBClassifier.predict porque se
+# reproduce lo que hace xgboost:
+#   - se va a la izquierda si x < umbral, comparando en float32;
+#   - el margen de cada clase empieza en base_score y suma los valores de hoja de sus
+#     árboles en float32 y en el orden de las rondas;
+#   - softmax en float32 y argmax (que en caso de empate elige la primera clase).
+# El volcado sí necesita xgboost (python arboles_numpy.py); evaluarlo solo NumPy.
+
+# Filas por bloque al evaluar lotes grandes (la memoria es filas x árboles)
+FILAS_BLOQUE = 256
+
+# Máximo de hojas por árbol para evaluar con máscaras de un uint64
+MAX_HOJAS = 64
+
+
+def _mascaras(arbol, umbrales_caracteristica, mascaras, valor_hoja, n_arbol):
+    """
+    Numera las hojas del árbol de izquierda a derecha, guarda sus valores y acumula en
+    mascaras[caracteristica, tramo, árbol] las máscaras de los nodos que mandan a la
+    derecha a los valores de ese tramo. Devuelve False si el árbol tiene demasiadas hojas.
+    """
+    izquierda, derecha = arbol["left_children"], arbol["right_children"]
+    hojas = []
+    subarbol_izquierdo = {}  # nodo -> (primera hoja, hoja siguiente a la última) a su izquierda
+
+    def recorrer(nodo):
+        if izquierda[nodo] == -1:
+            hojas.append(nodo)
+            return len(hojas) - 1, len(hojas)
+        primera, medio = recorrer(izquierda[nodo])
+        _, ultima = recorrer(derecha[nodo])
+        subarbol_izquierdo[nodo] = (primera, medio)
+        return primera, ultima
+
+    recorrer(0)
+    if len(hojas) > MAX_HOJAS:
+        return False
+    valor_hoja[n_arbol, :len(hojas)] = [arbol["split_conditions"][h] for h in hojas]
+    for nodo, (primera, medio) in subarbol_izquierdo.items():
+        # Al ir a la derecha se descartan las hojas del subárbol izquierdo
+        apagadas = ((1 << (medio - primera)) - 1) << primera
+        f = arbol["split_indices"][nodo]
+        umbral = np.float32(arbol["split_conditions"][nodo])
+        # Los valores de los tramos por encima del umbral (x >= umbral) van a la derecha
+        tramo = int(np.searchsorted(umbrales_caracteristica[f], umbral, side='left'))
+        mascaras[f, tramo + 1:, n_arbol] &= np.uint64(~apagadas & (2 ** 64 - 1))
+    return True
+
+
+def volcar_arboles(booster):
+    """
+    Booster de xgboost -> diccionario de arrays planos con todos los nodos.
+    Los hijos son índices globales y las hojas apuntan a sí mismas, así que una fila
+    que llega a una hoja se queda en ella en las iteraciones siguientes.
+    """
+    modelo = json.loads(booster.save_raw("json"))["learner"]
+    arboles = modelo["gradient_booster"]["model"]["trees"]
+    parametros = modelo["learner_model_param"]
+    n_clases = max(1, int(parametros["num_class"]))
+    # base_score es un escalar o, desde xgboost 3, un vector por clase: "[5E-1,...]"
+    base = np.atleast_1d(np.array(json.loads(parametros["base_score"]), dtype=np.float32))
+    base = np.broadcast_to(base, (n_clases,)).copy()
+
+    caracteristica, umbral, izquierda, derecha, raices = [], [], [], [], []
+    inicio = 0
+    for arbol in arboles:
+        if any(arbol["split_type"]):
+            raise ValueError("El evaluador NumPy no soporta divisiones categóricas")
+        hijos_izq = np.array(arbol["left_children"], dtype=np.int64)
+        hijos_der = np.array(arbol["right_children"], dtype=np.int64)
+        hoja = hijos_izq == -1
+        propios = np.arange(len(hijos_izq)) + inicio
+        raices.append(inicio)
+        caracteristica.append(np.where(hoja, 0, arbol["split_indices"]))
+        # En las hojas split_conditions guarda el valor de la hoja
+        umbral.append(np.array(arbol["split_conditions"], dtype=np.float32))
+        izquierda.append(np.where(hoja, propios, hijos_izq + inicio))
+        derecha.append(np.where(hoja, propios, hijos_der + inicio))
+        inicio += len(hijos_izq)
+
+    izquierda = np.concatenate(izquierda).astype(np.int32)
+    derecha = np.concatenate(derecha).astype(np.int32)
+    caracteristica = np.concatenate(caracteristica).astype(np.int32)
+    umbral = np.concatenate(umbral)
+    # Profundidad máxima: iteraciones necesarias para que toda fila llegue a una hoja.
+    # Dentro de cada árbol los hijos tienen siempre índice mayor que su padre.
+    hoja = izquierda == np.arange(len(izquierda))
+    profundidad = np.zeros(len(izquierda), dtype=np.int32)
+    for nodo in np.flatnonzero(~hoja):
+        profundidad[izquierda[nodo]] = profundidad[derecha[nodo]] = profundidad[nodo] + 1
+    arrays = {
+        "caracteristica": caracteristica,
+        "umbral": umbral,
+        "izquierda": izquierda,
+        "derecha": derecha,
+        "profundidad": np.int32(profundidad.max()),
+        "raices": np.array(raices, dtype=np.int32),
+        "clase_arbol": np.array(modelo["gradient_booster"]["model"]["tree_info"], dtype=np.int32),
+        "base": base,
+        "n_caracteristicas": np.int32(parametros["num_feature"]),
+    }
+
+    # Máscaras de bits: umbrales distintos de cada característica (rellenos con +inf hasta
+    # el máximo) y, por característica, tramo y árbol, el AND de las máscaras
+    n_caracteristicas = int(parametros["num_feature"])
+    umbrales_caracteristica = [np.unique(umbral[~hoja][caracteristica[~hoja] == f])
+                               for f in range(n_caracteristicas)]
+    n_umbrales = max(len(u) for u in umbrales_caracteristica)
+    mascaras = np.full((n_caracteristicas, n_umbrales + 1, len(arboles)), np.iinfo(np.uint64).max, dtype=np.uint64)
+    valor_hoja = np.zeros((len(arboles), MAX_HOJAS), dtype=np.float32)
+    if all(_mascaras(arbol, umbrales_caracteristica, mascaras, valor_hoja, n)
+           for n, arbol in enumerate(arboles)):
+        tabla_umbrales = np.full((n_caracteristicas, n_umbrales), np.inf, dtype=np.float32)
+        for f, u in enumerate(umbrales_caracteristica):
+            tabla_umbrales[f, :len(u)] = u
+        arrays.update(umbrales=tabla_umbrales, mascaras=mascaras, valor_hoja=valor_hoja)
+    return arrays
+
+
+def guardar_arboles(arrays, sha256, path=ARBOLES_PATH):
+    """
+    Guarda los arrays en .npz junto al sha256 del modelo nativo del que salen.
+    """
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, sha256=np.array(sha256), **arrays)
+    os.replace(tmp, path)
+
+
+class EnsambleNumpy:
+    """
+    Ensemble de árboles evaluado con NumPy. Misma interfaz predict que XGBClassifier
+    (devuelve los códigos de etiqueta) y el codec del manifiesto del modelo.
+    """
+
+    def __init__(self, arrays, manifiesto=None):
+        self.caracteristica = arrays["caracteristica"]
+        self.umbral = arrays["umbral"]
+        self.izquierda = arrays["izquierda"]
+        self.derecha = arrays["derecha"]
+        self.raices = arrays["raices"]
+        self.base = arrays["base"]
+        self.n_caracteristicas = int(arrays["n_caracteristicas"])
+        self.n_clases = len(self.base)
+        clase_arbol = arrays["clase_arbol"]
+        # Con árboles en orden de rondas (0, 1, ..., K-1, 0, 1, ...) la suma por clases es
+        # una suma por rondas de vectores de K valores
+        n_rondas, resto = divmod(len(self.raices), self.n_clases)
+        if resto or not np.array_equal(clase_arbol, np.tile(np.arange(self.n_clases), n_rondas)):
+            raise ValueError("Los árboles no están ordenados por rondas y clases")
+        self.n_rondas = n_rondas
+        self.profundidad = int(arrays["profundidad"])
+        # Máscaras de bits, si el volcado las tiene (árboles de 64 hojas como mucho)
+        self.umbrales = arrays.get("umbrales")
+        self.mascaras = arrays.get("mascaras")
+        self.valor_hoja = arrays.get("valor_hoja")
+        if self.mascaras is not None:
+            self._desplazamiento_hoja = np.arange(len(self.raices), dtype=np.int64) * self.valor_hoja.shape[1]
+            self.valor_hoja = self.valor_hoja.ravel()
+            n_tramos = self.mascaras.shape[1]
+            self._mascaras_planas = self.mascaras.reshape(-1, self.mascaras.shape[2])
+            self._fila_caracteristica = np.arange(self.n_caracteristicas) * n_tramos
+        else:
+            # Hijos intercalados: hijos[2 * nodo] a la izquierda, hijos[2 * nodo + 1] a la derecha
+            self._hijos = np.stack([self.izquierda, self.derecha], axis=1).ravel()
+        self.manifiesto = manifiesto
+        self.codec = codec_de_manifiesto(manifiesto) if manifiesto else None
+
+    def margenes(self, X):
+        """
+        Margen (suma de hojas más base_score) de cada clase, en float32.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_caracteristicas:
+            raise ValueError(f"Se esperaban {self.n_caracteristicas} características y hay {X.shape[1]}")
+        if np.isnan(X).any():
+            raise ValueError("El evaluador NumPy no admite valores ausentes (NaN)")
+        margenes = np.empty((len(X), self.n_clases), dtype=np.float32)
+        bloque = self._hojas_mascaras if self.mascaras is not None else self._hojas_niveles
+        for inicio in range(0, len(X), FILAS_BLOQUE):
+            hojas = bloque(X[inicio:inicio + FILAS_BLOQUE])
+            margenes[inicio:inicio + FILAS_BLOQUE] = self._sumar_rondas(hojas)
+        return margenes
+
+    def _hojas_mascaras(self, X):
+        """
+        Valor de la hoja de salida de cada árbol para cada fila, con las máscaras de bits.
+        """
+        # Tramo de cada valor: cuántos umbrales de su característica son <= que él (el
+        # relleno +inf nunca cuenta); y de ahí la fila de máscaras de cada característica
+        tramo = (X[:, :, None] >= self.umbrales).sum(axis=2)
+        filas = tramo + self._fila_caracteristica
+        activas = self._mascaras_planas.take(filas[:, 0], axis=0)
+        for f in range(1, self.n_caracteristicas):
+            np.bitwise_and(activas, self._mascaras_planas.take(filas[:, f], axis=0), out=activas)
+        # Bit más bajo encendido: la hoja de salida. frexp de una potencia de dos 2^k da k + 1
+        bit = np.bitwise_and(activas, np.negative(activas, out=np.empty_like(activas)))
+        hoja = np.frexp(bit.astype(np.float64))[1] - 1
+        return self.valor_hoja.take(hoja + self._desplazamiento_hoja)
+
+    def _hojas_niveles(self, X):
+        """
+        Valor de la hoja de salida de cada árbol para cada fila, bajando nivel a nivel.
+        """
+        n, n_arboles = len(X), len(self.raices)
+        X = X.ravel()
+        fila = np.repeat(np.arange(n, dtype=np.int64) * self.n_caracteristicas, n_arboles)
+        nodos = np.tile(self.raices.astype(np.int64), n)
+        for _ in range(self.profundidad):
+            derecha = X.take(fila + self.caracteristica.take(nodos)) >= self.umbral.take(nodos)
+            nodos = self._hijos.take(2 * nodos + derecha)
+        # En las hojas umbral es el valor de la hoja
+        return self.umbral.take(nodos).reshape(n, n_arboles)
+
+    def _sumar_rondas(self, hojas):
+        """
+        base_score más las hojas de cada clase sumadas en float32 ronda a ronda, como
+        xgboost (cumsum suma en orden; sum podría sumar por parejas y redondear distinto).
+        """
+        hojas = hojas.reshape(len(hojas), self.n_rondas, self.n_clases)
+        base = np.broadcast_to(self.base, (len(hojas), 1, self.n_clases))
+        return np.cumsum(np.concatenate([base, hojas], axis=1), axis=1, dtype=np.float32)[:, -1]
+
+    def predict_proba(self, X):
+        margenes = self.margenes(X)
+        exp = np.exp(margenes - margenes.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True, dtype=np.float32)
+
+    def predict(self, X):
+        return self.predict_proba(X).argmax(axis=1)
+
+
+def cargar_arboles(path=ARBOLES_PATH, manifiesto_path=MANIFIESTO_MODELO_PATH):
+    """
+    Carga los árboles comprobando que salen del mismo modelo que describe el manifiesto.
+    """
+    with open(manifiesto_path, encoding='utf-8') as f:
+        manifiesto = json.load(f)
+    with np.load(path) as datos:
+        arrays = {clave: datos[clave] for clave in datos.files}
+    if str(arrays.pop("sha256")) != manifiesto.get("sha256"):
+        raise ValueError(f"Los árboles de {path} no corresponden al modelo del manifiesto")
+    ensamble = EnsambleNumpy(arrays, manifiesto)
+    if ensamble.n_clases != len(manifiesto["etiquetas"]) or ensamble.n_caracteristicas != len(manifiesto["columnas"]):
+        raise ValueError(f"Los árboles de {path} no encajan con las columnas o etiquetas del manifiesto")
+    return ensamble
+
+
+if __name__ == "__main__":
+    # Vuelca el modelo nativo a arrays y comprueba que coincide con XGBClassifier.predict
+    # en todas las combinaciones posibles de respuestas
+    import time
+    import pickle
+    import warnings
+    warnings.simplefilter('ignore')
+    import recomendador
+    from modelo_nativo import cargar_modelo_nativo
+
+    nativo = cargar_modelo_nativo()
+    guardar_arboles(volcar_arboles(nativo.booster), nativo.manifiesto["sha256"])
+    ensamble = cargar_arboles()
+
+    with open(recomendador.MODEL_PATH, 'rb') as f:
+        clasificador = pickle.load(f)
+    codigos = np.indices(ensamble.codec.forma).reshape(len(ensamble.codec.forma), -1).T
+    inicio = time.perf_counter()
+    esperado = clasificador.predict(codigos)
+    t_xgb = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    obtenido = ensamble.predict(codigos)
+    t_numpy = time.perf_counter() - inicio
+    diferencias = int((esperado != obtenido).sum())
+    print(f"Árboles guardados en {ARBOLES_PATH}: {len(ensamble.raices)} árboles, "
+          f"{len(ensamble.umbral)} nodos, profundidad {ensamble.profundidad}", file=sys.stderr)
+    print(f"{len(codigos) - diferencias}/{len(codigos)} combinaciones coinciden con XGBClassifier.predict "
+          f"(xgboost {t_xgb:.1f}s, NumPy {t_numpy:.1f}s)", file=sys.stderr)
+    sys.exit(1 if diferencias else 0)
@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+'''Benchmark: carga del modelo desde pickle, formato nativo (UBJSON + manifiesto) y árboles NumPy'''
+
+# Cada medida se hace en un proceso nuevo para que cuenten los imports (xgboost, sklearn)
+# y la memoria sea la del proceso que solo ha cargado el modelo y predicho una fila.
+# Se separa el import de xgboost (que a su vez importa sklearn, scipy y pandas si están
+# instalados y es igual con pickle y con UBJSON) de la carga de los ficheros en sí. Los
+# árboles NumPy no importan xgboost.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# formato -> (imports, carga)
+CARGAS = {
+    "pickle": ("import xgboost", """
+import pickle
+with open(recomendador.MODEL_PATH, 'rb') as f:
+    modelo = pickle.load(f)
+with open(recomendador.ENCODER_PATH, 'rb') as f:
+    encoders = pickle.load(f)
+with open(recomendador.LABEL_ENCODER_PATH, 'rb') as f:
+    label_encoder_y = pickle.load(f)
+"""),
+    "nativo": ("import xgboost", """
+from modelo_nativo import cargar_modelo_nativo
+modelo = cargar_modelo_nativo()
+"""),
+    "numpy": ("", """
+from arboles_numpy import cargar_arboles
+modelo = cargar_arboles()
+"""),
+}
+
+PLANTILLA = """
+import time, json, resource, warnings
+warnings.simplefilter('ignore')
+inicio = time.perf_counter()
+import recomendador
+import numpy as np
+{imports}
+importado = time.perf_counter()
+{carga}
+modelo.predict(np.zeros((1, len(recomendador.REQUIRED_COLUMNS)), dtype=np.int64))
+fin = time.perf_counter()
+print(json.dumps({{"segundos": fin - inicio, "carga": fin - importado,
+                  "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def medir(formato):
+    imports, carga = CARGAS[formato]
+    codigo = PLANTILLA.format(imports=imports, carga=carga)
+    proceso = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, cwd=BASE_DIR)
+    if proceso.returncode != 0:
+        raise RuntimeError(f"Falló la carga {formato}: {proceso.stderr[-500:]}")
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    resultados = {}
+    for formato in CARGAS:
+        medidas = [medir(formato) for _ in range(args.repeticiones)]
+        resultados[formato] = {clave: min(m[clave] for m in medidas) for clave in medidas[0]}
+        print(f"{formato:7s} total {resultados[formato]['segundos'] * 1000:7.1f} ms "
+              f"(carga + primera predicción {resultados[formato]['carga'] * 1000:6.1f} ms), "
+              f"RSS máximo {resultados[formato]['rss_mb']:6.1f} MB")
+    for formato in ("nativo", "numpy"):
+        print(f"{formato}/pickle: {resultados[formato]['segundos'] / resultados['pickle']['segundos']:.2f}x tiempo total, "
+              f"{resultados[formato]['carga'] / resultados['pickle']['carga']:.2f}x tiempo de carga, "
+              f"{resultados[formato]['rss_mb'] / resultados['pickle']['rss_mb']:.2f}x memoria")
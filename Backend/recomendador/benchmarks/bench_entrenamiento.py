@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import argparse
+import warnings
+import statistics
+
+'''Benchmark: entrenamiento con sobremuestreo frente a filas únicas con sample_weight'''
+
+# Para cada modo de recomendador_AI.preparar_datos mide la preparación y el fit del
+# XGBClassifier (mejor de varias repeticiones), el tamaño de la matriz de train y las
+# métricas en test, y al final cuánto coinciden ambos modelos sobre todas las
+# combinaciones posibles de respuestas.
+#
+#   python benchmarks/bench_entrenamiento.py                  # con el Excel del dataset
+#   python benchmarks/bench_entrenamiento.py --bbdd           # con DATASET_ENTRENAMIENTO_GRAFICOS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_PATH = os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), "datasets",
+                            "Dataset_entrenamiento_recomendador.xlsx")
+
+sys.path.insert(0, BASE_DIR)
+warnings.simplefilter('ignore')
+
+import numpy as np
+import recomendador_AI
+
+
+def medir(df, modo, repeticiones):
+    preparaciones, fits = [], []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        datos = recomendador_AI.preparar_datos(df, modo)
+        preparaciones.append(time.perf_counter() - inicio)
+        clf, duracion = recomendador_AI.train_pred(datos["X_train"], datos["y_train_encoded"], pesos=datos["pesos"])
+        fits.append(duracion)
+    scores, _, _, _ = recomendador_AI.evaluar(clf, modo, datos["X_train"], datos["y_train_encoded"], datos["X_test"],
+                                              datos["y_test"], list(datos["label_encoder_y"].classes_),
+                                              float("nan"), float("nan"))
+    return {"filas": datos["X_train"].shape[0], "preparacion": min(preparaciones), "fit": min(fits),
+            "fit_mediana": statistics.median(fits), "scores": scores}, clf, datos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bbdd", action="store_true", help="Lee el dataset de la bbdd en vez del Excel")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    df, _ = recomendador_AI.leer_dataset_entrenamiento(None if args.bbdd else DATASET_PATH, BASE_DIR)
+    resultados, modelos = {}, {}
+    for modo in recomendador_AI.MODOS:
+        resultados[modo], modelos[modo], datos = medir(df, modo, args.repeticiones)
+        r = resultados[modo]
+        print(f"{modo:14s} {r['filas']:5d} filas de train, preparación {r['preparacion'] * 1000:6.1f} ms, "
+              f"fit {r['fit'] * 1000:6.1f} ms (mediana {r['fit_mediana'] * 1000:6.1f}), "
+              f"accuracy test {r['scores']['Accuracy']:.2%}, F1 {r['scores']['F1 Score']:.2%}")
+
+    base, pesos = (resultados[m] for m in recomendador_AI.MODOS)
+    print(f"pesos/sobremuestreo: {pesos['filas'] / base['filas']:.2f}x filas, {pesos['fit'] / base['fit']:.2f}x fit")
+
+    # Ambos modos ajustan los encoders sobre los mismos valores, así que comparten códigos
+    forma = tuple(len(e.classes_) for e in datos["encoders"].values())
+    codigos = np.indices(forma).reshape(len(forma), -1).T
+    iguales = (modelos["sobremuestreo"].predict(codigos) == modelos["pesos"].predict(codigos)).mean()
+    print(f"Ambos modelos coinciden en el {iguales:.2%} de las {len(codigos)} combinaciones posibles")
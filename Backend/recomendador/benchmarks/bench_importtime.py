@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+'''Presupuesto de arranque del CLI medido con python -X importtime'''
+
+# Lanza recomendador.py en frío en un subproceso con -X importtime, suma el tiempo
+# acumulado de los imports de primer nivel y comprueba que no se cargan módulos que ese
+# camino no necesita. Termina con código 1 si algún escenario se pasa del presupuesto,
+# así que sirve como prueba de regresión del arranque.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(BASE_DIR, "recomendador.py")
+
+RESPUESTAS = {"n_dimensiones": "1D", "tipo_datos": "Numeric", "ordenadas": "Not applicable",
+              "n_grupos_alto": "Not applicable", "relacion": "Not applicable", "obs_grupo": "One",
+              "proposito": "Distribution", "dataset_size": "Small", "contexto": "Exploration"}
+
+# nombre -> (argumentos, módulos prohibidos, presupuesto en ms de imports). Sin tensor
+# se evalúa el modelo con xgboost, que importa a su vez pandas y sklearn
+ESCENARIOS = {
+    "solo_reglas": (["--solo-reglas"], ["numpy", "pandas", "sklearn", "xgboost", "psycopg2"], 50),
+    "tensor": ([], ["pandas", "sklearn", "xgboost", "psycopg2"], 200),
+    "sin_tensor": (["--sin-tensor"], ["psycopg2"], 2500),
+}
+
+
+def medir_imports(argumentos):
+    """
+    Ejecuta el CLI con -X importtime y devuelve (ms de imports de primer nivel, módulos).
+    """
+    comando = [sys.executable, "-X", "importtime", "-W", "ignore", SCRIPT,
+               "--json", json.dumps(RESPUESTAS)] + argumentos
+    proceso = subprocess.run(comando, capture_output=True, text=True, cwd=BASE_DIR)
+    if proceso.returncode != 0:
+        raise RuntimeError(f"Falló {' '.join(argumentos)}: {proceso.stderr[-500:]}")
+    total_us = 0
+    modulos = set()
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        modulos.add(nombre.strip())
+        # Los imports de primer nivel van con un solo espacio; los anidados, sangrados
+        if not nombre[1:].startswith(" "):
+            total_us += int(acumulado)
+    return total_us / 1000, modulos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--factor", type=float, default=1.0, help="Multiplica los presupuestos (máquinas lentas)")
+    args = parser.parse_args()
+
+    fallos = []
+    for nombre, (argumentos, prohibidos, presupuesto) in ESCENARIOS.items():
+        # El mínimo de varias ejecuciones filtra el ruido de la máquina
+        mediciones = [medir_imports(argumentos) for _ in range(args.repeticiones)]
+        ms = min(m[0] for m in mediciones)
+        cargados = sorted(p for p in prohibidos if p in mediciones[0][1])
+        limite = presupuesto * args.factor
+        estado = "OK" if ms <= limite and not cargados else "FALLO"
+        print(f"{nombre:12s} {ms:7.1f} ms de imports (presupuesto {limite:.0f} ms) {estado}"
+              + (f" - importa {', '.join(cargados)}" if cargados else ""))
+        if estado != "OK":
+            fallos.append(nombre)
+    sys.exit(1 if fallos else 0)
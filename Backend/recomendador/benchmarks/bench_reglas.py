@@ -0,0 +1,40 @@
+import os
+import sys
+import random
+import timeit
+import warnings
+
+'''Benchmark: recommend_rule (árbol if/elif) frente a la tabla de reglas compilada'''
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.simplefilter('ignore')
+
+import recomendador
+from tabla_reglas import cargar_reglas
+
+
+def muestras_respuestas(n, semilla=0):
+    """
+    Mezcla de respuestas elegidas al azar entre las clases de los encoders.
+    """
+    _, _, encoders = recomendador.cargar_artefactos()
+    rnd = random.Random(semilla)
+    clases = {col: list(encoders[col].classes_) for col in recomendador.REQUIRED_COLUMNS}
+    return [{col: rnd.choice(valores) for col, valores in clases.items()} for _ in range(n)]
+
+
+def medir(funcion, muestras, repeticiones=5):
+    """
+    Mejor tiempo por llamada (en microsegundos) de entre varias repeticiones.
+    """
+    tiempos = timeit.repeat(lambda: [funcion(m) for m in muestras], number=1, repeat=repeticiones)
+    return min(tiempos) / len(muestras) * 1e6
+
+
+if __name__ == "__main__":
+    muestras = muestras_respuestas(20000)
+    tabla = cargar_reglas()
+    arbol = medir(recomendador.recommend_rule, muestras)
+    compilada = medir(tabla.recommend, muestras)
+    print(f"recommend_rule (if/elif): {arbol:.2f} us/llamada")
+    print(f"tabla compilada:          {compilada:.2f} us/llamada ({arbol / compilada:.1f}x)")
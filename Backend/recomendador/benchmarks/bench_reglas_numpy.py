@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import argparse
+import warnings
+
+'''Benchmark: reglas por diccionario frente al evaluador NumPy sobre lotes de códigos'''
+
+# Lotes de 10^6 y 10^7 respuestas codificadas al azar (uint8, como las del codec). El
+# evaluador NumPy recorre el lote entero; recommend_rule y la tabla compilada se miden
+# sobre una muestra (decodificada a diccionarios fuera del tiempo medido) y se
+# extrapolan a filas por segundo. Al final se comprueba que la muestra coincide.
+#
+#   python benchmarks/bench_reglas_numpy.py
+#   python benchmarks/bench_reglas_numpy.py --filas 1000000 10000000 30000000
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.simplefilter('ignore')
+
+import numpy as np
+import recomendador
+from codec import cargar_codec
+from tabla_reglas import cargar_reglas
+from reglas_numpy import compilar
+
+
+def lote(codec, filas, semilla=0):
+    rng = np.random.default_rng(semilla)
+    return np.column_stack([rng.integers(0, n, filas, dtype=np.uint8) for n in codec.forma])
+
+
+def mejor(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filas", type=int, nargs="+", default=[10 ** 6, 10 ** 7])
+    parser.add_argument("--muestra", type=int, default=100000, help="Filas evaluadas por diccionario")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    codec = cargar_codec()
+    tabla = cargar_reglas()
+    reglas = compilar(tabla, codec)
+
+    codigos = lote(codec, args.muestra, semilla=1)
+    muestra = [codec.decodificar(fila) for fila in codigos]
+    referencia = {}
+    for nombre, funcion in (("recommend_rule", recomendador.recommend_rule), ("tabla compilada", tabla.recommend)):
+        segundos, referencia[nombre] = mejor(lambda: [funcion(m) for m in muestra], args.repeticiones)
+        print(f"{nombre:16s} {args.muestra:>10d} filas: {segundos:7.3f} s  {args.muestra / segundos:12,.0f} filas/s")
+    iguales = (reglas.recomendar(codigos) == np.array(referencia["recommend_rule"], dtype=object)).all()
+
+    for filas in args.filas:
+        codigos = lote(codec, filas)
+        segundos, _ = mejor(lambda: reglas.evaluar(codigos), args.repeticiones)
+        print(f"{'numpy':16s} {filas:>10d} filas: {segundos:7.3f} s  {filas / segundos:12,.0f} filas/s")
+    print(f"La muestra coincide con recommend_rule: {'sí' if iguales else 'NO'}")
+    sys.exit(0 if iguales else 1)
@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import time
+import random
+import timeit
+import platform
+import argparse
+import warnings
+import subprocess
+import statistics
+
+'''Suite de micro-benchmarks de los caminos críticos del recomendador'''
+
+# Mide las reglas sobre una mezcla representativa de respuestas, recommend_AI individual
+# y por lotes, la carga de artefactos y el arranque en frío del __main__ con la bbdd
+# sustituida por un doble. Los resultados se guardan en JSON (uno por ejecución) para
+# comparar entre commits; con --comparar se marca como regresión todo benchmark cuyo
+# mejor tiempo empeore más que el umbral y el proceso termina con código 1.
+#
+#   python benchmarks/suite.py                      # ejecuta y guarda en benchmarks/resultados/
+#   python benchmarks/suite.py -k reglas            # solo los que contienen "reglas"
+#   python benchmarks/suite.py --comparar base.json --umbral 1.25
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+RESULTADOS_DIR = os.path.join(BENCH_DIR, "resultados")
+DATASET_PATH = os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), "datasets",
+                            "Dataset_entrenamiento_recomendador.xlsx")
+
+sys.path.insert(0, BASE_DIR)
+warnings.simplefilter('ignore')
+
+import recomendador
+
+UMBRAL_DEFECTO = 1.25
+
+# nombre -> (función que prepara y devuelve (llamable, unidades por llamada), repeticiones)
+BENCHMARKS = {}
+
+
+def benchmark(nombre, repeticiones=7):
+    def registrar(preparar):
+        BENCHMARKS[nombre] = (preparar, repeticiones)
+        return preparar
+    return registrar
+
+
+_cache = {}
+
+
+def _una_vez(clave, funcion):
+    if clave not in _cache:
+        _cache[clave] = funcion()
+    return _cache[clave]
+
+
+def mezcla_respuestas(n=5000, semilla=0):
+    """
+    Respuestas del dataset de entrenamiento (la mezcla real de casos) repetidas hasta n.
+    Si no se puede leer el Excel, respuestas al azar entre las clases del codec.
+    """
+    def cargar():
+        try:
+            import pandas as pd
+            datos = pd.read_excel(DATASET_PATH)
+            # Las columnas 1..9 son las respuestas en el orden de REQUIRED_COLUMNS
+            filas = datos.iloc[:, 1:1 + len(recomendador.REQUIRED_COLUMNS)].astype(str).values.tolist()
+            return [dict(zip(recomendador.REQUIRED_COLUMNS, fila)) for fila in filas]
+        except (ImportError, OSError, ValueError) as e:
+            print(f"Sin dataset ({e}); se usan respuestas al azar", file=sys.stderr)
+            from codec import cargar_codec
+            codec = cargar_codec()
+            rnd = random.Random(semilla)
+            return [{col: rnd.choice(codec.clases[col]) for col in codec.columnas} for _ in range(1000)]
+    base = _una_vez("mezcla", cargar)
+    rnd = random.Random(semilla)
+    return [dict(rnd.choice(base)) for _ in range(n)]
+
+
+def _artefactos(tipo):
+    if tipo == "pickle":
+        return _una_vez("pickle", lambda: recomendador.cargar_artefactos())
+    return _una_vez("servicio", lambda: recomendador.cargar_artefactos(usar_codec=True))
+
+
+@benchmark("reglas_arbol")
+def _():
+    muestras = mezcla_respuestas()
+    return (lambda: [recomendador.recommend_rule(m) for m in muestras]), len(muestras)
+
+
+@benchmark("reglas_tabla")
+def _():
+    from tabla_reglas import cargar_reglas
+    tabla = cargar_reglas()
+    muestras = mezcla_respuestas()
+    return (lambda: [tabla(m) for m in muestras]), len(muestras)
+
+
+@benchmark("tensor_individual")
+def _():
+    from tensor_recomendaciones import cargar_tensor
+    tensor = cargar_tensor()
+    muestras = mezcla_respuestas()
+    return (lambda: [tensor.recomendar(m) for m in muestras]), len(muestras)
+
+
+def _ai_individual(tipo):
+    modelo, label_encoder_y, encoders = _artefactos(tipo)
+    muestras = mezcla_respuestas(200)
+    columnas = recomendador.REQUIRED_COLUMNS
+    return (lambda: [recomendador.recommend_AI(m, modelo, label_encoder_y, encoders, columnas)
+                     for m in muestras]), len(muestras)
+
+
+def _ai_lote(tipo):
+    modelo, label_encoder_y, encoders = _artefactos(tipo)
+    muestras = mezcla_respuestas(2000)
+    columnas = recomendador.REQUIRED_COLUMNS
+    indices = recomendador.indices_encoders(encoders) if tipo == "pickle" else None
+    return (lambda: recomendador.recommend_AI_batch(muestras, modelo, label_encoder_y, encoders, columnas,
+                                                    indices)), len(muestras)
+
+
+benchmark("ai_individual_servicio", 5)(lambda: _ai_individual("servicio"))
+benchmark("ai_individual_pickle", 5)(lambda: _ai_individual("pickle"))
+benchmark("ai_lote_servicio", 5)(lambda: _ai_lote("servicio"))
+benchmark("ai_lote_pickle", 5)(lambda: _ai_lote("pickle"))
+
+
+@benchmark("carga_pickle", 5)
+def _():
+    import pickle
+    _artefactos("pickle")  # los imports (xgboost, sklearn) no cuentan en la carga
+
+    def cargar():
+        for path in (recomendador.MODEL_PATH, recomendador.ENCODER_PATH, recomendador.LABEL_ENCODER_PATH):
+            with open(path, 'rb') as f:
+                pickle.load(f)
+    return cargar, 1
+
+
+@benchmark("carga_servicio", 5)
+def _():
+    _artefactos("servicio")
+    return (lambda: recomendador.cargar_artefactos(usar_codec=True)), 1
+
+
+# Arranque en frío del __main__ con fetch_responses sustituido por un doble, como lo
+# lanza server.js para un id
+ARRANQUE = """
+import sys, runpy, warnings
+warnings.simplefilter('ignore')
+sys.path.insert(0, {base!r})
+import datos
+datos.fetch_responses = lambda id, pool=None: dict({respuestas!r})
+sys.argv = [{script!r}, "1"] + {argumentos!r}
+runpy.run_path({script!r}, run_name="__main__")
+"""
+
+
+def _arranque(argumentos):
+    codigo = ARRANQUE.format(base=BASE_DIR, script=os.path.join(BASE_DIR, "recomendador.py"),
+                             respuestas=mezcla_respuestas(1)[0], argumentos=argumentos)
+
+    def lanzar():
+        proceso = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, cwd=BASE_DIR)
+        if proceso.returncode != 0:
+            raise RuntimeError(f"Falló el arranque {argumentos}: {proceso.stderr[-500:]}")
+    return lanzar, 1
+
+
+benchmark("arranque_frio", 5)(lambda: _arranque([]))
+benchmark("arranque_frio_sin_tensor", 5)(lambda: _arranque(["--sin-tensor"]))
+benchmark("arranque_frio_solo_reglas", 5)(lambda: _arranque(["--solo-reglas"]))
+
+
+def ejecutar(nombres):
+    resultados = {}
+    for nombre in nombres:
+        preparar, repeticiones = BENCHMARKS[nombre]
+        funcion, unidades = preparar()
+        funcion()  # calentamiento
+        tiempos = [t / unidades for t in timeit.repeat(funcion, number=1, repeat=repeticiones)]
+        resultados[nombre] = {"unidades": unidades, "repeticiones": repeticiones,
+                              "min_us": min(tiempos) * 1e6, "mediana_us": statistics.median(tiempos) * 1e6}
+        print(f"{nombre:28s} {resultados[nombre]['min_us']:12.2f} us (mediana {resultados[nombre]['mediana_us']:.2f})",
+              file=sys.stderr)
+    return resultados
+
+
+def metadatos():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=BASE_DIR).stdout.strip()
+    except OSError:
+        commit = ""
+    import numpy
+    return {"commit": commit, "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "numpy": numpy.__version__, "maquina": platform.machine(), "nodo": platform.node()}
+
+
+def comparar(actual, base, umbral):
+    """
+    Lista de (nombre, ratio) de los benchmarks cuyo mejor tiempo empeora más que umbral.
+    """
+    regresiones = []
+    for nombre, resultado in actual.items():
+        if nombre not in base:
+            continue
+        ratio = resultado["min_us"] / base[nombre]["min_us"]
+        marca = "REGRESIÓN" if ratio > umbral else ""
+        print(f"{nombre:28s} {base[nombre]['min_us']:12.2f} -> {resultado['min_us']:12.2f} us  {ratio:5.2f}x {marca}")
+        if ratio > umbral:
+            regresiones.append((nombre, ratio))
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks del recomendador")
+    parser.add_argument("-k", dest="filtro", default="", help="Solo los benchmarks cuyo nombre contiene este texto")
+    parser.add_argument("--guardar", metavar="JSON", help="Fichero de resultados (por defecto en benchmarks/resultados/)")
+    parser.add_argument("--comparar", metavar="JSON", help="Resultados de referencia con los que comparar")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_DEFECTO,
+                        help=f"Ratio de tiempo a partir del cual hay regresión (por defecto {UMBRAL_DEFECTO})")
+    parser.add_argument("--listar", action="store_true", help="Muestra los benchmarks disponibles")
+    args = parser.parse_args()
+
+    if args.listar:
+        print("\n".join(BENCHMARKS))
+        sys.exit(0)
+    nombres = [n for n in BENCHMARKS if args.filtro in n]
+    salida = {"metadatos": metadatos(), "resultados": ejecutar(nombres)}
+
+    path = args.guardar
+    if path is None:
+        os.makedirs(RESULTADOS_DIR, exist_ok=True)
+        path = os.path.join(RESULTADOS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{salida['metadatos']['commit'] or 'sin-commit'}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(salida, f, indent=1)
+    print(f"Resultados guardados en {path}", file=sys.stderr)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)["resultados"]
+        regresiones = comparar(salida["resultados"], base, args.umbral)
+        sys.exit(1 if regresiones else 0)
@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import itertools
+import warnings
+import numpy as np
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+'''Búsqueda de hiperparámetros del recomendador AI con validación cruzada en paralelo'''
+
+# Cada candidato de la rejilla se evalúa con validación cruzada estratificada de k
+# particiones sobre la matriz codificada de train. Las tareas (candidato, partición) se
+# reparten en un pool de procesos; la matriz, las etiquetas y los pesos se dejan en
+# memoria compartida y los trabajadores los leen sin copiarlos. Cada trabajador entrena
+# con nthread = núcleos / trabajadores para no sobresuscribir la CPU.
+#
+# Los candidatos se podan con successive halving sobre el número de rondas de boosting:
+# todos empiezan con pocas rondas, en cada ronda de la búsqueda sigue el mejor 1/eta y
+# las rondas se multiplican por eta hasta llegar al máximo. El mejor candidato se
+# entrena con recomendador_AI.entrenar y se exportan sus artefactos como siempre.
+#
+#   python busqueda.py --salida /tmp/modelo               # rejilla por defecto
+#   python busqueda.py --rejilla '{"max_depth": [4, 8, 10], "learning_rate": [0.1, 0.3]}'
+
+REJILLA_DEFECTO = {
+    "max_depth": [3, 4, 6, 8],
+    "learning_rate": [0.1, 0.3],
+    "min_child_weight": [1, 3],
+    "subsample": [0.8, 1.0],
+}
+PARTICIONES = 5
+RONDAS_MIN = 25
+RONDAS_MAX = 200
+ETA = 3
+SEMILLA = 0
+
+COLUMNAS_RESULTADOS = ["ronda", "rondas_boosting", "candidato", "parametros", "accuracy_media",
+                       "accuracy_std", "segundos_fit"]
+
+
+def candidatos(rejilla):
+    """
+    Todas las combinaciones de la rejilla {parámetro: [valores]} como lista de dicts.
+    """
+    nombres = sorted(rejilla)
+    return [dict(zip(nombres, valores)) for valores in itertools.product(*(rejilla[n] for n in nombres))]
+
+
+'''Memoria compartida'''
+
+def compartir(array):
+    """
+    Copia un array a un bloque de memoria compartida. Devuelve (bloque, descriptor); el
+    descriptor es lo que se pasa a los trabajadores para adjuntarlo.
+    """
+    bloque = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=bloque.buf)[...] = array
+    return bloque, (bloque.name, array.shape, array.dtype.str)
+
+
+def adjuntar(descriptor):
+    nombre, forma, dtype = descriptor
+    bloque = shared_memory.SharedMemory(name=nombre)
+    return bloque, np.ndarray(forma, dtype=np.dtype(dtype), buffer=bloque.buf)
+
+
+# Estado de cada proceso trabajador (lo rellena _iniciar_trabajador)
+_trabajador = {}
+
+
+def _iniciar_trabajador(descriptores, n_clases, particiones, semilla, hilos):
+    from sklearn.model_selection import StratifiedKFold
+    warnings.simplefilter('ignore')
+    bloques, arrays = {}, {}
+    for nombre, descriptor in descriptores.items():
+        bloques[nombre], arrays[nombre] = adjuntar(descriptor)
+    # Las particiones son deterministas, así que cada trabajador las calcula igual
+    divisor = StratifiedKFold(n_splits=particiones, shuffle=True, random_state=semilla)
+    pliegues = list(divisor.split(arrays["X"], arrays["y"]))
+    _trabajador.update(bloques=bloques, pliegues=pliegues, n_clases=n_clases, hilos=hilos, semilla=semilla, **arrays)
+
+
+def _evaluar(indice, parametros, rondas, pliegue):
+    """
+    Entrena un candidato en una partición y devuelve (índice, pliegue, accuracy, segundos).
+    Se usa xgb.train con num_class fijo porque alguna partición puede no tener todas
+    las clases en su parte de entrenamiento.
+    """
+    import xgboost as xgb
+    X, y, pesos = _trabajador["X"], _trabajador["y"], _trabajador["pesos"]
+    train, validacion = _trabajador["pliegues"][pliegue]
+    dtrain = xgb.DMatrix(X[train], label=y[train], weight=pesos[train], nthread=_trabajador["hilos"])
+    configuracion = {"objective": "multi:softprob", "num_class": _trabajador["n_clases"],
+                     "nthread": _trabajador["hilos"], "seed": _trabajador["semilla"], **parametros}
+    inicio = time.perf_counter()
+    booster = xgb.train(configuracion, dtrain, num_boost_round=rondas)
+    segundos = time.perf_counter() - inicio
+    prediccion = booster.inplace_predict(X[validacion]).argmax(axis=1)
+    return indice, pliegue, float((prediccion == y[validacion]).mean()), segundos
+
+
+'''Successive halving'''
+
+def buscar(X, y, pesos, n_clases, rejilla=None, particiones=PARTICIONES, rondas_min=RONDAS_MIN,
+           rondas_max=RONDAS_MAX, eta=ETA, trabajadores=None, semilla=SEMILLA, salida=None):
+    """
+    Successive halving con validación cruzada en paralelo. Devuelve (lista de filas de
+    resultados con COLUMNAS_RESULTADOS, mejor fila).
+    """
+    salida = salida or sys.stderr
+    lista = candidatos(rejilla or REJILLA_DEFECTO)
+    nucleos = os.cpu_count() or 1
+    trabajadores = trabajadores or min(nucleos, len(lista) * particiones)
+    hilos = max(1, nucleos // trabajadores)
+    pesos = np.ones(len(y), dtype=np.float32) if pesos is None else pesos
+    arrays = {"X": np.ascontiguousarray(X, dtype=np.float32), "y": np.ascontiguousarray(y, dtype=np.int32),
+              "pesos": np.ascontiguousarray(pesos, dtype=np.float32)}
+    bloques, descriptores = {}, {}
+    for nombre, array in arrays.items():
+        bloques[nombre], descriptores[nombre] = compartir(array)
+    print(f"{len(lista)} candidatos, {particiones} particiones, {trabajadores} trabajadores con "
+          f"{hilos} hilos cada uno", file=salida)
+
+    resultados = []
+    try:
+        with ProcessPoolExecutor(trabajadores, initializer=_iniciar_trabajador,
+                                 initargs=(descriptores, n_clases, particiones, semilla, hilos)) as pool:
+            vivos, rondas, ronda = list(range(len(lista))), rondas_min, 0
+            while True:
+                inicio = time.perf_counter()
+                tareas = [pool.submit(_evaluar, i, lista[i], rondas, p) for i in vivos for p in range(particiones)]
+                por_candidato = {i: [] for i in vivos}
+                for tarea in tareas:
+                    i, _, accuracy, segundos = tarea.result()
+                    por_candidato[i].append((accuracy, segundos))
+                fila_ronda = []
+                for i, medidas in por_candidato.items():
+                    accuracies = np.array([m[0] for m in medidas])
+                    fila_ronda.append(dict(zip(COLUMNAS_RESULTADOS, [
+                        ronda, rondas, i, json.dumps(lista[i], sort_keys=True), float(accuracies.mean()),
+                        float(accuracies.std()), float(np.mean([m[1] for m in medidas]))])))
+                # Mejor accuracy primero; a igualdad, el que entrena más rápido
+                fila_ronda.sort(key=lambda f: (-f["accuracy_media"], f["segundos_fit"]))
+                resultados.extend(fila_ronda)
+                print(f"Ronda {ronda}: {len(vivos)} candidatos con {rondas} rondas de boosting en "
+                      f"{time.perf_counter() - inicio:.1f} s; mejor accuracy {fila_ronda[0]['accuracy_media']:.4f} "
+                      f"{fila_ronda[0]['parametros']}", file=salida)
+                if len(vivos) == 1 or rondas >= rondas_max:
+                    break
+                vivos = [f["candidato"] for f in fila_ronda[:max(1, math.ceil(len(vivos) / eta))]]
+                rondas, ronda = min(rondas * eta, rondas_max), ronda + 1
+    finally:
+        for bloque in bloques.values():
+            bloque.close()
+            bloque.unlink()
+    return resultados, resultados[-len(fila_ronda)]
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    import recomendador_AI
+
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros del recomendador AI")
+    parser.add_argument("--fichero", metavar="XLSX_O_CSV",
+                        help=f"Lee el dataset de un fichero en vez de la tabla {recomendador_AI.TABLA_ENTRENAMIENTO}")
+    parser.add_argument("--salida", default=recomendador_AI.BASE_DIR,
+                        help="Directorio donde se exportan los artefactos del mejor modelo")
+    parser.add_argument("--informe", metavar="DIR", help="Directorio de busqueda.csv, figuras y resultados.json")
+    parser.add_argument("--modo", choices=recomendador_AI.MODOS, default="pesos",
+                        help="Balanceo de train (por defecto pesos: con sobremuestreo las copias de una fila "
+                             "acaban en train y validación a la vez)")
+    parser.add_argument("--rejilla", metavar="JSON", help="Rejilla {parámetro: [valores]} de XGBoost")
+    parser.add_argument("--particiones", type=int, default=PARTICIONES)
+    parser.add_argument("--rondas-min", type=int, default=RONDAS_MIN, help="Rondas de boosting de la primera ronda")
+    parser.add_argument("--rondas-max", type=int, default=RONDAS_MAX, help="Rondas de boosting de la última ronda")
+    parser.add_argument("--eta", type=int, default=ETA, help="Factor de poda y de aumento de rondas")
+    parser.add_argument("--trabajadores", type=int, help="Procesos del pool (por defecto uno por núcleo)")
+    parser.add_argument("--sin-exportar", action="store_true", help="Solo busca, sin entrenar ni exportar el mejor")
+    parser.add_argument("--sin-figuras", action="store_true")
+    parser.add_argument("--sin-cache", action="store_true", help="No usa la caché del dataset")
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    informe = args.informe or os.path.join(args.salida, recomendador_AI.INFORME_DIR)
+    df, _ = recomendador_AI.leer_dataset_entrenamiento(args.fichero, None if args.sin_cache else args.salida)
+    datos = recomendador_AI.preparar_datos(df, args.modo)
+    inicio = time.perf_counter()
+    resultados, mejor = buscar(datos["X_train"], datos["y_train_encoded"], datos["pesos"],
+                               len(datos["label_encoder_y"].classes_),
+                               json.loads(args.rejilla) if args.rejilla else None, args.particiones,
+                               args.rondas_min, args.rondas_max, args.eta, args.trabajadores)
+    print(f"Búsqueda terminada en {time.perf_counter() - inicio:.1f} s", file=sys.stderr)
+
+    tabla = pd.DataFrame(resultados, columns=COLUMNAS_RESULTADOS)
+    os.makedirs(informe, exist_ok=True)
+    tabla.to_csv(os.path.join(informe, "busqueda.csv"), index=False)
+    print(tabla.sort_values(["ronda", "accuracy_media"], ascending=[False, False]).head(10).to_string(index=False))
+
+    parametros = {**json.loads(mejor["parametros"]), "n_estimators": mejor["rondas_boosting"]}
+    print(f"Mejor candidato: {parametros} (accuracy CV {mejor['accuracy_media']:.4f} ± {mejor['accuracy_std']:.4f})")
+    if not args.sin_exportar:
+        resumen = recomendador_AI.entrenar(df, args.salida, informe, not args.sin_figuras, parametros=parametros,
+                                           modo=args.modo,
+                                           cv_externa=(mejor["accuracy_media"], mejor["accuracy_std"]))
+        print(f"Accuracy en test del mejor modelo {resumen['scores']['Accuracy']:.2%}; "
+              f"artefactos en {args.salida}")
@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+'''Caché LRU de recomendaciones'''
+
+# Las respuestas al cuestionario se repiten mucho (unos cientos de combinaciones cubren
+# casi todo el tráfico), así que memorizamos el resultado de los recomendadores por la
+# tupla normalizada de las nueve respuestas. La caché tiene tamaño máximo con expulsión
+# LRU, cuenta aciertos/fallos/expulsiones y se vacía sola cuando cambia alguno de los
+# ficheros de los que dependen las recomendaciones (modelo, encoders, reglas...). Vaciarla
+# solo no basta si el recomendador tiene el modelo cargado en memoria: con recargar la
+# caché construye además un recomendador nuevo con los ficheros actuales y lo usa desde
+# entonces; si no se puede construir (p. ej. a mitad de un reentrenamiento) se sigue con
+# el anterior y se vuelve a intentar en la siguiente comprobación.
+
+TAMANO_DEFECTO = 1024
+
+# Cada cuánto (segundos) como mucho se miran los ficheros de los artefactos
+INTERVALO_COMPROBACION = 1.0
+
+
+def normalizar_respuestas(respuestas, columnas):
+    """
+    Tupla con las respuestas en el orden de las columnas: sin espacios sobrantes en los
+    textos, None para las que faltan y sin las claves que no usan los recomendadores.
+    """
+    return tuple(v.strip() if isinstance(v, str) else v
+                 for v in (respuestas.get(col) for col in columnas))
+
+
+class CacheRecomendaciones:
+    """
+    Caché LRU segura entre hilos delante de una función respuestas -> recomendaciones.
+    recargar, si se da, es una función sin argumentos que devuelve la función nueva
+    cuando cambian las fuentes.
+    """
+
+    def __init__(self, funcion, columnas, tamano=TAMANO_DEFECTO, fuentes=(),
+                 intervalo_comprobacion=INTERVALO_COMPROBACION, recargar=None):
+        if tamano < 1:
+            raise ValueError("El tamaño de la caché debe ser al menos 1")
+        self.funcion = funcion
+        self.columnas = list(columnas)
+        self.tamano = tamano
+        self.fuentes = list(fuentes)
+        self.intervalo_comprobacion = intervalo_comprobacion
+        self.recargar = recargar
+        # Cambia en cada vaciado: un resultado calculado antes no se guarda después
+        self._generacion = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self._firma = self._firma_fuentes()
+        self._ultima_comprobacion = time.monotonic()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.invalidaciones = 0
+
+    def _firma_fuentes(self):
+        firma = []
+        for path in self.fuentes:
+            try:
+                st = os.stat(path)
+                firma.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                firma.append(None)
+        return firma
+
+    def _comprobar_fuentes(self):
+        # Todo bajo el lock: dos hilos que llegan a la vez no miran los ficheros ni vacían
+        # la caché dos veces (el stat de unos pocos ficheros, como mucho una vez por intervalo)
+        with self._lock:
+            ahora = time.monotonic()
+            if ahora - self._ultima_comprobacion < self.intervalo_comprobacion:
+                return
+            self._ultima_comprobacion = ahora
+            firma = self._firma_fuentes()
+            if firma != self._firma:
+                if self.recargar is not None:
+                    try:
+                        self.funcion = self.recargar()
+                    except Exception as e:
+                        print(f"No se pudo recargar el recomendador, se sigue con el anterior: {e}", file=sys.stderr)
+                        return
+                self._firma = firma
+                self._vaciar()
+
+    def _vaciar(self):
+        self._datos.clear()
+        self._generacion += 1
+        self.invalidaciones += 1
+
+    def invalidar(self):
+        with self._lock:
+            self._vaciar()
+
+    def __call__(self, respuestas):
+        self._comprobar_fuentes()
+        clave = normalizar_respuestas(respuestas, self.columnas)
+        try:
+            with self._lock:
+                funcion, generacion = self.funcion, self._generacion
+                resultado = self._datos[clave]
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+            return dict(resultado)
+        except KeyError:
+            pass
+        except TypeError:  # algún valor no hashable, no se puede cachear
+            return funcion(respuestas)
+
+        # Calculamos fuera del lock; los errores no se cachean
+        resultado = funcion({col: v for col, v in zip(self.columnas, clave) if col in respuestas})
+        with self._lock:
+            self.fallos += 1
+            if generacion != self._generacion:  # se ha vaciado (o recargado) mientras tanto
+                return resultado
+            self._datos[clave] = dict(resultado)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.tamano:
+                self._datos.popitem(last=False)
+                self.expulsiones += 1
+        return resultado
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "tamano": len(self._datos),
+                "tamano_maximo": self.tamano,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "expulsiones": self.expulsiones,
+                "invalidaciones": self.invalidaciones,
+            }
@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+
+'''Caché en disco del dataset de entrenamiento'''
+
+# Leer DATASET_ENTRENAMIENTO_GRAFICOS entero (fetchall a tuplas y DataFrame) o parsear el
+# Excel del dataset cuesta bastante más que entrenar con él. Aquí guardamos el dataset
+# leído en un .npz junto a los artefactos, con la huella del origen con la que se leyó:
+#   - bbdd: número de filas y suma de hashtext de cada fila (una consulta agregada, sin
+#     traer las filas);
+#   - fichero: sha256 del contenido.
+# Si la huella no ha cambiado se carga el .npz y no se lee ni la tabla ni el Excel.
+# Las columnas con dtype de NumPy (números, booleanos, fechas) se guardan tal cual y las
+# de texto como códigos enteros (-1 para los nulos) más sus valores únicos; con el dtype
+# de cada columna anotado, el DataFrame leído es igual al original (python
+# cache_dataset.py lo comprueba con pd.testing.assert_frame_equal). El .npz se lee sin
+# pickle, así que una columna object con valores que no son texto no se puede guardar y
+# el dataset se queda sin caché.
+
+CACHE_DIR = "cache_dataset"
+
+# Versión del formato del .npz
+VERSION = 2
+
+
+def huella_bbdd(tabla, pool=None):
+    """
+    Huella barata de una tabla: número de filas y suma de los hash de sus filas.
+    """
+    from datos import conexion
+    with conexion(pool) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT count(*), coalesce(sum(hashtext(t::text)::bigint), 0) FROM {tabla} AS t")
+            filas, suma = cursor.fetchone()
+    return f"bbdd:{tabla.lower()}:{filas}:{suma}"
+
+
+def sha256_fichero(path):
+    """
+    sha256 del contenido de un fichero, leído por bloques.
+    """
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def huella_fichero(path):
+    return f"fichero:{sha256_fichero(path)}"
+
+
+def _columna_numpy(serie):
+    """
+    True si la columna tiene dtype de NumPy que np.savez guarda sin pickle.
+    """
+    return isinstance(serie.dtype, np.dtype) and serie.dtype.kind in "biufcmM"
+
+
+def guardar_dataset(df, path, huella):
+    """
+    Guarda el DataFrame y su huella; escribe a un temporal y renombra. Lanza ValueError
+    si alguna columna de texto tiene valores que no son texto.
+    """
+    import pandas as pd
+    arrays = {}
+    valores, inicios, tipos = [], [0], []
+    for i, col in enumerate(df.columns):
+        serie = df[col]
+        tipos.append(str(serie.dtype))
+        if _columna_numpy(serie):
+            arrays[f"columna_{i}"] = serie.to_numpy()
+            inicios.append(len(valores))
+            continue
+        nulos = pd.isna(serie).to_numpy()
+        presentes = serie[~nulos].to_numpy(dtype=object)
+        if not all(isinstance(v, str) for v in presentes):
+            raise ValueError(f"La columna {col!r} tiene valores que no son texto ni de un dtype de NumPy")
+        unicos, inversos = np.unique(presentes.astype(str), return_inverse=True)
+        codigos = np.full(len(serie), -1, dtype=np.int32)
+        codigos[~nulos] = inversos
+        arrays[f"codigos_{i}"] = codigos
+        valores.extend(unicos)
+        inicios.append(len(valores))
+    cabecera = {"version": VERSION, "huella": huella, "columnas": list(df.columns), "tipos": tipos,
+                "inicios": inicios}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, cabecera=np.array(json.dumps(cabecera, ensure_ascii=False)),
+             valores=np.array(valores, dtype=str), **arrays)
+    os.replace(tmp, path)
+
+
+def leer_dataset(path, huella):
+    """
+    DataFrame guardado en path si existe y se guardó con esta huella; si no, None.
+    """
+    import pandas as pd
+    try:
+        with np.load(path, allow_pickle=False) as datos:
+            cabecera = json.loads(str(datos["cabecera"]))
+            if cabecera.get("version") != VERSION or cabecera.get("huella") != huella:
+                return None
+            # Los valores de texto llevan un None al final para los códigos -1
+            valores = np.append(datos["valores"].astype(object), None)
+            inicios = cabecera["inicios"]
+            columnas = {}
+            for i, (col, tipo) in enumerate(zip(cabecera["columnas"], cabecera["tipos"])):
+                if f"columna_{i}" in datos:
+                    columnas[col] = pd.Series(datos[f"columna_{i}"], dtype=tipo)
+                    continue
+                codigos = datos[f"codigos_{i}"]
+                # Cada código se desplaza a su tramo de valores; los -1 apuntan al None final
+                decodificados = valores[np.where(codigos < 0, len(valores) - 1, codigos + inicios[i])]
+                columnas[col] = pd.Series(decodificados, dtype=object if tipo == "object" else tipo)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Caché de dataset {path} ilegible, se vuelve a leer el origen: {e}", file=sys.stderr)
+        return None
+    return pd.DataFrame(columnas, columns=cabecera["columnas"])
+
+
+def cargar_dataset(leer, huella, path):
+    """
+    Devuelve (DataFrame, desde_cache). leer() lee el origen si la caché no vale y
+    entonces se guarda con la huella actual.
+    """
+    df = leer_dataset(path, huella)
+    if df is not None:
+        return df, True
+    df = leer()
+    try:
+        guardar_dataset(df, path, huella)
+    except (OSError, ValueError) as e:
+        print(f"No se pudo guardar la caché de dataset en {path}: {e}", file=sys.stderr)
+    return df, False
+
+
+if __name__ == "__main__":
+    # Ida y vuelta por la caché con columnas de todos los tipos (y, con --bbdd, con el
+    # dataset de entrenamiento de la tabla): el DataFrame leído tiene que ser igual al guardado
+    import argparse
+    import tempfile
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Comprueba que la caché de dataset devuelve el mismo DataFrame")
+    parser.add_argument("--bbdd", action="store_true", help="Prueba también con DATASET_ENTRENAMIENTO_GRAFICOS")
+    args = parser.parse_args()
+
+    casos = {"tipos": pd.DataFrame({
+        "id": np.arange(5, dtype=np.int64),
+        "real": [0.5, np.nan, 2.0, 3.25, -1.0],
+        "booleano": [True, False, True, True, False],
+        "fecha": pd.to_datetime(["2024-01-01", "2024-02-01", None, "2024-03-01", "2024-04-01"]),
+        "texto_object": pd.Series(["a", None, "b", "a", "c"], dtype=object),
+        "texto": pd.Series(["x", "y", None, "x", ""], dtype="str"),
+    })}
+    if args.bbdd:
+        from recomendador_AI import fetch_dataset
+        casos["bbdd"] = fetch_dataset()
+    with tempfile.TemporaryDirectory() as directorio:
+        for nombre, df in casos.items():
+            path = os.path.join(directorio, nombre + ".npz")
+            guardar_dataset(df, path, "prueba")
+            pd.testing.assert_frame_equal(leer_dataset(path, "prueba"), df)
+            print(f"{nombre}: {df.shape[0]} filas x {df.shape[1]} columnas, igual tras la caché")
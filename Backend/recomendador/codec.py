@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import numpy as np
+
+'''Codec compacto de las respuestas del cuestionario'''
+
+# Sustituye en inferencia a los LabelEncoder de feature_encoders.sav y label_encoder_y.sav.
+# Cada respuesta se traduce a su código con un diccionario (en vez de buscar en
+# classes_ y llamar a transform) y los nueve códigos caben empaquetados en un único
+# entero (unos pocos bits por columna) que sirve como clave para hash, deduplicar y
+# cachear. Se guarda en JSON, así que cargarlo no necesita pickle ni sklearn.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CODEC_PATH = os.path.join(BASE_DIR, "codec.json")
+
+# Versión del formato de codec.json
+VERSION = 1
+
+
+class CodecCategorico:
+    """
+    Codificación de las nueve respuestas y de las etiquetas (gráficos).
+    """
+
+    def __init__(self, clases, etiquetas, firma=None):
+        self.columnas = list(clases)
+        self.clases = {col: [str(v) for v in valores] for col, valores in clases.items()}
+        self.etiquetas = [str(e) for e in etiquetas]
+        self.firma = firma or {}
+        for col, valores in self.clases.items():
+            if len(valores) > 256:
+                raise ValueError(f"La columna '{col}' tiene demasiadas clases para uint8: {len(valores)}")
+        # Diccionario valor -> código y array código -> valor por columna
+        self.codigos = {col: {v: i for i, v in enumerate(valores)} for col, valores in self.clases.items()}
+        self.valores = {col: np.array(valores, dtype=object) for col, valores in self.clases.items()}
+        self.codigos_etiqueta = {e: i for i, e in enumerate(self.etiquetas)}
+        self._etiquetas = np.array(self.etiquetas, dtype=object)
+        # Bits y desplazamiento de cada columna dentro de la clave empaquetada
+        self.bits = [max(1, (len(self.clases[col]) - 1).bit_length()) for col in self.columnas]
+        self.desplazamientos = [int(d) for d in np.cumsum([0] + self.bits[:-1])]
+        if sum(self.bits) > 63:
+            raise ValueError("Las respuestas no caben en una clave de 64 bits")
+
+    @classmethod
+    def desde_encoders(cls, encoders, label_encoder_y, required_columns, firma=None):
+        """
+        Construye el codec a partir de los LabelEncoder entrenados.
+        """
+        return cls({col: list(encoders[col].classes_) for col in required_columns},
+                   list(label_encoder_y.classes_), firma)
+
+    @property
+    def forma(self):
+        return tuple(len(self.clases[col]) for col in self.columnas)
+
+    def codificar(self, features):
+        """
+        Respuestas -> tupla de códigos en el orden de las columnas. Mismos errores que
+        recommend_AI para características ausentes o valores no vistos.
+        """
+        codigos = []
+        for col in self.columnas:
+            if col not in features:
+                raise ValueError(f"Falta la característica '{col}' en las características proporcionadas.")
+            value = features[col]
+            try:
+                codigo = self.codigos[col].get(value)
+            except TypeError:
+                codigo = None
+            if codigo is None:
+                raise ValueError(f"Valor inválido o no visto en la columna '{col}': {value}")
+            codigos.append(codigo)
+        return tuple(codigos)
+
+    def codificar_array(self, features):
+        return np.array(self.codificar(features), dtype=np.uint8)
+
+    def codificar_filas(self, filas):
+        """
+        Codifica de una vez un lote de filas con las respuestas en el orden de las columnas.
+        Devuelve (códigos (n, columnas) uint8, máscara de filas válidas); las filas con
+        algún valor ausente o no visto quedan marcadas como no válidas con códigos 0.
+        """
+        n = len(filas)
+        codigos = np.zeros((n, len(self.columnas)), dtype=np.int16)
+        for j, col in enumerate(self.columnas):
+            codigos_col = self.codigos[col]
+            codigos[:, j] = np.fromiter((codigos_col.get(fila[j], -1) for fila in filas), dtype=np.int16, count=n)
+        validas = (codigos >= 0).all(axis=1)
+        codigos[~validas] = 0
+        return codigos.astype(np.uint8), validas
+
+    def empaquetar(self, codigos):
+        """
+        Códigos -> clave entera. Con un array (n, columnas) devuelve un array de claves.
+        """
+        if isinstance(codigos, np.ndarray) and codigos.ndim == 2:
+            desplazamientos = np.array(self.desplazamientos, dtype=np.uint64)
+            return np.bitwise_or.reduce(codigos.astype(np.uint64) << desplazamientos, axis=1)
+        clave = 0
+        for codigo, desplazamiento in zip(codigos, self.desplazamientos):
+            clave |= int(codigo) << desplazamiento
+        return clave
+
+    def desempaquetar(self, clave):
+        """
+        Clave entera -> tupla de códigos.
+        """
+        clave = int(clave)
+        return tuple((clave >> d) & ((1 << b) - 1) for d, b in zip(self.desplazamientos, self.bits))
+
+    def clave(self, features):
+        return self.empaquetar(self.codificar(features))
+
+    def decodificar(self, codigos):
+        """
+        Tupla de códigos -> diccionario de respuestas.
+        """
+        return {col: self.clases[col][c] for col, c in zip(self.columnas, codigos)}
+
+    def etiqueta(self, codigo):
+        return self.etiquetas[int(codigo)]
+
+    def etiquetas_de(self, codigos):
+        """
+        Decodifica un array de códigos de etiqueta de una vez.
+        """
+        return self._etiquetas[np.asarray(codigos, dtype=np.intp)]
+
+    def a_dict(self):
+        return {"version": VERSION, "columnas": self.columnas, "clases": self.clases,
+                "etiquetas": self.etiquetas, "firma": self.firma}
+
+    @classmethod
+    def desde_dict(cls, datos):
+        if datos.get("version") != VERSION:
+            raise ValueError(f"Versión de codec no soportada: {datos.get('version')}")
+        clases = {col: datos["clases"][col] for col in datos["columnas"]}
+        return cls(clases, datos["etiquetas"], datos.get("firma"))
+
+    def guardar(self, path=CODEC_PATH):
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.a_dict(), f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+
+def cargar_codec(path=CODEC_PATH):
+    with open(path, encoding='utf-8') as f:
+        return CodecCategorico.desde_dict(json.load(f))
+
+
+if __name__ == "__main__":
+    # Regenera codec.json a partir de feature_encoders.sav y label_encoder_y.sav
+    import warnings
+    warnings.simplefilter('ignore')
+    import pickle
+    import recomendador
+    from tensor_recomendaciones import firma_fuentes
+
+    with open(recomendador.ENCODER_PATH, 'rb') as f:
+        encoders = pickle.load(f)
+    with open(recomendador.LABEL_ENCODER_PATH, 'rb') as f:
+        label_encoder_y = pickle.load(f)
+    firma = firma_fuentes([recomendador.ENCODER_PATH, recomendador.LABEL_ENCODER_PATH])
+    codec = CodecCategorico.desde_encoders(encoders, label_encoder_y, recomendador.REQUIRED_COLUMNS, firma)
+    codec.guardar()
+    print(f"Codec guardado en {CODEC_PATH} ({sum(codec.bits)} bits por clave)", file=sys.stderr)
@@ -0,0 +1,222 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+
+'''Acceso a la bbdd del recomendador con un pool de conexiones'''
+
+# En un proceso de larga duración (modo --serve) abrir una conexión por consulta cuesta
+# más que la propia consulta, así que las conexiones se reutilizan desde un pool.
+# La configuración sale de las variables DB_* del entorno y, si no están definidas, de
+# Backend/.env (el mismo fichero que carga server.js con dotenv); lo que no esté en
+# ninguno de los dos toma los valores con los que se ha trabajado en local.
+
+# Columnas de respuestas que reciben los recomendadores, en el orden de la tabla
+COLUMNAS_RESPUESTAS = ['n_dimensiones',
+    'tipo_datos',
+    'ordenadas',
+    'n_grupos_alto',
+    'relacion',
+    'obs_grupo',
+    'proposito',
+    'dataset_size',
+    'contexto']
+
+SQL_RESPUESTAS = "SELECT id, " + ", ".join(COLUMNAS_RESPUESTAS) + " FROM respuestas"
+
+POOL_MIN = int(os.environ.get("DB_POOL_MIN", 1))
+POOL_MAX = int(os.environ.get("DB_POOL_MAX", 4))
+
+ENV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env")
+
+
+def leer_env(path=ENV_PATH):
+    """
+    Variables de un fichero .env (líneas CLAVE=valor, # para comentarios). Si no existe, {}.
+    """
+    variables = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for linea in f:
+                linea = linea.strip()
+                if not linea or linea.startswith("#") or "=" not in linea:
+                    continue
+                clave, valor = linea.split("=", 1)
+                variables[clave.strip()] = valor.strip().strip('"').strip("'")
+    except FileNotFoundError:
+        pass
+    return variables
+
+
+def parametros_conexion(env_path=ENV_PATH):
+    """
+    Parámetros de psycopg2: el entorno manda sobre .env y .env sobre los valores locales.
+    """
+    variables = {**leer_env(env_path), **os.environ}
+    return dict(
+        dbname=variables.get("DB_NAME", "vizquest"),
+        user=variables.get("DB_USER", "ipizarro"),
+        password=variables.get("DB_PASSWORD", "ipizarro"),
+        host=variables.get("DB_HOST", "localhost"),
+        port=int(variables.get("DB_PORT", 5432)),
+        options="-c client_encoding=UTF8"
+    )
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool():
+    """
+    Pool de conexiones compartido por el proceso (se crea en el primer uso). psycopg2 se
+    importa aquí para no pagarlo al arrancar si no se llega a consultar la bbdd.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                import psycopg2.pool
+                _pool = psycopg2.pool.ThreadedConnectionPool(POOL_MIN, POOL_MAX, **parametros_conexion())
+    return _pool
+
+
+def cerrar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+@contextmanager
+def conexion(pool=None):
+    """
+    Presta una conexión del pool y la devuelve al terminar. Si hay error se hace
+    rollback y, si la conexión se ha roto, se descarta en vez de devolverla al pool.
+    Cualquier objeto con getconn/putconn sirve como pool (p. ej. un doble en pruebas).
+    """
+    pool = pool or obtener_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
+
+
+def _fila_a_respuestas(row):
+    return dict(zip(COLUMNAS_RESPUESTAS, row[1:]))
+
+
+def fetch_responses(id, pool=None):
+    """
+    Respuestas del cuestionario de un id, listas para los recomendadores.
+    """
+    with conexion(pool) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(SQL_RESPUESTAS + " WHERE id = %s", (id,))
+            row = cursor.fetchone()
+
+    if not row:
+        raise ValueError(f"Responses not found for the ID {id}")
+
+    return _fila_a_respuestas(row)
+
+
+def fetch_responses_many(ids, pool=None):
+    """
+    Respuestas de varios ids en una sola consulta. Devuelve {id: respuestas}; los ids
+    que no existen no aparecen en el resultado.
+    """
+    ids = [int(i) for i in ids]
+    if not ids:
+        return {}
+    with conexion(pool) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(SQL_RESPUESTAS + " WHERE id = ANY(%s)", (ids,))
+            rows = cursor.fetchall()
+    return {row[0]: _fila_a_respuestas(row) for row in rows}
+
+
+def guardar_respuestas(respuestas, grafico_recomendado, pool=None):
+    """
+    Inserta las respuestas junto con el gráfico recomendado en un único
+    INSERT ... RETURNING y devuelve el id creado.
+    """
+    columnas = COLUMNAS_RESPUESTAS + ['grafico_recomendado']
+    valores = [respuestas.get(col) for col in COLUMNAS_RESPUESTAS] + [grafico_recomendado]
+    sql = ("INSERT INTO respuestas (" + ", ".join(columnas) + ") VALUES ("
+           + ", ".join(["%s"] * len(columnas)) + ") RETURNING id")
+    with conexion(pool) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, valores)
+            return cursor.fetchone()[0]
+
+
+def valor_grafico(rule_based, ai_based):
+    """
+    Valor de grafico_recomendado: el JSON de las dos recomendaciones, tal como lo
+    imprimía recomendador.py y lo guardaba server.js.
+    """
+    return json.dumps({"rule_based": rule_based, "ai_based": ai_based})
+
+
+def etiqueta_grafico(valor):
+    """
+    Recomendación por reglas de un grafico_recomendado guardado (el JSON de valor_grafico).
+    Un valor que no es ese JSON se devuelve tal cual.
+    """
+    if not isinstance(valor, str) or not valor.lstrip().startswith("{"):
+        return valor
+    try:
+        recomendaciones = json.loads(valor)
+    except ValueError:
+        return valor
+    return recomendaciones.get("rule_based") if isinstance(recomendaciones, dict) else valor
+
+
+def leer_respuestas_por_bloques(desde=0, tamano=5000, pool=None):
+    """
+    Recorre la tabla respuestas en orden de id a partir de un id (excluido) con un cursor
+    con nombre (del lado del servidor), así que la tabla nunca se carga entera en memoria.
+    Genera listas de hasta tamano filas (id, respuestas..., grafico_recomendado).
+    """
+    sql = ("SELECT id, " + ", ".join(COLUMNAS_RESPUESTAS) + ", grafico_recomendado"
+           " FROM respuestas WHERE id > %s ORDER BY id")
+    with conexion(pool) as conn:
+        with conn.cursor(name="recalculo_respuestas") as cursor:
+            cursor.itersize = tamano
+            cursor.execute(sql, (desde,))
+            while True:
+                filas = cursor.fetchmany(tamano)
+                if not filas:
+                    break
+                yield filas
+
+
+def actualizar_graficos(pares, pool=None):
+    """
+    Escribe (id, grafico_recomendado) en bloque: se cargan con execute_values en una
+    tabla temporal y se aplican con un único UPDATE ... FROM en la misma transacción.
+    Devuelve el número de filas de respuestas actualizadas.
+    """
+    if not pares:
+        return 0
+    from psycopg2.extras import execute_values
+    with conexion(pool) as conn:
+        with conn.cursor() as cursor:
+            # La tabla temporal vive lo que la conexión del pool y se vacía en cada commit
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS recalculo_graficos "
+                           "(id integer PRIMARY KEY, grafico_recomendado character varying(400)) "
+                           "ON COMMIT DELETE ROWS")
+            execute_values(cursor, "INSERT INTO recalculo_graficos (id, grafico_recomendado) VALUES %s",
+                           pares, page_size=len(pares))
+            cursor.execute("UPDATE respuestas AS r SET grafico_recomendado = s.grafico_recomendado "
+                           "FROM recalculo_graficos AS s WHERE r.id = s.id "
+                           "AND r.grafico_recomendado IS DISTINCT FROM s.grafico_recomendado")
+            return cursor.rowcount
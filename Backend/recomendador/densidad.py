@@ -0,0 +1,364 @@
+import os
+import sys
+import math
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+'''Estimación de densidad (KDE) por bins y FFT para Density plot, Violin plot y Ridge line'''
+
+# Varias ramas de recommend_rule eligen Density plot, Violin plot o Ridge line justo
+# cuando dataset_size es Big, y el KDE directo del front (kernelDensityEstimator de
+# miscomponentesd3.js) cuesta filas x puntos por grupo. Aquí se calcula en el servidor
+# con el KDE por bins:
+#   - primera pasada por bloques: filas, mínimo, máximo, media y varianza de cada grupo
+#     de la columna categórica (o de toda la columna si no hay grupos), vectorizado con
+#     np.bincount sobre los códigos de grupo;
+#   - el ancho de banda de cada grupo sale de la regla (scott o silverman, solo con la
+#     desviación típica) o es un número fijo, y todos los grupos comparten una rejilla
+#     de REJILLA puntos que cubre los datos más el soporte del núcleo más ancho;
+#   - segunda pasada: cada valor reparte su peso entre los dos puntos de la rejilla que
+#     lo rodean (binning lineal), una matriz grupos x REJILLA acumulada con np.bincount;
+#   - la convolución con el núcleo de cada grupo es un producto de rfft: todas las filas
+#     de la matriz de una vez, en lotes de GRUPOS_LOTE grupos. Con la transformada de
+#     longitud 2 * REJILLA la convolución circular no mezcla los extremos. Con muchos
+#     grupos los lotes se reparten en un pool de procesos.
+# El coste es el de leer el fichero más grupos x REJILLA log REJILLA, no filas x puntos.
+# Cada curva se devuelve con PUNTOS puntos sobre el mismo eje x para todos los grupos y
+# es una densidad (integra 1). Los núcleos son el de Epanechnikov (el del front) y el
+# gaussiano; con una regla el ancho de banda es la desviación típica del núcleo, así que
+# el de Epanechnikov tiene semiancho sqrt(5) veces mayor, y un número fijo es el parámetro
+# del núcleo tal cual (el k de kernelEpanechnikov(k), la sigma del gaussiano). La
+# desviación típica del núcleo nunca baja de un paso de la rejilla.
+#
+#   python densidad.py datos.csv --valor inmigrations --grupo country_birth_region
+#   python densidad.py datos.parquet --valor edad --nucleo gaussiano --ancho 2.5 --trabajadores 4
+
+NUCLEOS = ("epanechnikov", "gaussiano")
+NUCLEO = "epanechnikov"
+REGLAS_ANCHO = ("scott", "silverman")
+REGLA_ANCHO = "scott"
+
+# Puntos de la rejilla común y de cada curva devuelta
+REJILLA = 1024
+PUNTOS = 100
+
+# Grupos por lote de FFT, y grupos a partir de los que se usa el pool de procesos
+GRUPOS_LOTE = 256
+GRUPOS_POOL = 4 * GRUPOS_LOTE
+
+# Desviaciones típicas del núcleo gaussiano que se cubren a cada lado de los datos
+SOPORTE_GAUSSIANO = 4
+
+
+class MomentosGrupos:
+    """
+    Filas, mínimo, máximo, media y suma de cuadrados de las desviaciones de cada grupo,
+    acumulados por bloques (fusión de Chan vectorizada). Los grupos se numeran en el
+    orden en que aparecen.
+    """
+
+    def __init__(self):
+        self.indices = {}
+        self.nombres = []
+        self.n = np.zeros(0)
+        self.media = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.minimo = np.zeros(0)
+        self.maximo = np.zeros(0)
+
+    def codigos(self, codigos_bloque, valores_bloque, nuevos=True):
+        """
+        Códigos del bloque (de pd.factorize o dictionary_encode) a índices de grupo.
+        """
+        if nuevos:
+            for valor in valores_bloque:
+                if valor not in self.indices:
+                    self.indices[valor] = len(self.nombres)
+                    self.nombres.append(valor)
+        return np.array([self.indices[v] for v in valores_bloque], dtype=np.intp)[codigos_bloque]
+
+    def _crecer(self, grupos):
+        nuevos = grupos - len(self.n)
+        if nuevos <= 0:
+            return
+        self.n, self.media, self.m2 = (np.concatenate([a, np.zeros(nuevos)]) for a in (self.n, self.media, self.m2))
+        self.minimo = np.concatenate([self.minimo, np.full(nuevos, np.inf)])
+        self.maximo = np.concatenate([self.maximo, np.full(nuevos, -np.inf)])
+
+    def actualizar(self, grupos, valores):
+        self._crecer(len(self.nombres))
+        k = len(self.nombres)
+        n = np.bincount(grupos, minlength=k).astype(np.float64)
+        presentes = n > 0
+        media = np.divide(np.bincount(grupos, valores, minlength=k), n, out=np.zeros(k), where=presentes)
+        m2 = np.bincount(grupos, (valores - media[grupos]) ** 2, minlength=k)
+        total = self.n + n
+        delta = media - self.media
+        fraccion = np.divide(n, total, out=np.zeros(k), where=total > 0)
+        self.m2 += m2 + delta * delta * self.n * fraccion
+        self.media += delta * fraccion
+        self.n = total
+        np.minimum.at(self.minimo, grupos, valores)
+        np.maximum.at(self.maximo, grupos, valores)
+
+    @property
+    def desviacion(self):
+        return np.sqrt(np.divide(self.m2, self.n, out=np.zeros(len(self.n)), where=self.n > 0))
+
+
+def anchos_banda(momentos, regla=REGLA_ANCHO, nucleo=NUCLEO):
+    """
+    Parámetro del núcleo de cada grupo (semiancho de Epanechnikov o sigma gaussiana),
+    antes de aplicar el mínimo de la rejilla.
+    """
+    if isinstance(regla, (int, float, np.number)) and not isinstance(regla, bool):
+        if regla <= 0:
+            raise ValueError(f"El ancho de banda tiene que ser positivo: {regla}")
+        return np.full(len(momentos.n), float(regla))
+    n = np.maximum(momentos.n, 1)
+    if regla == "scott":
+        factor = n ** (-1 / 5)
+    elif regla == "silverman":
+        factor = (n * 3 / 4) ** (-1 / 5)
+    else:
+        raise ValueError(f"Regla de ancho de banda desconocida: {regla!r} (se admiten "
+                         f"{', '.join(REGLAS_ANCHO)} o un número)")
+    desviacion_nucleo = factor * momentos.desviacion
+    return desviacion_nucleo * math.sqrt(5) if nucleo == "epanechnikov" else desviacion_nucleo
+
+
+def soporte(anchos, nucleo):
+    return anchos if nucleo == "epanechnikov" else SOPORTE_GAUSSIANO * anchos
+
+
+def _nucleo(distancias, anchos, nucleo):
+    """
+    Núcleo de cada grupo (filas) en las distancias (columnas), con área 1.
+    """
+    return _nucleo_filas(distancias[None, :], anchos, nucleo)
+
+
+def _nucleo_filas(distancias, anchos, nucleo):
+    """
+    Núcleo en una matriz de distancias, con el ancho de banda de cada fila.
+    """
+    u = distancias / anchos[:, None]
+    if nucleo == "epanechnikov":
+        valores = np.where(u <= 1, 0.75 * (1 - u * u), 0.0)
+    elif nucleo == "gaussiano":
+        valores = np.exp(-0.5 * u * u) / math.sqrt(2 * math.pi)
+    else:
+        raise ValueError(f"Núcleo desconocido: {nucleo!r} (se admiten {', '.join(NUCLEOS)})")
+    return valores / anchos[:, None]
+
+
+def convolucionar(cuentas, anchos, paso, nucleo):
+    """
+    Densidad en la rejilla de cada fila de cuentas (pesos del binning lineal) con el
+    núcleo de su ancho de banda: producto de rfft en lotes de GRUPOS_LOTE filas. Sin
+    normalizar por el número de filas de cada grupo.
+    """
+    grupos, puntos = cuentas.shape
+    longitud = 2 * puntos
+    # Distancia circular de cada desplazamiento: los índices altos son desplazamientos negativos
+    desplazamientos = np.arange(longitud)
+    distancias = np.minimum(desplazamientos, longitud - desplazamientos) * paso
+    resultado = np.empty_like(cuentas)
+    for inicio in range(0, grupos, GRUPOS_LOTE):
+        lote = slice(inicio, inicio + GRUPOS_LOTE)
+        transformada = np.fft.rfft(cuentas[lote], longitud, axis=1)
+        transformada *= np.fft.rfft(_nucleo(distancias, anchos[lote], nucleo), axis=1)
+        resultado[lote] = np.fft.irfft(transformada, longitud, axis=1)[:, :puntos]
+    # El redondeo de la FFT deja valores negativos minúsculos donde la densidad es 0
+    return np.maximum(resultado, 0, out=resultado)
+
+
+# Estado de cada proceso trabajador (lo rellena _iniciar_trabajador)
+_trabajador = {}
+
+
+def _iniciar_trabajador(descriptores, paso, nucleo):
+    from busqueda import adjuntar
+    bloques, arrays = {}, {}
+    for nombre, descriptor in descriptores.items():
+        bloques[nombre], arrays[nombre] = adjuntar(descriptor)
+    _trabajador.update(bloques=bloques, paso=paso, nucleo=nucleo, **arrays)
+
+
+def _convolucionar_lote(inicio, fin):
+    t = _trabajador
+    t["densidad"][inicio:fin] = convolucionar(t["cuentas"][inicio:fin], t["anchos"][inicio:fin], t["paso"],
+                                              t["nucleo"])
+    return fin - inicio
+
+
+def _convolucionar_en_pool(cuentas, anchos, paso, nucleo, trabajadores):
+    """
+    convolucionar repartido por lotes de GRUPOS_LOTE grupos en un pool de procesos. Las
+    cuentas y el resultado van en memoria compartida (las de busqueda.py), así que a los
+    trabajadores solo se les pasan los límites de cada lote.
+    """
+    from busqueda import compartir
+    bloques, descriptores = {}, {}
+    try:
+        for nombre, array in (("cuentas", cuentas), ("anchos", anchos), ("densidad", np.zeros_like(cuentas))):
+            bloques[nombre], descriptores[nombre] = compartir(array)
+        with ProcessPoolExecutor(trabajadores, initializer=_iniciar_trabajador,
+                                 initargs=(descriptores, paso, nucleo)) as pool:
+            tareas = [pool.submit(_convolucionar_lote, inicio, inicio + GRUPOS_LOTE)
+                      for inicio in range(0, len(cuentas), GRUPOS_LOTE)]
+            for tarea in tareas:
+                tarea.result()
+        return np.ndarray(cuentas.shape, dtype=cuentas.dtype, buffer=bloques["densidad"].buf).copy()
+    finally:
+        for bloque in bloques.values():
+            bloque.close()
+            bloque.unlink()
+
+
+def densidades(path, valor, grupo=None, regla=REGLA_ANCHO, nucleo=NUCLEO, puntos=PUNTOS, rejilla=REJILLA,
+               trabajadores=None, filas_bloque=None, sep=None):
+    """
+    Curvas de densidad de la columna valor, una por grupo de la columna grupo (o una sola).
+    Devuelve (filas, descartadas, eje x, lista de dicts por grupo con n, ancho_banda,
+    estadísticas y densidad).
+    """
+    from agregacion import FILAS_BLOQUE, leer_columnas
+    if nucleo not in NUCLEOS:
+        raise ValueError(f"Núcleo desconocido: {nucleo!r} (se admiten {', '.join(NUCLEOS)})")
+    columnas = [valor] + ([grupo] if grupo else [])
+    categoricas = [grupo] if grupo else []
+
+    def bloques():
+        for bloque in leer_columnas(path, columnas, filas_bloque or FILAS_BLOQUE, sep, categoricas):
+            valores = bloque[0]
+            validas = np.isfinite(valores)
+            if grupo:
+                codigos, nombres = bloque[1]
+            else:
+                codigos, nombres = np.zeros(len(valores), dtype=np.intp), [None]
+            yield valores[validas], codigos[validas], nombres, int((~validas).sum())
+
+    momentos = MomentosGrupos()
+    filas = descartadas = 0
+    for valores, codigos, nombres, sin_valor in bloques():
+        filas += len(valores) + sin_valor
+        descartadas += sin_valor
+        momentos.actualizar(momentos.codigos(codigos, nombres), valores)
+    # Grupos que solo tenían filas sin valor
+    con_filas = np.flatnonzero(momentos.n > 0)
+    if not len(con_filas):
+        raise ValueError(f"Ninguna fila tiene valores numéricos en {valor}")
+
+    minimo, maximo = float(momentos.minimo[con_filas].min()), float(momentos.maximo[con_filas].max())
+    # La desviación del núcleo no baja del paso de la rejilla sin márgenes (con un solo valor, 1)
+    paso_minimo = (maximo - minimo) / (rejilla - 1) or 1.0
+    minimo_ancho = paso_minimo if nucleo == "gaussiano" else paso_minimo * math.sqrt(5)
+    anchos = np.maximum(anchos_banda(momentos, regla, nucleo), minimo_ancho)
+    margen = float(soporte(anchos[con_filas], nucleo).max())
+    inicio, fin = minimo - margen, maximo + margen
+    paso = (fin - inicio) / (rejilla - 1)
+
+    # Binning lineal: cada valor reparte su peso entre los dos puntos de la rejilla vecinos
+    cuentas = np.zeros(len(momentos.n) * rejilla)
+    for valores, codigos, nombres, _ in bloques():
+        posiciones = (valores - inicio) / paso
+        izquierda = np.clip(np.floor(posiciones).astype(np.intp), 0, rejilla - 2)
+        peso = posiciones - izquierda
+        celdas = momentos.codigos(codigos, nombres, nuevos=False) * rejilla + izquierda
+        cuentas += np.bincount(np.concatenate([celdas, celdas + 1]), np.concatenate([1 - peso, peso]),
+                               minlength=len(cuentas))
+    cuentas = cuentas.reshape(-1, rejilla)[con_filas]
+
+    trabajadores = trabajadores or os.cpu_count() or 1
+    if trabajadores > 1 and len(con_filas) >= GRUPOS_POOL:
+        densidad = _convolucionar_en_pool(cuentas, anchos[con_filas], paso, nucleo, trabajadores)
+    else:
+        densidad = convolucionar(cuentas, anchos[con_filas], paso, nucleo)
+    densidad /= momentos.n[con_filas, None]
+
+    # Curvas de tamaño fijo: interpolación lineal de la rejilla en puntos equiespaciados
+    posiciones = np.linspace(0, rejilla - 1, puntos)
+    izquierda = np.minimum(posiciones.astype(np.intp), rejilla - 2)
+    peso = posiciones - izquierda
+    curvas = densidad[:, izquierda] * (1 - peso) + densidad[:, izquierda + 1] * peso
+    eje = inicio + posiciones * paso
+
+    desviacion = momentos.desviacion
+    resultado = [{"grupo": momentos.nombres[g], "n": int(momentos.n[g]), "ancho_banda": float(anchos[g]),
+                  "min": float(momentos.minimo[g]), "max": float(momentos.maximo[g]),
+                  "media": float(momentos.media[g]), "desviacion": float(desviacion[g]),
+                  "densidad": curva.tolist()}
+                 for g, curva in zip(con_filas, curvas)]
+    return filas, descartadas, eje, resultado
+
+
+def kde_directo(path, valor, grupo, eje, curvas, nucleo=NUCLEO, filas_bloque=20000, sep=None):
+    """
+    KDE exacto (filas x puntos) en los puntos de eje con los anchos de banda de curvas
+    (las de densidades), para comprobar el KDE por bins. Matriz grupos x puntos.
+    """
+    from agregacion import leer_columnas
+    indice = {c["grupo"]: i for i, c in enumerate(curvas)}
+    anchos = np.array([c["ancho_banda"] for c in curvas])
+    suma = np.zeros((len(curvas), len(eje)))
+    for bloque in leer_columnas(path, [valor] + ([grupo] if grupo else []), filas_bloque, sep,
+                                [grupo] if grupo else []):
+        valores = bloque[0]
+        if grupo:
+            codigos, nombres = bloque[1]
+            filas = np.array([indice.get(v, -1) for v in nombres], dtype=np.intp)[codigos]
+        else:
+            filas = np.zeros(len(valores), dtype=np.intp)
+        validas = np.isfinite(valores) & (filas >= 0)
+        valores, filas = valores[validas], filas[validas]
+        distancias = np.abs(eje[None, :] - valores[:, None])
+        np.add.at(suma, filas, _nucleo_filas(distancias, anchos[filas], nucleo))
+    return suma / np.array([c["n"] for c in curvas])[:, None]
+
+
+def _regla(texto):
+    try:
+        return float(texto)
+    except ValueError:
+        return texto
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Curvas de densidad por grupo (KDE por bins y FFT) de un CSV, "
+                                                 "Parquet o Arrow")
+    parser.add_argument("fichero")
+    parser.add_argument("--valor", required=True, help="Columna numérica")
+    parser.add_argument("--grupo", help="Columna categórica: una curva por valor")
+    parser.add_argument("--ancho", type=_regla, default=REGLA_ANCHO,
+                        help=f"{', '.join(REGLAS_ANCHO)} o el parámetro del núcleo")
+    parser.add_argument("--nucleo", choices=NUCLEOS, default=NUCLEO)
+    parser.add_argument("--puntos", type=int, default=PUNTOS, help="Puntos de cada curva")
+    parser.add_argument("--rejilla", type=int, default=REJILLA, help="Puntos de la rejilla del KDE")
+    parser.add_argument("--trabajadores", type=int, help="Procesos del pool (por defecto uno por núcleo)")
+    parser.add_argument("--comprobar", action="store_true",
+                        help="Compara con el KDE directo (filas x puntos) en los puntos de las curvas y lo cronometra")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    filas, descartadas, eje, grupos = densidades(args.fichero, args.valor, args.grupo, args.ancho, args.nucleo,
+                                                 args.puntos, args.rejilla, args.trabajadores)
+    segundos = time.perf_counter() - inicio
+    for g in grupos[:20]:
+        print(f"{str(g['grupo']):30s} n={g['n']:>10d}  ancho de banda {g['ancho_banda']:.4g}  "
+              f"máximo {max(g['densidad']):.4g}")
+    if len(grupos) > 20:
+        print(f"... y {len(grupos) - 20} grupos más")
+    print(f"{filas} filas ({descartadas} sin valor), {len(grupos)} curvas de {args.puntos} puntos en {segundos:.2f} s",
+          file=sys.stderr)
+
+    if args.comprobar:
+        inicio = time.perf_counter()
+        directo = kde_directo(args.fichero, args.valor, args.grupo, eje, grupos, args.nucleo)
+        segundos_directo = time.perf_counter() - inicio
+        por_bins = np.array([g["densidad"] for g in grupos])
+        error = np.abs(por_bins - directo).max(axis=1) / directo.max(axis=1)
+        print(f"KDE directo en {segundos_directo:.2f} s; error máximo del KDE por bins (relativo al pico de "
+              f"cada curva): {error.max():.2e}")
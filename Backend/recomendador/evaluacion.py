@@ -0,0 +1,185 @@
+import os
+import json
+import sqlite3
+import datetime
+import numpy as np
+
+'''Evaluación del recomendador AI a partir de la matriz de confusión'''
+
+# Todas las métricas por clase (TP, FP, FN, TN, precisión, recall, especificidad, F1) y
+# sus medias macro salen de la matriz de confusión con operaciones sobre arrays, en una
+# sola pasada y sin bucles por clase. Las medias macro siguen el criterio de sklearn:
+# solo cuentan las clases que aparecen en las etiquetas reales o en las predichas, y una
+# división por cero vale 0.
+# El resultado es un DataFrame en formato largo (conjunto, clase, métrica, valor) que se
+# puede añadir tal cual a un fichero SQLite de scores: una fila por ejecución en
+# ejecuciones y sus métricas en metricas, con índices para consultar la evolución de una
+# métrica sin leer el resto.
+
+METRICAS_CLASE = ["tp", "fp", "fn", "tn", "soporte", "precision", "recall", "especificidad", "f1"]
+METRICAS_MACRO = ["precision", "recall", "especificidad", "f1"]
+MACRO = "macro"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS ejecuciones (
+    id INTEGER PRIMARY KEY,
+    fecha TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    datos TEXT
+);
+CREATE TABLE IF NOT EXISTS metricas (
+    ejecucion INTEGER NOT NULL REFERENCES ejecuciones (id),
+    conjunto TEXT NOT NULL,
+    clase TEXT NOT NULL,
+    metrica TEXT NOT NULL,
+    valor REAL
+);
+CREATE INDEX IF NOT EXISTS ejecuciones_modelo ON ejecuciones (modelo, fecha);
+CREATE INDEX IF NOT EXISTS metricas_consulta ON metricas (metrica, clase, conjunto, ejecucion);
+"""
+
+
+def matriz_confusion(y_true, y_pred, n_clases):
+    """
+    Matriz de confusión (reales en filas, predichas en columnas) con un solo bincount.
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    y_pred = np.asarray(y_pred, dtype=np.int64)
+    return np.bincount(y_true * n_clases + y_pred, minlength=n_clases * n_clases).reshape(n_clases, n_clases)
+
+
+def _dividir(numerador, denominador):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominador > 0, numerador / np.where(denominador > 0, denominador, 1), 0.0)
+
+
+def metricas_confusion(cm):
+    """
+    Métricas por clase {métrica: array} y accuracy a partir de la matriz de confusión.
+    """
+    cm = np.asarray(cm, dtype=np.float64)
+    tp = np.diag(cm)
+    predichas = cm.sum(axis=0)
+    soporte = cm.sum(axis=1)
+    fp = predichas - tp
+    fn = soporte - tp
+    tn = cm.sum() - tp - fp - fn
+    por_clase = {
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn, "soporte": soporte,
+        "precision": _dividir(tp, predichas),
+        "recall": _dividir(tp, soporte),
+        "especificidad": _dividir(tn, tn + fp),
+        "f1": _dividir(2 * tp, 2 * tp + fp + fn),
+    }
+    accuracy = float(tp.sum() / cm.sum()) if cm.sum() else 0.0
+    return por_clase, accuracy
+
+
+def medias_macro(por_clase):
+    """
+    Media macro de cada métrica sobre las clases presentes (reales o predichas).
+    """
+    presentes = (por_clase["soporte"] + por_clase["fp"]) > 0
+    return {m: float(por_clase[m][presentes].mean()) if presentes.any() else 0.0 for m in METRICAS_MACRO}
+
+
+def informe(y_true, y_pred, etiquetas, conjunto="test"):
+    """
+    DataFrame largo (conjunto, clase, metrica, valor) con las métricas de cada clase, sus
+    medias macro y la accuracy, y la matriz de confusión.
+    """
+    import pandas as pd
+    n_clases = len(etiquetas)
+    cm = matriz_confusion(y_true, y_pred, n_clases)
+    por_clase, accuracy = metricas_confusion(cm)
+    valores = np.stack([por_clase[m] for m in METRICAS_CLASE], axis=1)
+    tabla = pd.DataFrame({
+        "conjunto": conjunto,
+        "clase": np.repeat(np.asarray(etiquetas, dtype=object), len(METRICAS_CLASE)),
+        "metrica": np.tile(METRICAS_CLASE, n_clases),
+        "valor": valores.ravel(),
+    })
+    macro = medias_macro(por_clase)
+    resumen = pd.DataFrame({"conjunto": conjunto, "clase": MACRO,
+                            "metrica": ["accuracy"] + list(macro), "valor": [accuracy] + list(macro.values())})
+    return pd.concat([tabla, resumen], ignore_index=True), cm
+
+
+def resumen_macro(tabla, conjunto="test"):
+    """
+    {métrica: valor} de las filas macro de un conjunto del informe.
+    """
+    filas = tabla[(tabla["conjunto"] == conjunto) & (tabla["clase"] == MACRO)]
+    return dict(zip(filas["metrica"], filas["valor"].astype(float)))
+
+
+def plot_matrizconfusion(titulo, cm, etiquetas, path):
+    """
+    Guarda la matriz de confusión con el número de casos en cada celda (backend Agg).
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib import pyplot as plt
+    fig, ax = plt.subplots(figsize=(12, 10))
+    im = ax.imshow(cm, interpolation='nearest', cmap=plt.cm.Blues)
+    fig.colorbar(im, ax=ax)
+    n_clases = cm.shape[0]
+    ax.set(yticks=np.arange(n_clases), xticks=np.arange(n_clases),
+           yticklabels=etiquetas, xticklabels=etiquetas)
+    plt.setp(ax.get_xticklabels(), rotation=90, ha='center')
+    for i, j in zip(*np.nonzero(cm)):
+        ax.text(j, i, str(cm[i, j]), ha='center', va='center', color='black', fontsize=8)
+    ax.set_xlabel('Etiquetas Predichas')
+    ax.set_ylabel('Etiquetas Verdaderas')
+    ax.set_title(f'Matriz de Confusión {titulo}')
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+'''Fichero de scores'''
+
+def _conectar(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(ESQUEMA)
+    return conn
+
+
+def guardar_scores(path, modelo, tabla, datos=None):
+    """
+    Añade una ejecución y todas las filas del informe al fichero SQLite de scores en una
+    transacción. Devuelve el id de la ejecución.
+    """
+    conn = _conectar(path)
+    try:
+        with conn:
+            cursor = conn.execute("INSERT INTO ejecuciones (fecha, modelo, datos) VALUES (?, ?, ?)",
+                                  (datetime.datetime.now().isoformat(timespec='seconds'), modelo,
+                                   json.dumps(datos or {}, ensure_ascii=False, default=str)))
+            ejecucion = cursor.lastrowid
+            conn.executemany("INSERT INTO metricas (ejecucion, conjunto, clase, metrica, valor) VALUES (?, ?, ?, ?, ?)",
+                             ((ejecucion, c, str(k), m, float(v)) for c, k, m, v in
+                              tabla[["conjunto", "clase", "metrica", "valor"]].itertuples(index=False)))
+        return ejecucion
+    finally:
+        conn.close()
+
+
+def leer_scores(path, metrica="accuracy", clase=MACRO, conjunto="test", modelo=None):
+    """
+    Evolución de una métrica por ejecución: DataFrame (ejecucion, fecha, modelo, valor).
+    """
+    import pandas as pd
+    sql = ("SELECT e.id AS ejecucion, e.fecha, e.modelo, m.valor FROM metricas AS m "
+           "JOIN ejecuciones AS e ON e.id = m.ejecucion "
+           "WHERE m.metrica = ? AND m.clase = ? AND m.conjunto = ?")
+    parametros = [metrica, clase, conjunto]
+    if modelo is not None:
+        sql += " AND e.modelo = ?"
+        parametros.append(modelo)
+    conn = _conectar(path)
+    try:
+        return pd.read_sql_query(sql + " ORDER BY e.id", conn, params=parametros)
+    finally:
+        conn.close()
@@ -0,0 +1,278 @@
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import warnings
+import numpy as np
+
+'''Reentrenamiento incremental del recomendador AI con las respuestas nuevas'''
+
+# El servidor guarda en respuestas el grafico_recomendado de cada petición para alimentar
+# el dataset del recomendador AI. Este trabajo no reentrena desde cero: lee solo las
+# filas de respuestas con id mayor que la marca guardada junto a los artefactos y sigue
+# el boosting del XGBOOST_F.sav existente unas rondas más (xgb.train con xgb_model=).
+# La etiqueta de cada fila es la recomendación por reglas del JSON de grafico_recomendado
+# (datos.etiqueta_grafico), pasada a los nombres del modelo con ETIQUETAS_MODELO: la
+# tabla de reglas llama a algunos gráficos de otra forma que label_encoder_y. Las filas
+# repetidas se colapsan en una sola con su número de repeticiones como peso (los
+# gradientes suman lo mismo), así que el coste depende de las filas nuevas y no del
+# tamaño del dataset completo.
+#
+# Los encoders no cambian: una etiqueta que no está en label_encoder_y o un valor de
+# respuesta que no conocen los encoders no se pueden aprender sin reentrenar desde cero,
+# así que se rechaza la ejecución sin escribir nada (con --omitir-desconocidas esas
+# filas se descartan y se sigue con el resto). Los artefactos se escriben con
+# recomendador_AI.guardar_artefactos (manifiesto el último) y la marca se
+# actualiza después; si algo falla antes, la siguiente ejecución vuelve a leer las
+# mismas filas.
+#
+# La marca tiene que empezar en el mayor id de respuestas que ya está en el dataset con
+# el que se entrenó el modelo; si no, la primera ejecución volvería a aprender todo el
+# histórico. Por eso sin fichero de marca la ejecución se rechaza hasta que se indique
+# --desde (--desde 0 si el modelo no ha visto ninguna fila de respuestas).
+#
+#   python incremental.py                          # artefactos y marca en el directorio del recomendador
+#   python incremental.py --desde 851              # primera ejecución: ids > 851
+#   python incremental.py --rondas 20 --simular    # entrena y evalúa sin escribir
+#   python incremental.py --comprobar              # codifica todas las filas guardadas, sin entrenar
+
+MARCA_INCREMENTAL = "XGBOOST_F.marca"
+RONDAS = 10
+TAMANO_BLOQUE = 5000
+
+# Gráficos de reglas.json que label_encoder_y conoce con otro nombre
+ETIQUETAS_MODELO = {
+    "Histograma": "Histogram",
+    "Scatter": "Scatter plot",
+    "Scatter with marginal point": "Scatter Plot with Marginal Points",
+}
+
+# Parámetros de los árboles que se copian de la configuración del booster existente
+PARAMETROS_ARBOL = ["eta", "max_depth", "min_child_weight", "subsample", "gamma", "lambda", "alpha",
+                    "colsample_bytree", "colsample_bylevel", "colsample_bynode", "max_delta_step",
+                    "max_leaves", "max_bin", "grow_policy"]
+
+
+def cargar_modelo(directorio):
+    """
+    (modelo, encoders, label_encoder_y) de los .sav del directorio.
+    """
+    import recomendador_AI
+    artefactos = []
+    for nombre in (recomendador_AI.MODELO_SAV, recomendador_AI.ENCODERS_SAV, recomendador_AI.LABEL_ENCODER_SAV):
+        with open(os.path.join(directorio, nombre), 'rb') as f:
+            artefactos.append(pickle.load(f))
+    return tuple(artefactos)
+
+
+def leer_nuevas(desde, tamano=TAMANO_BLOQUE, pool=None):
+    """
+    Filas de respuestas con id > desde que tienen grafico_recomendado. Devuelve
+    (filas en el orden de COLUMNAS_RESPUESTAS, etiquetas con los nombres del modelo,
+    último id leído o desde).
+    """
+    from datos import leer_respuestas_por_bloques, etiqueta_grafico
+    filas, etiquetas, ultimo = [], [], desde
+    for bloque in leer_respuestas_por_bloques(desde, tamano, pool):
+        ultimo = bloque[-1][0]
+        for fila in bloque:
+            etiqueta = etiqueta_grafico(fila[-1])
+            if etiqueta is not None:
+                filas.append(fila[1:-1])
+                etiquetas.append(ETIQUETAS_MODELO.get(etiqueta, etiqueta))
+    return filas, etiquetas, ultimo
+
+
+def _codificar_columna(encoder, valores):
+    """
+    Códigos de valores con un LabelEncoder ajustado y máscara de los que conoce.
+    """
+    clases = encoder.classes_
+    posiciones = np.searchsorted(clases, valores).clip(0, len(clases) - 1)
+    return posiciones, clases[posiciones] == valores
+
+
+def codificar_nuevas(filas, etiquetas, encoders, label_encoder_y, columnas, omitir_desconocidas=False):
+    """
+    Codifica las filas nuevas con los encoders existentes. Devuelve (X, y, descartadas).
+    Si hay etiquetas o valores desconocidos lanza ValueError, salvo con
+    omitir_desconocidas, que descarta esas filas.
+    """
+    from datos import COLUMNAS_RESPUESTAS
+    valores = np.array(filas, dtype=object).reshape(len(filas), len(COLUMNAS_RESPUESTAS)).astype(str)
+    X = np.empty((len(filas), len(columnas)), dtype=np.int64)
+    validas = np.ones(len(filas), dtype=bool)
+    desconocidos = {}
+    for j, col in enumerate(columnas):
+        columna = valores[:, COLUMNAS_RESPUESTAS.index(col)]
+        X[:, j], conocidos = _codificar_columna(encoders[col], columna)
+        if not conocidos.all():
+            desconocidos[col] = sorted(set(columna[~conocidos]))
+        validas &= conocidos
+    etiquetas = np.array(etiquetas, dtype=str)
+    y, conocidas = _codificar_columna(label_encoder_y, etiquetas)
+    if not conocidas.all():
+        desconocidos["grafico_recomendado"] = sorted(set(etiquetas[~conocidas]))
+    validas &= conocidas
+
+    if desconocidos and not omitir_desconocidas:
+        detalle = "; ".join(f"{col}: {', '.join(v)}" for col, v in desconocidos.items())
+        raise ValueError(f"{int((~validas).sum())} filas nuevas con valores que el modelo no conoce ({detalle}). "
+                         "Hay que reentrenar desde cero con recomendador_AI.py o descartarlas con "
+                         "--omitir-desconocidas")
+    return X[validas], y[validas], int((~validas).sum())
+
+
+def colapsar(X, y):
+    """
+    Filas únicas (X, y) con su número de repeticiones como peso.
+    """
+    unicas, repeticiones = np.unique(np.column_stack([X, y]), axis=0, return_counts=True)
+    return unicas[:, :-1], unicas[:, -1], repeticiones.astype(np.float32)
+
+
+def parametros_booster(booster, n_clases):
+    """
+    Parámetros de entrenamiento del booster existente (objetivo y árboles) para seguir
+    el boosting con los mismos.
+    """
+    configuracion = json.loads(booster.save_config())["learner"]
+    arbol = configuracion["gradient_booster"].get("tree_train_param", {})
+    parametros = {p: arbol[p] for p in PARAMETROS_ARBOL if arbol.get(p, "") != ""}
+    parametros.update(objective=configuracion["learner_train_param"]["objective"], num_class=n_clases)
+    return parametros
+
+
+def continuar(modelo, X, y, pesos=None, rondas=RONDAS, parametros=None):
+    """
+    Añade rondas de boosting al modelo con (X, y). Se usa xgb.train porque el lote nuevo
+    no suele tener todas las clases y XGBClassifier.fit las deduce de y. Devuelve
+    (XGBClassifier nuevo, segundos de entrenamiento); el modelo original no se modifica.
+    """
+    import xgboost as xgb
+    booster = modelo.get_booster()
+    n_clases = len(modelo.classes_)
+    configuracion = {**parametros_booster(booster, n_clases), **(parametros or {})}
+    dtrain = xgb.DMatrix(X, label=y, weight=pesos, feature_names=booster.feature_names)
+    inicio = time.perf_counter()
+    nuevo_booster = xgb.train(configuracion, dtrain, num_boost_round=rondas, xgb_model=booster)
+    segundos = time.perf_counter() - inicio
+    nuevo = xgb.XGBClassifier()
+    nuevo.load_model(bytearray(nuevo_booster.save_raw("ubj")))
+    return nuevo, segundos
+
+
+def comprobar(directorio, tamano=TAMANO_BLOQUE, pool=None):
+    """
+    Lee y codifica todas las filas guardadas en respuestas con los encoders del
+    directorio, sin entrenar. Devuelve el número de filas; lanza ValueError si alguna
+    tiene etiquetas o valores que el modelo no conoce.
+    """
+    import recomendador_AI
+    filas, etiquetas, _ = leer_nuevas(0, tamano, pool)
+    modelo, encoders, label_encoder_y = cargar_modelo(directorio)
+    columnas = list(modelo.get_booster().feature_names or recomendador_AI.COLUMNAS_CARACTERISTICAS)
+    codificar_nuevas(filas, etiquetas, encoders, label_encoder_y, columnas)
+    return len(filas)
+
+
+def incremental(directorio, rondas=RONDAS, parametros=None, omitir_desconocidas=False, simular=False,
+                tamano=TAMANO_BLOQUE, pool=None, salida=None, desde=None):
+    """
+    Lee las respuestas nuevas desde la marca de directorio (o desde el id desde, si se
+    da), sigue el boosting del modelo y guarda los artefactos y la marca. Devuelve un
+    resumen con filas, tiempos y la accuracy sobre las filas nuevas antes y después.
+    Lanza ValueError si no hay marca ni desde.
+    """
+    import recomendador_AI
+    from recalcular import leer_marca, guardar_marca
+    salida = salida or sys.stderr
+    marca = os.path.join(directorio, MARCA_INCREMENTAL)
+    if desde is None:
+        if not os.path.exists(marca):
+            raise ValueError(f"No existe la marca {marca}. En la primera ejecución hay que indicar con --desde "
+                             "el mayor id de respuestas que ya está en el dataset de entrenamiento "
+                             "(--desde 0 para aprender todo el histórico)")
+        desde = leer_marca(marca)
+    tiempos = {}
+
+    with recomendador_AI.etapa("lectura", tiempos):
+        filas, etiquetas, ultimo = leer_nuevas(desde, tamano, pool)
+    resumen = {"desde": desde, "hasta": ultimo, "filas": len(filas), "descartadas": 0, "filas_unicas": 0,
+               "rondas": 0, "tiempos": tiempos}
+    if not filas:
+        print(f"No hay respuestas nuevas con grafico_recomendado desde el id {desde}", file=salida)
+        if not simular and ultimo != desde:
+            guardar_marca(marca, ultimo)
+        return resumen
+
+    with recomendador_AI.etapa("codificacion", tiempos):
+        modelo, encoders, label_encoder_y = cargar_modelo(directorio)
+        columnas = list(modelo.get_booster().feature_names or recomendador_AI.COLUMNAS_CARACTERISTICAS)
+        X, y, descartadas = codificar_nuevas(filas, etiquetas, encoders, label_encoder_y, columnas,
+                                             omitir_desconocidas)
+        X_unicas, y_unicas, pesos = colapsar(X, y)
+    resumen.update(descartadas=descartadas, filas_unicas=len(y_unicas))
+    if descartadas:
+        print(f"{descartadas} filas descartadas por valores desconocidos", file=salida)
+    if len(y):
+        with recomendador_AI.etapa("entrenamiento", tiempos):
+            nuevo, segundos = continuar(modelo, X_unicas, y_unicas, pesos, rondas, parametros)
+        resumen.update(rondas=rondas, segundos_fit=segundos,
+                       rondas_totales=nuevo.get_booster().num_boosted_rounds(),
+                       accuracy_antes=float((modelo.predict(X) == y).mean()),
+                       accuracy_despues=float((nuevo.predict(X) == y).mean()))
+        if not simular:
+            with recomendador_AI.etapa("guardado", tiempos):
+                recomendador_AI.guardar_artefactos(nuevo, encoders, label_encoder_y, columnas, directorio)
+    if not simular:
+        guardar_marca(marca, ultimo)
+    return resumen
+
+
+if __name__ == "__main__":
+    import recomendador_AI
+
+    parser = argparse.ArgumentParser(description="Reentrenamiento incremental del recomendador AI")
+    parser.add_argument("--salida", default=recomendador_AI.BASE_DIR,
+                        help=f"Directorio de los artefactos y de la marca {MARCA_INCREMENTAL}")
+    parser.add_argument("--rondas", type=int, default=RONDAS, help="Rondas de boosting que se añaden")
+    parser.add_argument("--parametros", metavar="JSON", default="{}",
+                        help="Parámetros de xgboost que sustituyen a los del modelo, p. ej. '{\"eta\": 0.1}'")
+    parser.add_argument("--omitir-desconocidas", action="store_true",
+                        help="Descarta las filas con etiquetas o valores desconocidos en vez de abortar")
+    parser.add_argument("--desde", type=int,
+                        help="Lee los ids mayores que este en vez de los de la marca; hace falta en la "
+                             "primera ejecución (el mayor id que ya está en el dataset de entrenamiento)")
+    parser.add_argument("--bloque", type=int, default=TAMANO_BLOQUE, help="Filas leídas por bloque")
+    parser.add_argument("--simular", action="store_true", help="Entrena y evalúa sin escribir artefactos ni marca")
+    parser.add_argument("--comprobar", action="store_true",
+                        help="Solo comprueba que el modelo conoce las etiquetas y valores de todas las filas guardadas")
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    if args.comprobar:
+        try:
+            n = comprobar(args.salida, args.bloque)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        print(f"Las {n} filas con grafico_recomendado se pueden codificar con los encoders de {args.salida}")
+        sys.exit(0)
+
+    try:
+        resumen = incremental(args.salida, args.rondas, json.loads(args.parametros), args.omitir_desconocidas,
+                              args.simular, args.bloque, desde=args.desde)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    print(f"Respuestas con id {resumen['desde']} < id <= {resumen['hasta']}: {resumen['filas']} filas, "
+          f"{resumen['descartadas']} descartadas, {resumen['filas_unicas']} únicas")
+    if resumen["rondas"]:
+        print(f"  {resumen['rondas']} rondas más ({resumen['rondas_totales']} en total) en "
+              f"{resumen['segundos_fit']:.2f} s; accuracy en las filas nuevas "
+              f"{resumen['accuracy_antes']:.2%} -> {resumen['accuracy_despues']:.2%}")
+    print(f"Tiempo total {sum(resumen['tiempos'].values()):.2f} s" + (" (simulado)" if args.simular else ""),
+          file=sys.stderr)
@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+
+'''Modelo XGBoost en formato nativo (UBJSON) con su manifiesto'''
+
+# XGBOOST_F.sav es un XGBClassifier serializado con pickle: cargarlo es lento, depende de
+# las versiones exactas de xgboost/sklearn con que se guardó y ejecuta código arbitrario.
+# Aquí exportamos el booster con save_model en UBJSON (el formato nativo de xgboost, que se
+# carga sin sklearn) y al lado un manifiesto JSON con el orden de las características, las
+# clases de cada encoder, las etiquetas y el sha256 del modelo. Con el manifiesto se
+# reconstruye el codec, así que ni el modelo ni los encoders necesitan pickle.
+# numpy y xgboost se importan al cargar, no al importar el módulo.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELO_NATIVO_PATH = os.path.join(BASE_DIR, "XGBOOST_F.ubj")
+MANIFIESTO_MODELO_PATH = os.path.join(BASE_DIR, "XGBOOST_F.manifiesto.json")
+# Los mismos árboles volcados a arrays para evaluarlos sin xgboost (arboles_numpy.py)
+ARBOLES_PATH = os.path.join(BASE_DIR, "XGBOOST_F.arboles.npz")
+
+# Versión del formato del manifiesto
+VERSION = 1
+
+
+def exportar_modelo(modelo, codec, modelo_path=MODELO_NATIVO_PATH, manifiesto_path=MANIFIESTO_MODELO_PATH):
+    """
+    Guarda el booster de un XGBClassifier (o un Booster) en UBJSON y su manifiesto.
+    codec es el CodecCategorico de los encoders con los que se entrenó el modelo.
+    Ambos ficheros se escriben a un temporal y se renombran.
+    """
+    from cache_dataset import sha256_fichero
+    booster = modelo.get_booster() if hasattr(modelo, "get_booster") else modelo
+    if booster.num_features() != len(codec.columnas):
+        raise ValueError(f"El modelo espera {booster.num_features()} características y el codec tiene {len(codec.columnas)}")
+    if booster.feature_names and list(booster.feature_names) != codec.columnas:
+        raise ValueError(f"Orden de características distinto en modelo y codec: {booster.feature_names}")
+
+    # save_model decide el formato por la extensión, así que el temporal la conserva
+    tmp_modelo = modelo_path + ".tmp.ubj"
+    booster.save_model(tmp_modelo)
+    configuracion = json.loads(booster.save_config())["learner"]
+    manifiesto = {
+        "version": VERSION,
+        "formato": "ubj",
+        "fichero": os.path.basename(modelo_path),
+        "sha256": sha256_fichero(tmp_modelo),
+        "xgboost": __import__("xgboost").__version__,
+        "objetivo": configuracion["objective"]["name"],
+        "n_clases": int(configuracion["learner_model_param"]["num_class"]),
+        "columnas": codec.columnas,
+        "clases": codec.clases,
+        "etiquetas": codec.etiquetas,
+    }
+    os.replace(tmp_modelo, modelo_path)
+    tmp_manifiesto = manifiesto_path + ".tmp"
+    with open(tmp_manifiesto, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_manifiesto, manifiesto_path)
+    return manifiesto
+
+
+def codec_de_manifiesto(manifiesto):
+    """
+    Codec de las respuestas y etiquetas con las clases guardadas en el manifiesto.
+    """
+    from codec import CodecCategorico
+    return CodecCategorico({col: manifiesto["clases"][col] for col in manifiesto["columnas"]},
+                           manifiesto["etiquetas"])
+
+
+class ModeloNativo:
+    """
+    Booster cargado desde UBJSON con la misma interfaz predict que el XGBClassifier
+    (devuelve los códigos de etiqueta) y el codec de su manifiesto.
+    """
+
+    def __init__(self, booster, manifiesto):
+        self.booster = booster
+        self.manifiesto = manifiesto
+        self.codec = codec_de_manifiesto(manifiesto)
+
+    def predict_proba(self, X):
+        import numpy as np
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return self.booster.inplace_predict(X)
+
+    def predict(self, X):
+        return self.predict_proba(X).argmax(axis=1)
+
+
+def validar_manifiesto(manifiesto, booster):
+    """
+    Comprueba una sola vez, al cargar, que el booster y el manifiesto encajan.
+    """
+    if manifiesto.get("version") != VERSION:
+        raise ValueError(f"Versión de manifiesto no soportada: {manifiesto.get('version')}")
+    columnas = manifiesto["columnas"]
+    if set(manifiesto["clases"]) != set(columnas):
+        raise ValueError("El manifiesto no tiene las clases de todas las columnas")
+    if booster.num_features() != len(columnas):
+        raise ValueError(f"El modelo espera {booster.num_features()} características y el manifiesto tiene {len(columnas)}")
+    if booster.feature_names and list(booster.feature_names) != columnas:
+        raise ValueError(f"Orden de características distinto en modelo y manifiesto: {booster.feature_names}")
+    if manifiesto["n_clases"] != len(manifiesto["etiquetas"]):
+        raise ValueError(f"El modelo tiene {manifiesto['n_clases']} clases y el manifiesto {len(manifiesto['etiquetas'])} etiquetas")
+    if manifiesto["objetivo"] != "multi:softprob":
+        raise ValueError(f"Objetivo no soportado: {manifiesto['objetivo']}")
+
+
+def cargar_modelo_nativo(modelo_path=MODELO_NATIVO_PATH, manifiesto_path=MANIFIESTO_MODELO_PATH):
+    """
+    Carga el modelo nativo verificando su sha256 y su manifiesto.
+    """
+    import xgboost as xgb
+    from cache_dataset import sha256_fichero
+    with open(manifiesto_path, encoding='utf-8') as f:
+        manifiesto = json.load(f)
+    sha = sha256_fichero(modelo_path)
+    if sha != manifiesto.get("sha256"):
+        raise ValueError(f"El modelo {modelo_path} no coincide con el sha256 de su manifiesto")
+    booster = xgb.Booster(model_file=modelo_path)
+    validar_manifiesto(manifiesto, booster)
+    return ModeloNativo(booster, manifiesto)
+
+
+if __name__ == "__main__":
+    # Exporta XGBOOST_F.sav y los encoders actuales al formato nativo
+    import warnings
+    warnings.simplefilter('ignore')
+    import numpy as np
+    import recomendador
+
+    modelo, codec, _ = recomendador.cargar_artefactos(usar_codec=True, usar_nativo=False)
+    manifiesto = exportar_modelo(modelo, codec)
+    # Comprobamos que el modelo exportado predice lo mismo en todas las combinaciones
+    nativo = cargar_modelo_nativo()
+    codigos = np.indices(codec.forma).reshape(len(codec.forma), -1).T
+    diferencias = int((nativo.predict(codigos) != modelo.predict(codigos)).sum())
+    print(f"Modelo nativo guardado en {MODELO_NATIVO_PATH} (sha256 {manifiesto['sha256'][:12]}); "
+          f"{diferencias} diferencias en {len(codigos)} combinaciones", file=sys.stderr)
+    sys.exit(1 if diferencias else 0)
@@ -0,0 +1,584 @@
+import os
+import sys
+import csv
+import json
+import argparse
+import numpy as np
+
+'''Perfilado de un CSV, Parquet o Arrow para responder automáticamente el cuestionario'''
+
+# FileUploader.js parsea el CSV entero en el navegador y solo deduce el tipo de cada
+# columna y el número de registros; el resto de respuestas que dependen de los datos
+# (dataset_size, n_dimensiones, obs_grupo, ordenadas, n_grupos_alto) las contesta el
+# usuario. Aquí se recorre el CSV por bloques con pandas (memoria acotada por el tamaño
+# del bloque, sirve para ficheros de varios GB) y se deducen todas:
+#   - tipo de cada columna: con una muestra se decide Numeric (el mismo patrón numérico
+#     que FileUploader.js), temporal (fechas con un formato deducido de la muestra) o
+#     Categorical, y en la pasada completa se confirma en cada bloque. Si la muestra se
+#     equivoca la columna pasa a Categorical y los grupos se recalculan en una segunda
+#     pasada. Las columnas temporales cuentan como numéricas en tipo_datos (en
+#     FileUploader.js salían categóricas);
+#   - ordenadas: alguna columna temporal, o numérica monótona en todo el fichero;
+#   - grupos: las filas se agrupan por las columnas categóricas; obs_grupo es Several si
+#     algún grupo tiene más de una fila y n_grupos_alto es Yes con más de
+#     UMBRAL_GRUPOS_ALTO grupos.
+# Los valores distintos se cuentan con hashes de 64 bits y con un límite: pasado
+# LIMITE_DISTINTOS se deja de contar (la cardinalidad se da como cota inferior).
+# respuestas_cuestionario traduce el perfil a las nueve respuestas con las mismas
+# preguntas que hace Questionnaire.js; proposito y contexto no salen de los datos.
+#
+#   python perfilado.py datos.csv --proposito Distribution --contexto Exploration
+#   python perfilado.py datos.csv --columnas fecha ventas --proposito Evolution --contexto "Technical report" --recomendar
+#   python perfilado.py datos.parquet --proposito Ranking --contexto "Technical presentation"   # también .arrow/.feather
+
+FILAS_BLOQUE = 100000
+FILAS_MUESTRA = 10000
+UMBRAL_GRUPOS_ALTO = 10
+LIMITE_DISTINTOS = 100000
+
+# Mismo criterio que FileUploader.js: sin espacios, coma decimal como punto
+PATRON_NUMERO = r'-?\d+(\.\d+)?([eE][-+]?\d+)?'
+
+NO_APLICA = "Not applicable"
+NUMERIC = "Numeric"
+CATEGORICAL = "Categorical"
+
+
+def tamano_dataset(filas):
+    """
+    Mismos cortes que App.js: menos de 100 filas Small, hasta 10000 Medium, más Big.
+    """
+    if filas < 100:
+        return "Small"
+    return "Medium" if filas <= 10000 else "Big"
+
+
+def dimensiones(n_columnas):
+    if n_columnas < 1:
+        raise ValueError("Hay que perfilar al menos una columna")
+    return {1: "1D", 2: "2D", 3: "3D"}.get(n_columnas, "3D+")
+
+
+def tipo_datos(n_numericas, n_categoricas):
+    """
+    Mismas combinaciones que App.js.
+    """
+    if n_categoricas == 0:
+        return NUMERIC
+    if n_numericas == 0:
+        return CATEGORICAL
+    if n_numericas == 1:
+        return "1NUM1CAT" if n_categoricas == 1 else "1NUM2+CAT"
+    return "1CAT+2+NUM"
+
+
+'''Lectura por bloques'''
+
+def detectar_separador(path, encoding="utf-8-sig"):
+    """
+    Separador del CSV a partir de su comienzo (como hace Papa), por defecto la coma.
+    """
+    with open(path, encoding=encoding, newline='') as f:
+        inicio = f.read(1 << 16)
+    try:
+        return csv.Sniffer().sniff(inicio, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+
+def leer_bloques(path, columnas=None, sep=None, filas_bloque=FILAS_BLOQUE, nrows=None, encoding="utf-8-sig"):
+    """
+    Bloques del CSV como DataFrames de texto (sin convertir vacíos a NaN).
+    """
+    import pandas as pd
+    return pd.read_csv(path, sep=sep or detectar_separador(path, encoding), usecols=columnas, dtype=str,
+                       na_filter=False, chunksize=filas_bloque, nrows=nrows, encoding=encoding)
+
+
+def _normalizar_numeros(valores):
+    return valores.str.replace(r'\s', '', regex=True).str.replace(',', '.', regex=False)
+
+
+class ConteoHashes:
+    """
+    Cuántas veces aparece cada clave (hash de 64 bits), hasta limite claves distintas.
+    Pasado el límite solo se sigue sabiendo si hay claves repetidas dentro de cada bloque.
+    """
+
+    def __init__(self, limite=LIMITE_DISTINTOS):
+        self.limite = limite
+        self.claves = np.empty(0, dtype=np.uint64)
+        self.veces = np.empty(0, dtype=np.int64)
+        self.exacto = True
+        self.repetidas = False
+
+    def anadir(self, hashes):
+        claves, veces = np.unique(hashes, return_counts=True)
+        if len(claves) < len(hashes):
+            self.repetidas = True
+        if not self.exacto:
+            return
+        todas, inversa = np.unique(np.concatenate([self.claves, claves]), return_inverse=True)
+        veces = np.bincount(inversa, weights=np.concatenate([self.veces, veces]), minlength=len(todas))
+        if len(todas) < len(self.claves) + len(claves):
+            self.repetidas = True
+        if len(todas) > self.limite:
+            self.exacto = False
+            return
+        self.claves, self.veces = todas, veces.astype(np.int64)
+
+    @property
+    def distintas(self):
+        return len(self.claves)
+
+    @property
+    def max_veces(self):
+        return int(self.veces.max()) if len(self.veces) else 0
+
+
+class PerfilColumna:
+    """
+    Estado de una columna a lo largo de la pasada: tipo confirmado, vacíos, orden y
+    valores distintos.
+    """
+
+    def __init__(self, nombre, muestra):
+        from pandas.tseries.api import guess_datetime_format
+        self.nombre = nombre
+        self.vacios = 0
+        self.creciente = self.decreciente = True
+        self.ultimo = None
+        self.distintos = ConteoHashes()
+        no_vacios = muestra[muestra != ""]
+        self.tipo = CATEGORICAL
+        self.formato_fecha = None
+        if len(no_vacios) == 0:
+            return
+        if _normalizar_numeros(no_vacios).str.fullmatch(PATRON_NUMERO).all():
+            self.tipo = NUMERIC
+            return
+        formato = guess_datetime_format(no_vacios.iloc[0])
+        if formato and self._fechas(no_vacios, formato).notna().all():
+            self.tipo, self.formato_fecha = NUMERIC, formato
+
+    @property
+    def temporal(self):
+        return self.formato_fecha is not None
+
+    @staticmethod
+    def _fechas(valores, formato):
+        import pandas as pd
+        return pd.to_datetime(valores, format=formato, errors='coerce')
+
+    def _numeros(self, valores):
+        """
+        Valores del bloque como float64 (fechas en ns), o None si alguno no lo es.
+        """
+        if self.temporal:
+            fechas = self._fechas(valores, self.formato_fecha)
+            if not fechas.notna().all():
+                return None
+            return fechas.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(np.float64)
+        # Solo se normalizan (espacios, coma decimal) los valores que no son ya números
+        directos = valores.str.fullmatch(PATRON_NUMERO).to_numpy(dtype=bool)
+        if not directos.all():
+            valores = valores.copy()
+            valores[~directos] = _normalizar_numeros(valores[~directos])
+            if not valores[~directos].str.fullmatch(PATRON_NUMERO).all():
+                return None
+        try:
+            # Con cadenas de pyarrow (pandas >= 3 si está instalado) el cast no pasa por Python
+            return valores.astype("float64[pyarrow]").to_numpy(dtype=np.float64)
+        except (ImportError, TypeError):
+            return valores.astype(np.float64).to_numpy()
+
+    def _degradar(self):
+        # Los distintos contados hasta aquí eran valores numéricos: se recuentan como texto
+        # en la segunda pasada
+        self.tipo, self.formato_fecha = CATEGORICAL, None
+        self.creciente = self.decreciente = False
+        self.distintos = ConteoHashes()
+
+    def actualizar(self, valores):
+        """
+        Procesa un bloque de la columna. Devuelve False si el bloque contradice el tipo
+        deducido de la muestra (y la columna pasa a Categorical).
+        """
+        vacio = (valores == "").to_numpy()
+        self.vacios += int(vacio.sum())
+        no_vacios = valores[~vacio]
+        if self.tipo != NUMERIC:
+            self.distintos.anadir(_hashes(no_vacios))
+            return True
+        numeros = self._numeros(no_vacios)
+        if numeros is None:
+            self._degradar()
+            return False
+        # Los distintos de una columna numérica se cuentan sobre los valores (sin hash)
+        self.distintos.anadir(numeros.view(np.uint64))
+        if self.creciente or self.decreciente:
+            if self.ultimo is not None:
+                numeros = np.concatenate([[self.ultimo], numeros])
+            diferencias = np.diff(numeros)
+            self.creciente &= bool((diferencias >= 0).all())
+            self.decreciente &= bool((diferencias <= 0).all())
+            self.ultimo = numeros[-1]
+        return True
+
+    @property
+    def ordenada(self):
+        # Temporal, o numérica monótona y no constante
+        if self.temporal:
+            return True
+        return self.tipo == NUMERIC and (self.creciente or self.decreciente) and self.distintos.distintas > 1
+
+    def resumen(self):
+        return {"tipo": self.tipo, "temporal": self.temporal, "ordenada": self.ordenada, "vacios": self.vacios,
+                "distintos": self.distintos.distintas, "distintos_exacto": self.distintos.exacto}
+
+
+def _hashes(datos):
+    """
+    Hash de 64 bits de cada valor (Series) o fila (DataFrame), sin factorizar antes.
+    """
+    from pandas.util import hash_pandas_object
+    return hash_pandas_object(datos, index=False, categorize=False).to_numpy()
+
+
+def perfilar_csv(path, columnas=None, filas_bloque=FILAS_BLOQUE, filas_muestra=FILAS_MUESTRA, sep=None):
+    """
+    Perfil del CSV (o de sus columnas indicadas): filas, resumen por columna y grupos
+    de las columnas categóricas.
+    """
+    sep = sep or detectar_separador(path)
+    muestra = next(iter(leer_bloques(path, columnas, sep, filas_muestra, nrows=filas_muestra)), None)
+    if muestra is None:
+        raise ValueError(f"{path} no tiene filas")
+    columnas = list(muestra.columns)
+    perfiles = {col: PerfilColumna(col, muestra[col]) for col in columnas}
+    categoricas = [col for col in columnas if perfiles[col].tipo == CATEGORICAL]
+    grupos = ConteoHashes()
+
+    filas, degradadas = 0, False
+    for bloque in leer_bloques(path, columnas, sep, filas_bloque):
+        filas += len(bloque)
+        for col, perfil in perfiles.items():
+            if not perfil.actualizar(bloque[col]):
+                degradadas = True
+        if categoricas and not degradadas:
+            grupos.anadir(_hashes(bloque[categoricas]))
+
+    # Alguna columna no era lo que decía la muestra: sus distintos y los grupos se cuentan
+    # de nuevo
+    categoricas_finales = [col for col in columnas if perfiles[col].tipo == CATEGORICAL]
+    if categoricas_finales != categoricas:
+        degradadas = [col for col in categoricas_finales if col not in categoricas]
+        grupos = ConteoHashes()
+        for bloque in leer_bloques(path, categoricas_finales, sep, filas_bloque):
+            for col in degradadas:
+                valores = bloque[col]
+                perfiles[col].distintos.anadir(_hashes(valores[valores != ""]))
+            grupos.anadir(_hashes(bloque[categoricas_finales]))
+
+    return {
+        "filas": filas,
+        "columnas": {col: perfil.resumen() for col, perfil in perfiles.items()},
+        "grupos": {"columnas": categoricas_finales, "distintos": grupos.distintas, "exacto": grupos.exacto,
+                   "max_filas_grupo": grupos.max_veces, "varias_filas": grupos.repetidas},
+    }
+
+
+'''Parquet y Arrow'''
+
+# Para Parquet casi todo sale del pie del fichero, sin leer datos: el esquema da el tipo
+# de cada columna (enteros, reales y decimales son Numeric; fechas y timestamps, Numeric
+# temporal; el resto Categorical), num_rows da dataset_size y las estadísticas de cada
+# row group dan nulos, min/max (una columna numérica cuyos row groups no se solapan y van
+# en orden puede estar ordenada) y sorting_columns, si el escritor lo declaró. Lo demás
+# (columnas de texto que en realidad son números o fechas, monotonía dentro de los row
+# groups, valores distintos y filas por grupo) se estima con el primer lote de unos
+# pocos row groups repartidos por el fichero, leídos con memory map. Como la muestra
+# mantiene el orden de las filas, si no es monótona la columna tampoco lo es.
+# Los ficheros Arrow IPC (.arrow, .feather) se mapean en memoria y se muestrean sus
+# record batches igual. pyarrow solo se importa al perfilar estos formatos.
+
+EXTENSIONES_PARQUET = (".parquet", ".pq")
+EXTENSIONES_ARROW = (".arrow", ".feather", ".ipc")
+
+# Row groups (o record batches) de la muestra, repartidos desde el primero al último
+GRUPOS_MUESTRA = 3
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+    except ImportError as e:
+        raise ImportError("Para perfilar Parquet o Arrow hace falta pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def _indices_muestra(n, k=GRUPOS_MUESTRA):
+    return sorted({int(i) for i in np.linspace(0, n - 1, min(k, n))}) if n else []
+
+
+def _tipo_arrow(pa, tipo):
+    """
+    (tipo, temporal) a partir del tipo de Arrow, o None si es texto y depende de los valores.
+    """
+    if pa.types.is_dictionary(tipo):
+        tipo = tipo.value_type
+    if pa.types.is_integer(tipo) or pa.types.is_floating(tipo) or pa.types.is_decimal(tipo):
+        return NUMERIC, False
+    if pa.types.is_temporal(tipo):
+        return NUMERIC, True
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        return None
+    return CATEGORICAL, False
+
+
+def _texto_normalizado(pa, valores):
+    pc = pa.compute
+    return pc.replace_substring(pc.replace_substring_regex(valores, r"\s", ""), ",", ".")
+
+
+def _tipo_texto(pa, valores):
+    """
+    (tipo, temporal) de una columna de texto con el mismo criterio que el CSV: números
+    (patrón de FileUploader.js) o fechas que Arrow sabe leer (ISO 8601).
+    """
+    pc = pa.compute
+    valores = pc.drop_null(valores)
+    valores = valores.filter(pc.not_equal(valores, ""))
+    if len(valores) == 0:
+        return CATEGORICAL, False
+    if pc.all(pc.match_substring_regex(_texto_normalizado(pa, valores), f"^{PATRON_NUMERO}$")).as_py():
+        return NUMERIC, False
+    try:
+        pc.cast(valores, pa.timestamp("ns"))
+        return NUMERIC, True
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return CATEGORICAL, False
+
+
+def _numeros_muestra(pa, valores):
+    """
+    Valores no nulos de la muestra como float64 (el texto, normalizado como en el CSV).
+    """
+    valores = pa.compute.drop_null(valores)
+    tipo = valores.type.value_type if pa.types.is_dictionary(valores.type) else valores.type
+    if pa.types.is_dictionary(valores.type):
+        valores = valores.cast(tipo)
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        valores = _texto_normalizado(pa, valores.filter(pa.compute.not_equal(valores, "")))
+    return np.asarray(valores.cast(pa.float64()).to_numpy(zero_copy_only=False), dtype=np.float64)
+
+
+def _perfil_muestra(pa, muestra, filas, completa, metadatos=None):
+    """
+    Perfil con el mismo formato que perfilar_csv a partir de una muestra (Table) en el
+    orden del fichero. metadatos: {columna: dict} con lo que se sabe del fichero entero
+    (vacios, distintos, orden entre row groups, orden declarado).
+    """
+    metadatos = metadatos or {}
+    columnas, categoricas = {}, []
+    for nombre in muestra.column_names:
+        valores = muestra.column(nombre)
+        meta = metadatos.get(nombre, {})
+        tipo, temporal = _tipo_arrow(pa, valores.type) or _tipo_texto(pa, valores)
+        distintos = meta.get("distintos")
+        if distintos is None:
+            distintos = pa.compute.count_distinct(valores).as_py()
+        ordenada = temporal or meta.get("orden_declarado", False)
+        if tipo == NUMERIC and not ordenada:
+            numeros = _numeros_muestra(pa, valores)
+            diferencias = np.diff(numeros)
+            creciente = bool((diferencias >= 0).all()) and meta.get("creciente", True)
+            decreciente = bool((diferencias <= 0).all()) and meta.get("decreciente", True)
+            ordenada = (creciente or decreciente) and distintos > 1
+        if tipo == CATEGORICAL:
+            categoricas.append(nombre)
+        columnas[nombre] = {"tipo": tipo, "temporal": temporal, "ordenada": bool(ordenada),
+                            "vacios": meta.get("vacios", valores.null_count),
+                            "distintos": int(distintos), "distintos_exacto": completa or "distintos" in meta}
+
+    grupos = {"columnas": categoricas, "distintos": 0, "exacto": completa, "max_filas_grupo": 0,
+              "varias_filas": False}
+    if categoricas and muestra.num_rows:
+        conteo = muestra.select(categoricas).group_by(categoricas).aggregate([([], "count_all")])
+        maximo = pa.compute.max(conteo.column("count_all")).as_py()
+        grupos.update(distintos=conteo.num_rows, max_filas_grupo=maximo, varias_filas=maximo > 1)
+    return {"filas": filas, "columnas": columnas, "grupos": grupos,
+            "muestra": {"filas": muestra.num_rows, "completa": completa}}
+
+
+def _orden_row_groups(estadisticas):
+    """
+    (creciente, decreciente) entre row groups a partir de sus min/max, o None si falta
+    alguna estadística.
+    """
+    if any(e is None or not e.has_min_max for e in estadisticas):
+        return None
+    minimos, maximos = [e.min for e in estadisticas], [e.max for e in estadisticas]
+    try:
+        creciente = all(maximos[i] <= minimos[i + 1] for i in range(len(minimos) - 1))
+        decreciente = all(minimos[i] >= maximos[i + 1] for i in range(len(minimos) - 1))
+    except TypeError:
+        return None
+    return creciente, decreciente
+
+
+def perfilar_parquet(path, columnas=None, filas_muestra=FILAS_MUESTRA, grupos_muestra=GRUPOS_MUESTRA):
+    """
+    Perfil de un Parquet a partir de su pie y del primer lote de unos pocos row groups.
+    """
+    pa = _pyarrow()
+    import pyarrow.parquet as pq
+    fichero = pq.ParquetFile(path, memory_map=True)
+    metadata = fichero.metadata
+    nombres = fichero.schema_arrow.names
+    columnas = list(columnas or nombres)
+    desconocidas = [c for c in columnas if c not in nombres]
+    if desconocidas:
+        raise ValueError(f"Columnas que no están en {path}: {desconocidas}")
+    # Posición de cada columna (plana) en los metadatos de los row groups
+    posiciones = {metadata.schema.column(i).path: i for i in range(metadata.num_columns)}
+
+    metadatos = {}
+    n_grupos = metadata.num_row_groups
+    grupos = [metadata.row_group(i) for i in range(n_grupos)]
+    for nombre in columnas:
+        i = posiciones.get(nombre)
+        if i is None:  # columna anidada, solo la muestra
+            continue
+        estadisticas = [g.column(i).statistics for g in grupos]
+        meta = {}
+        if all(e is not None and e.has_null_count for e in estadisticas):
+            meta["vacios"] = sum(e.null_count for e in estadisticas)
+        if n_grupos == 1 and estadisticas[0] is not None and estadisticas[0].has_distinct_count:
+            meta["distintos"] = estadisticas[0].distinct_count
+        orden = _orden_row_groups(estadisticas)
+        if orden is not None:
+            meta["creciente"], meta["decreciente"] = orden
+        meta["orden_declarado"] = n_grupos > 0 and all(
+            any(c.column_index == i for c in (g.sorting_columns or ())) for g in grupos)
+        metadatos[nombre] = meta
+
+    lotes = []
+    for i in _indices_muestra(n_grupos, grupos_muestra):
+        lote = next(fichero.iter_batches(batch_size=filas_muestra, row_groups=[i], columns=columnas), None)
+        if lote is not None:
+            lotes.append(lote)
+    muestra = pa.Table.from_batches(lotes) if lotes else fichero.schema_arrow.empty_table().select(columnas)
+    return _perfil_muestra(pa, muestra, metadata.num_rows, muestra.num_rows == metadata.num_rows, metadatos)
+
+
+def perfilar_arrow(path, columnas=None, filas_muestra=FILAS_MUESTRA, grupos_muestra=GRUPOS_MUESTRA):
+    """
+    Perfil de un fichero Arrow IPC mapeado en memoria a partir de unos pocos record batches.
+    """
+    pa = _pyarrow()
+    with pa.memory_map(path, 'r') as fuente:
+        lector = pa.ipc.open_file(fuente)
+        columnas = list(columnas or lector.schema.names)
+        # Leer un batch del mapa solo interpreta su cabecera, los datos no se copian
+        filas = sum(lector.get_batch(i).num_rows for i in range(lector.num_record_batches))
+        lotes = [lector.get_batch(i).select(columnas).slice(0, filas_muestra)
+                 for i in _indices_muestra(lector.num_record_batches, grupos_muestra)]
+        muestra = pa.Table.from_batches(lotes) if lotes else lector.schema.empty_table().select(columnas)
+        return _perfil_muestra(pa, muestra, filas, muestra.num_rows == filas)
+
+
+def perfilar(path, columnas=None, **opciones):
+    """
+    Perfil de un CSV, Parquet o Arrow según la extensión del fichero.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in EXTENSIONES_PARQUET:
+        return perfilar_parquet(path, columnas, **opciones)
+    if extension in EXTENSIONES_ARROW:
+        return perfilar_arrow(path, columnas, **opciones)
+    return perfilar_csv(path, columnas, **opciones)
+
+
+'''Respuestas del cuestionario'''
+
+def respuestas_cuestionario(perfil, proposito, contexto, relacion=None):
+    """
+    Las nueve respuestas del cuestionario a partir del perfil. Solo se contestan las
+    preguntas que haría Questionnaire.js con ese tipo de datos; el resto son
+    'Not applicable', como en App.js. relacion no sale de los datos: se usa la indicada
+    cuando el cuestionario la pregunta.
+    """
+    columnas = perfil["columnas"].values()
+    n_numericas = sum(c["tipo"] == NUMERIC for c in columnas)
+    tipo = tipo_datos(n_numericas, len(perfil["columnas"]) - n_numericas)
+    n_dim = dimensiones(len(perfil["columnas"]))
+    ordenadas = "Yes" if any(c["ordenada"] for c in columnas) else "No"
+    obs_grupo = "Several" if perfil["grupos"]["varias_filas"] else "One"
+    grupos_alto = "Yes" if perfil["grupos"]["distintos"] > UMBRAL_GRUPOS_ALTO else "No"
+    relacion = relacion or NO_APLICA
+
+    respuestas = {"n_dimensiones": n_dim, "tipo_datos": tipo, "ordenadas": NO_APLICA, "n_grupos_alto": NO_APLICA,
+                  "relacion": NO_APLICA, "obs_grupo": NO_APLICA, "proposito": proposito,
+                  "dataset_size": tamano_dataset(perfil["filas"]), "contexto": contexto}
+    if tipo == NUMERIC:
+        if n_dim != "1D":
+            respuestas["ordenadas"] = ordenadas
+        if n_dim == "3D+" and respuestas["ordenadas"] == "No" and proposito == "Part-to-whole":
+            respuestas["relacion"] = relacion
+    elif tipo == CATEGORICAL:
+        if n_dim == "1D":
+            if proposito == "Part-to-whole":
+                respuestas["relacion"] = relacion
+        else:
+            respuestas["relacion"] = relacion
+            if relacion == "Subgroup":
+                respuestas["n_grupos_alto"] = grupos_alto
+    elif tipo == "1NUM1CAT":
+        respuestas["obs_grupo"] = obs_grupo
+        if obs_grupo == "One" and proposito == "Part-to-whole":
+            respuestas["relacion"] = relacion
+    elif tipo == "1CAT+2+NUM":
+        respuestas["obs_grupo"] = obs_grupo
+        if obs_grupo == "Several":
+            respuestas["ordenadas"] = ordenadas
+        elif proposito in ("Part-to-whole", "Correlation"):
+            respuestas["n_grupos_alto"] = grupos_alto
+    else:  # 1NUM2+CAT
+        respuestas["relacion"] = relacion
+        if relacion != "Adjacency":
+            respuestas["obs_grupo"] = obs_grupo
+        if relacion == "Subgroup" and obs_grupo == "One" and proposito in ("Part-to-whole", "Correlation"):
+            respuestas["n_grupos_alto"] = grupos_alto
+    return respuestas
+
+
+if __name__ == "__main__":
+    import time
+    parser = argparse.ArgumentParser(description="Deduce las respuestas del cuestionario a partir de un CSV, Parquet o Arrow")
+    parser.add_argument("fichero")
+    parser.add_argument("--columnas", nargs="+", help="Variables seleccionadas (por defecto todas)")
+    parser.add_argument("--proposito", required=True)
+    parser.add_argument("--contexto", required=True)
+    parser.add_argument("--relacion", help="Relación entre variables, si el cuestionario la pregunta")
+    parser.add_argument("--sep", help="Separador del CSV (por defecto se detecta)")
+    parser.add_argument("--bloque", type=int, default=FILAS_BLOQUE, help="Filas por bloque del CSV")
+    parser.add_argument("--recomendar", action="store_true", help="Añade las recomendaciones para esas respuestas")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    if os.path.splitext(args.fichero)[1].lower() in EXTENSIONES_PARQUET + EXTENSIONES_ARROW:
+        perfil = perfilar(args.fichero, args.columnas)
+    else:
+        perfil = perfilar_csv(args.fichero, args.columnas, args.bloque, sep=args.sep)
+    respuestas = respuestas_cuestionario(perfil, args.proposito, args.contexto, args.relacion)
+    salida = {"respuestas": respuestas, "perfil": perfil}
+    print(f"{perfil['filas']} filas perfiladas en {time.perf_counter() - inicio:.2f} s "
+          f"({os.path.getsize(args.fichero) / 1e6:.1f} MB)", file=sys.stderr)
+    if args.recomendar:
+        import warnings
+        warnings.simplefilter('ignore')
+        from recomendador import preparar_recomendador
+        salida["recomendacion"] = preparar_recomendador(construir=False)(respuestas)
+    print(json.dumps(salida, ensure_ascii=False, indent=1))
@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from recomendador import cargar_artefactos, obtener_tensor
+from tabla_reglas import ReglasRecargables
+from reglas_numpy import compilar
+from datos import COLUMNAS_RESPUESTAS, leer_respuestas_por_bloques, actualizar_graficos, valor_grafico
+
+'''Recálculo masivo de grafico_recomendado en la tabla respuestas'''
+
+# Cuando cambian las reglas o el modelo hay que recalcular grafico_recomendado (el JSON
+# con rule_based y ai_based que guarda el servidor) de todas las filas históricas. En vez de lanzar un proceso por id, este trabajo recorre la tabla
+# por bloques con un cursor del lado del servidor, recomienda cada bloque de una vez
+# (una indexación en el tensor precalculado, o el modelo y reglas_numpy por lotes si no
+# hay tensor) y escribe solo las filas que cambian con una tabla temporal y un único
+# UPDATE ... FROM por bloque. Cada bloque se confirma por separado: con --marca se guarda
+# el último id confirmado y una ejecución interrumpida continúa desde ahí. Las filas con
+# valores que el modelo no conoce se guardan con ai_based null.
+#
+#   python recalcular.py                          # recalcula todas las filas
+#   python recalcular.py --marca recalculo.marca  # reanudable
+#   python recalcular.py --simular                # cuenta los cambios sin escribir
+
+TAMANO_BLOQUE = 5000
+METODOS = ["rule_based", "ai_based"]
+
+
+class PuntuadorLote:
+    """
+    Recomienda un bloque de filas con ambos recomendadores a la vez. Las filas con
+    valores que el modelo no conoce se recomiendan solo por reglas (ai_based = None).
+    Si reglas.json cambia durante el recorrido, los bloques siguientes usan las reglas
+    nuevas (con tensor se recalcula su parte de reglas); el modelo queda fijo para toda
+    la ejecución.
+    """
+
+    def __init__(self, usar_tensor=True):
+        self.reglas = ReglasRecargables()
+        self.tensor = obtener_tensor(self.reglas) if usar_tensor else None
+        if self.tensor is not None:
+            self.codec = self.tensor.codec
+        else:
+            self.modelo, self.codec, _ = cargar_artefactos(usar_codec=True)
+        # Sin tensor las reglas se evalúan por lotes con reglas_numpy (se compila al usarse)
+        self.reglas_numpy = None
+        # Posición de cada columna del codec en las filas leídas de la bbdd
+        self.posiciones = [COLUMNAS_RESPUESTAS.index(col) for col in self.codec.columnas]
+
+    def __call__(self, filas):
+        """
+        filas: respuestas en el orden de COLUMNAS_RESPUESTAS. Devuelve {método: array}.
+        """
+        n = len(filas)
+        # Las reglas se miran una vez por bloque, así todo el bloque usa la misma versión
+        if self.reglas.recargar_si_cambia():
+            if self.tensor is not None:
+                self.tensor.recalcular_reglas(self.reglas.tabla)
+            self.reglas_numpy = None
+        codigos, validas = self.codec.codificar_filas([[fila[p] for p in self.posiciones] for fila in filas])
+        resultado = {metodo: np.full(n, None, dtype=object) for metodo in METODOS}
+        if validas.any():
+            if self.tensor is not None:
+                for metodo, etiquetas in self.tensor.recomendar_codigos(codigos[validas]).items():
+                    resultado[metodo][validas] = etiquetas
+            else:
+                resultado["ai_based"][validas] = self.codec.etiquetas_de(self.modelo.predict(codigos[validas]))
+                if self.reglas_numpy is None:
+                    self.reglas_numpy = compilar(self.reglas, self.codec)
+                resultado["rule_based"][validas] = self.reglas_numpy.recomendar(codigos[validas])
+        for i in np.flatnonzero(~validas):
+            resultado["rule_based"][i] = self.reglas.tabla(dict(zip(COLUMNAS_RESPUESTAS, filas[i])))
+        return resultado
+
+
+def leer_marca(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def guardar_marca(path, id):
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(f"{id}\n")
+    os.replace(tmp, path)
+
+
+def recalcular(puntuador, desde=0, tamano=TAMANO_BLOQUE, marca=None, simular=False, pool=None, salida=None):
+    """
+    Recalcula grafico_recomendado de las filas con id > desde. Devuelve
+    (filas leídas, filas cambiadas, último id procesado).
+    """
+    salida = salida or sys.stderr
+    leidas = cambiadas = 0
+    ultimo = desde
+    inicio = time.perf_counter()
+    for bloque in leer_respuestas_por_bloques(desde, tamano, pool):
+        recomendaciones = puntuador([fila[1:-1] for fila in bloque])
+        nuevas = [valor_grafico(regla, ia) for regla, ia in zip(recomendaciones["rule_based"],
+                                                                recomendaciones["ai_based"])]
+        # Solo se escriben las filas cuya recomendación cambia
+        pares = [(fila[0], nueva) for fila, nueva in zip(bloque, nuevas) if nueva != fila[-1]]
+        cambiadas += len(pares) if simular else actualizar_graficos(pares, pool)
+        leidas += len(bloque)
+        ultimo = bloque[-1][0]
+        if marca and not simular:
+            guardar_marca(marca, ultimo)
+        segundos = time.perf_counter() - inicio
+        print(f"{leidas} filas leídas, {cambiadas} {'por cambiar' if simular else 'actualizadas'}, "
+              f"hasta id {ultimo} ({leidas / segundos:.0f} filas/s)", file=salida)
+    return leidas, cambiadas, ultimo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcula grafico_recomendado de toda la tabla respuestas")
+    parser.add_argument("--bloque", type=int, default=TAMANO_BLOQUE,
+                        help=f"Filas por bloque de lectura y escritura (por defecto {TAMANO_BLOQUE})")
+    parser.add_argument("--desde", type=int, help="Procesa solo los ids mayores que este")
+    parser.add_argument("--marca", metavar="FICHERO",
+                        help="Guarda el último id confirmado y, si existe, continúa desde él")
+    parser.add_argument("--sin-tensor", action="store_true", help="No usa el tensor precalculado")
+    parser.add_argument("--simular", action="store_true", help="Cuenta las filas que cambiarían sin escribir")
+    args = parser.parse_args()
+
+    desde = args.desde if args.desde is not None else (leer_marca(args.marca) if args.marca else 0)
+    inicio = time.perf_counter()
+    puntuador = PuntuadorLote(usar_tensor=not args.sin_tensor)
+    preparado = time.perf_counter()
+    leidas, cambiadas, ultimo = recalcular(puntuador, desde, args.bloque, args.marca, args.simular)
+    fin = time.perf_counter()
+    print(f"Recalculadas {leidas} filas desde el id {desde} en {fin - preparado:.2f} s "
+          f"({leidas / max(fin - preparado, 1e-9):.0f} filas/s, preparación {preparado - inicio:.2f} s); "
+          f"{cambiadas} {'cambiarían' if args.simular else 'actualizadas'}, último id {ultimo}", file=sys.stderr)
+    # Terminado el recorrido la marca ya no hace falta: la próxima ejecución empieza de cero
+    if args.marca and not args.simular and os.path.exists(args.marca):
+        os.remove(args.marca)
@@ -1,47 +1,45 @@
-import psycopg2
 import sys
-from sklearn.preprocessing import LabelEncoder
-import numpy as np
-import pandas as pd
-import pickle
+import os
+import argparse
 import json
+from tabla_reglas import REGLAS_PATH, ReglasRecargables
+from cache import TAMANO_DEFECTO, CacheRecomendaciones
+import trazas
+from trazas import tramo
+from modelo_nativo import MODELO_NATIVO_PATH, MANIFIESTO_MODELO_PATH, ARBOLES_PATH
 
-'''Obtención respuestas desde la bbdd para pasar a los recomendadores'''
+# Arranque rápido: numpy, pandas, pickle (y con él xgboost y sklearn), el codec y el
+# tensor se importan dentro de las funciones que los usan. Así una ejecución suelta solo
+# por reglas no carga nada pesado y xgboost solo se importa si de verdad se ejecuta el
+# modelo. python benchmarks/bench_importtime.py comprueba el presupuesto de arranque.
 
-def fetch_responses(id):
-    # Conexión a PostgreSQL
-    conn = psycopg2.connect(
-        dbname="vizquest",
-        user="ipizarro",
-        password="ipizarro",
-        host="localhost",
-        port=5432,
-        options="-c client_encoding=UTF8"
-    )
-    cursor = conn.cursor()
-
-    # Obtenemos las respuestas datos por ID
-    cursor.execute("SELECT * FROM respuestas WHERE id = %s", (id,))
-    row = cursor.fetchone()
-    conn.close()
-
-    if not row:
-        raise ValueError(f"Responses not found for the ID {id}")
+# Columnas que espera el modelo, en el orden con el que se entrenó
+REQUIRED_COLUMNS = [ 'n_dimensiones' ,
+    'tipo_datos',
+    'ordenadas',
+    'n_grupos_alto',
+    'relacion',
+    'obs_grupo',
+    'proposito',
+    'dataset_size',
+    'contexto']
 
-    return {
-            'n_dimensiones': row[1] ,
-            'tipo_datos': row[2],
-            'ordenadas': row[3],
-            'n_grupos_alto': row[4],
-            'relacion': row[5],
-            'obs_grupo': row[6],
-            'proposito': row[7],
-            'dataset_size': row[8],
-            'contexto': row[9]
-        }
+# Los artefactos se buscan junto a este script y no en el directorio de trabajo
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "XGBOOST_F.sav")
+ENCODER_PATH = os.path.join(BASE_DIR, "feature_encoders.sav")
+LABEL_ENCODER_PATH = os.path.join(BASE_DIR, "label_encoder_y.sav")
+
+'''Obtención respuestas desde la bbdd para pasar a los recomendadores'''
+
+# fetch_responses y fetch_responses_many usan el pool de conexiones de datos.py
+from datos import fetch_responses, fetch_responses_many, guardar_respuestas, valor_grafico
 
 '''Recomendador por reglas'''
 
+# Árbol de reglas original. Al servir se usa la tabla compilada de reglas.json
+# (tabla_reglas.py), que es equivalente; esta función queda como referencia y
+# python tabla_reglas.py verifica que ambas coinciden en todas las combinaciones.
 def recommend_rule(data):
     tipo_datos = data.get('tipo_datos')
     n_dimensiones = data.get('n_dimensiones')
@@ -346,7 +344,15 @@ def recommend_rule(data):
 '''Recomendador IA'''
 
 # Función para sugerir tipo de gráfico for IA
+# encoders puede ser el diccionario de LabelEncoder o un CodecCategorico (codec.py); con
+# el codec no hace falta sklearn y también decodifica la etiqueta (label_encoder_y se ignora)
 def recommend_AI(features, modelo, label_encoder_y, encoders, required_columns):
+    import numpy as np
+    from codec import CodecCategorico
+    if isinstance(encoders, CodecCategorico):
+        input_array = encoders.codificar_array(features).reshape(1, -1)
+        return encoders.etiqueta(modelo.predict(input_array)[0])
+
     input_data = []
     for col in required_columns:
         if col in features:
@@ -354,6 +360,7 @@ def recommend_AI(features, modelo, label_encoder_y, encoders, required_columns):
 
             # Verificamos si la característica es categórica y usar el codificador adecuado
             if col in encoders:  # Si existe un encoder para la columna
+                import pandas as pd
                 if pd.isna(value) or value not in encoders[col].classes_:
                     raise ValueError(f"Valor inválido o no visto en la columna '{col}': {value}")
                 # Codificamos la característica
@@ -370,46 +377,457 @@ def recommend_AI(features, modelo, label_encoder_y, encoders, required_columns):
     #return input_array
     return label_encoder_y.inverse_transform(predicted)[0]
 
+# Marca de característica ausente en un lote
+_FALTA = object()
+
+def _codigo(codigos, value):
+    try:
+        return codigos.get(value, -1)
+    except TypeError:
+        return -1
+
+# Índices valor -> código precalculados para codificar columnas enteras de golpe
+def indices_encoders(encoders):
+    import pandas as pd
+    return {col: pd.Index(encoder.classes_) for col, encoder in encoders.items()}
+
+def _columnas_lote(features, required_columns):
+    """
+    Extrae de un lote (lista de dicts, DataFrame o array de objetos n x columnas) un
+    array de objetos por columna requerida. Las características ausentes se marcan con
+    _FALTA para poder informar del error en su fila.
+    """
+    import numpy as np
+    # Si nos pasan un DataFrame pandas ya está importado; si no, no hace falta importarlo
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(features, pd.DataFrame):
+        n = len(features)
+        return n, {col: features[col].to_numpy(dtype=object) if col in features.columns
+                   else np.full(n, _FALTA, dtype=object) for col in required_columns}
+    if isinstance(features, np.ndarray):
+        if features.ndim != 2 or features.shape[1] != len(required_columns):
+            raise ValueError(f"El array debe tener forma (n, {len(required_columns)}) en el orden {required_columns}")
+        return len(features), {col: features[:, i] for i, col in enumerate(required_columns)}
+    features = list(features)
+    columnas = {}
+    for col in required_columns:
+        columna = np.empty(len(features), dtype=object)
+        columna[:] = [fila.get(col, _FALTA) for fila in features]
+        columnas[col] = columna
+    return len(features), columnas
+
+def recommend_AI_batch(features, modelo, label_encoder_y, encoders, required_columns, indices=None):
+    """
+    Versión por lotes de recommend_AI para una lista de dicts, un DataFrame o un array
+    de objetos. Codifica cada columna entera de una vez, llama a predict una sola vez y
+    decodifica con un único inverse_transform.
+    Devuelve (recomendaciones, errores): por fila la recomendación (None si la fila no es
+    válida) y el mensaje de error (None si la fila es válida). Una fila con valores
+    desconocidos no aborta el lote.
+    """
+    import numpy as np
+    from codec import CodecCategorico
+    codec = encoders if isinstance(encoders, CodecCategorico) else None
+    if codec is None and indices is None:
+        indices = indices_encoders(encoders)
+    n, columnas = _columnas_lote(features, required_columns)
+
+    codigos = np.zeros((n, len(required_columns)), dtype=np.int64)
+    errores = [None] * n
+    for j, col in enumerate(required_columns):
+        valores = columnas[col]
+        falta = np.fromiter((v is _FALTA for v in valores), dtype=bool, count=n)
+        if codec is not None:
+            codigos_col = codec.codigos[col]
+            columna = np.fromiter((_codigo(codigos_col, v) for v in valores), dtype=np.int64, count=n)
+            invalidos = (columna < 0) & ~falta
+        elif col in encoders:
+            columna = indices[col].get_indexer(np.where(falta, None, valores))
+            invalidos = (columna < 0) & ~falta
+        else:
+            # Si la columna no es categórica usamos el valor tal cual
+            import pandas as pd
+            columna = pd.to_numeric(pd.Series(np.where(falta, None, valores)), errors='coerce').to_numpy()
+            invalidos = np.isnan(columna) & ~falta
+        for i in np.flatnonzero(falta):
+            errores[i] = errores[i] or f"Falta la característica '{col}' en las características proporcionadas."
+        for i in np.flatnonzero(invalidos):
+            errores[i] = errores[i] or f"Valor inválido o no visto en la columna '{col}': {valores[i]}"
+        codigos[:, j] = np.where(falta | invalidos, 0, columna)
+
+    validas = np.array([e is None for e in errores], dtype=bool)
+    recomendaciones = [None] * n
+    if validas.any():
+        predicted = modelo.predict(codigos[validas])
+        if codec is not None:
+            predicted = codec.etiquetas_de(predicted)
+        else:
+            predicted = label_encoder_y.inverse_transform(predicted)
+        for i, recomendacion in zip(np.flatnonzero(validas), predicted):
+            recomendaciones[i] = recomendacion
+    return recomendaciones, errores
+
+'''Carga de artefactos y servicio persistente'''
+
+def cargar_artefactos(model_path=MODEL_PATH, encoder_path=ENCODER_PATH, label_encoder_path=LABEL_ENCODER_PATH,
+                      usar_codec=False, usar_nativo=True):
+    """
+    Cargamos el modelo entrenado y los encoders una sola vez.
+    Devuelve la tupla (modelo, label_encoder_y, encoders). Con usar_codec=True los dos
+    encoders se sustituyen por el codec de codec.json (sin sklearn ni pickle) y, si existe
+    el modelo en formato nativo (modelo_nativo.py), se carga ese en vez del pickle y el
+    codec sale de su manifiesto. Los árboles volcados a NumPy (arboles_numpy.py) son
+    bastante más lentos que xgboost con lotes grandes, así que solo se usan si xgboost no
+    está instalado. Si el modelo no cuadra con el manifiesto (p. ej. a mitad de un
+    guardar_artefactos) se carga el pickle.
+    """
+    if usar_codec and usar_nativo and os.path.exists(MANIFIESTO_MODELO_PATH):
+        from importlib.util import find_spec
+        if find_spec("xgboost") is not None:
+            from modelo_nativo import cargar_modelo_nativo as cargar
+            path = MODELO_NATIVO_PATH
+        else:
+            from arboles_numpy import cargar_arboles as cargar
+            path = ARBOLES_PATH
+        if os.path.exists(path):
+            try:
+                modelo = cargar()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"No se pudo cargar {path}, se usa el pickle: {e}", file=sys.stderr)
+            else:
+                return modelo, modelo.codec, modelo.codec
+    import pickle
+    with open(model_path, 'rb') as f:
+        loaded_model = pickle.load(f)
+    if usar_codec:
+        codec = cargar_codec_vigente(encoder_path, label_encoder_path)
+        return loaded_model, codec, codec
+    # Cargamos también los encoders que se usaron para las caracteristicas
+    with open(encoder_path, 'rb') as f:
+        encoders = pickle.load(f)
+    with open(label_encoder_path, 'rb') as f:
+        label_encoder_y = pickle.load(f)
+    return loaded_model, label_encoder_y, encoders
+
+def cargar_codec_vigente(encoder_path=ENCODER_PATH, label_encoder_path=LABEL_ENCODER_PATH, codec_path=None):
+    """
+    Carga codec.json comprobando que corresponde a los encoders actuales. Si falta o está
+    obsoleto se regenera desde los .sav (esto sí requiere sklearn).
+    """
+    import pickle
+    from codec import CODEC_PATH, CodecCategorico, cargar_codec
+    from tensor_recomendaciones import firma_fuentes
+    codec_path = codec_path or CODEC_PATH
+    firma = firma_fuentes([p for p in (encoder_path, label_encoder_path) if os.path.exists(p)])
+    try:
+        codec = cargar_codec(codec_path)
+        if not firma or codec.firma == firma:
+            return codec
+    except (OSError, ValueError, KeyError):
+        pass
+    with open(encoder_path, 'rb') as f:
+        encoders = pickle.load(f)
+    with open(label_encoder_path, 'rb') as f:
+        label_encoder_y = pickle.load(f)
+    codec = CodecCategorico.desde_encoders(encoders, label_encoder_y, REQUIRED_COLUMNS, firma)
+    try:
+        codec.guardar(codec_path)
+    except OSError as e:
+        print(f"No se pudo guardar el codec en {codec_path}: {e}", file=sys.stderr)
+    return codec
+
+def recomendar(responses, artefactos, reglas=recommend_rule):
+    """
+    Obtenemos ambas recomendaciones (reglas e IA) para unas respuestas del cuestionario.
+    """
+    loaded_model, label_encoder_y, encoders = artefactos
+    with tramo("recommend_rule"):
+        rule_based = reglas(responses)
+    with tramo("recommend_AI"):
+        ai_based = recommend_AI(responses, loaded_model, label_encoder_y, encoders, REQUIRED_COLUMNS)
+    return {
+        "rule_based": rule_based,
+        "ai_based": ai_based
+    }
+
+def firma_tensor():
+    """
+    Firma de los artefactos y reglas actuales, para saber si el tensor precalculado está al día.
+    """
+    from tensor_recomendaciones import firma_fuentes
+    return firma_fuentes(fuentes_modelo() + [REGLAS_PATH])
+
+def fuentes_modelo():
+    """
+    Ficheros del modelo y los encoders que existen (pickle y formato nativo).
+    """
+    return [p for p in (ARBOLES_PATH, MODELO_NATIVO_PATH, MANIFIESTO_MODELO_PATH, MODEL_PATH, ENCODER_PATH,
+                        LABEL_ENCODER_PATH)
+            if os.path.exists(p)]
+
+def preparar_recomendador(usar_tensor=True, construir=True, solo_reglas=False):
+    """
+    Devuelve una función respuestas -> recomendaciones.
+    Si el tensor precalculado está al día la recomendación es una indexación sobre él y no
+    hace falta cargar el modelo; si falta o está obsoleto y construir=True lo reconstruimos
+    con los artefactos actuales. En otro caso se usan los recomendadores directamente.
+    Las reglas salen de reglas.json y se recargan si el fichero cambia.
+    Con solo_reglas=True solo se recomienda por reglas, sin numpy ni modelo.
+    """
+    with tramo("cargar_reglas"):
+        reglas = ReglasRecargables()
+    if solo_reglas:
+        def recomendar_reglas(responses):
+            with tramo("recommend_rule"):
+                return {"rule_based": reglas(responses)}
+        return recomendar_reglas
+    if usar_tensor:
+        tensor = obtener_tensor(reglas, construir)
+        if tensor is not None:
+            def recomendar_tensor(responses):
+                with tramo("tensor"):
+                    # Si se ha editado reglas.json recalculamos la parte de reglas del tensor
+                    if reglas.recargar_si_cambia():
+                        tensor.recalcular_reglas(reglas.tabla)
+                    return tensor.recomendar(responses)
+            return recomendar_tensor
+
+    with tramo("cargar_artefactos"):
+        artefactos = cargar_artefactos(usar_codec=True)
+    return lambda responses: recomendar(responses, artefactos, reglas)
+
+def obtener_tensor(reglas, construir=True):
+    """
+    Tensor precalculado al día con el modelo y las reglas actuales. Si falta o está
+    obsoleto se reconstruye con construir=True; si no, devuelve None.
+    """
+    from tensor_recomendaciones import cargar_tensor
+    with tramo("cargar_tensor"):
+        firma = firma_tensor()
+        try:
+            tensor = cargar_tensor()
+        except (OSError, ValueError):
+            tensor = None
+    if tensor is None or not tensor.vigente(firma):
+        if not construir:
+            return None
+        with tramo("construir_tensor"):
+            tensor = construir_y_guardar_tensor(reglas.tabla, firma)
+    return tensor
+
+def con_cache(recomendador, tamano=TAMANO_DEFECTO, fuentes=None, recargar=None):
+    """
+    Pone una caché LRU delante del recomendador. Se vacía sola si cambia cualquiera de
+    los ficheros de los que dependen las recomendaciones (por defecto modelo, encoders,
+    codec y reglas) y entonces, si se da recargar (p. ej. una llamada a
+    preparar_recomendador), pasa a usar el recomendador que devuelve.
+    """
+    if fuentes is None:
+        from codec import CODEC_PATH
+        fuentes = fuentes_modelo() + [REGLAS_PATH, CODEC_PATH]
+    return CacheRecomendaciones(recomendador, REQUIRED_COLUMNS, tamano, fuentes, recargar=recargar)
+
+def construir_y_guardar_tensor(reglas, firma):
+    """
+    Construye el tensor con los artefactos actuales y lo guarda en disco si se puede.
+    """
+    from tensor_recomendaciones import (TENSOR_PATH, construir_tensor, manifiesto_tensor,
+                                        guardar_tensor, cargar_tensor, TensorRecomendaciones)
+    loaded_model, codec, _ = cargar_artefactos(usar_codec=True)
+    datos_tensor, etiquetas = construir_tensor(reglas, loaded_model, codec)
+    try:
+        guardar_tensor(datos_tensor, etiquetas, codec, firma)
+        return cargar_tensor()
+    except OSError as e:
+        print(f"No se pudo guardar el tensor en {TENSOR_PATH}: {e}", file=sys.stderr)
+        return TensorRecomendaciones(datos_tensor, manifiesto_tensor(datos_tensor, etiquetas, codec, firma))
+
+def recomendar_y_guardar(responses, recomendador):
+    """
+    Recomienda a partir de las respuestas recibidas (sin leerlas de la bbdd) y guarda en
+    un solo INSERT las respuestas y la recomendación por reglas, que es la que alimenta
+    el dataset sintético de entrenamiento de la IA. grafico_recomendado lleva el JSON de
+    las dos recomendaciones, como lo guardaba server.js.
+    """
+    recomendaciones = recomendador(responses)
+    with tramo("guardar_respuestas"):
+        recomendaciones["id"] = guardar_respuestas(responses, valor_grafico(recomendaciones["rule_based"],
+                                                                              recomendaciones["ai_based"]))
+    return recomendaciones
+
+
+def _id_respuestas(elemento):
+    """
+    Id entero de la tabla respuestas de un elemento de una petición (número, texto o
+    {"id": ...}), o None si el elemento no es un id.
+    """
+    if isinstance(elemento, dict) and set(elemento) == {'id'}:
+        elemento = elemento['id']
+    if isinstance(elemento, (int, str)) and not isinstance(elemento, bool):
+        try:
+            return int(elemento)
+        except ValueError:
+            return None
+    return None
+
+def atender_peticion(peticion, recomendador):
+    """
+    Resuelve una petición del modo servicio. La petición puede ser un id de la tabla
+    respuestas (número, texto o {"id": ...}), directamente el diccionario de respuestas o
+    una lista de ellos, que se responde con una lista con un resultado o error por elemento.
+    Un diccionario de respuestas con "guardar": true se guarda además en la tabla respuestas.
+    {"comando": "estadisticas"} devuelve los contadores de la caché, si la hay, y
+    {"comando": "metricas"} las métricas por etapa en formato de texto de Prometheus.
+    """
+    if isinstance(peticion, list):
+        # Los ids de la lista se leen de la bbdd con una sola consulta; si falla, cada
+        # elemento se atiende por separado y lleva su propio error
+        ids = [_id_respuestas(elemento) for elemento in peticion]
+        leidas = {}
+        if any(i is not None for i in ids):
+            try:
+                with tramo("fetch_responses"):
+                    leidas = fetch_responses_many([i for i in ids if i is not None])
+            except Exception:
+                leidas = {}
+        resultados = []
+        for elemento, id in zip(peticion, ids):
+            try:
+                if id in leidas:
+                    recomendaciones = recomendador(leidas[id])
+                    recomendaciones["id"] = elemento["id"] if isinstance(elemento, dict) else elemento
+                    resultados.append(recomendaciones)
+                else:
+                    resultados.append(atender_peticion(elemento, recomendador))
+            except Exception as e:
+                resultados.append({"error": str(e)})
+        return resultados
+    if isinstance(peticion, dict) and set(peticion) == {'comando'}:
+        if peticion['comando'] == "estadisticas":
+            estadisticas = getattr(recomendador, "estadisticas", None)
+            return estadisticas() if estadisticas else {}
+        if peticion['comando'] == "metricas":
+            return {"prometheus": trazas.texto_prometheus()}
+        raise ValueError(f"Comando no soportado: {peticion['comando']!r}")
+    if isinstance(peticion, dict) and set(peticion) == {'id'}:
+        peticion = peticion['id']
+    if isinstance(peticion, dict):
+        if peticion.get("guardar"):
+            responses = {k: v for k, v in peticion.items() if k != "guardar"}
+            return recomendar_y_guardar(responses, recomendador)
+        return recomendador({k: v for k, v in peticion.items() if k != "guardar"})
+    if isinstance(peticion, (int, str)) and not isinstance(peticion, bool):
+        with tramo("fetch_responses"):
+            responses = fetch_responses(peticion)
+        recomendaciones = recomendador(responses)
+        recomendaciones["id"] = peticion
+        return recomendaciones
+    raise ValueError(f"Petición no soportada: {peticion!r}")
+
+def serve(entrada=None, salida=None, recomendador=None, exportador=None):
+    """
+    Modo persistente: preparamos el recomendador una vez y atendemos peticiones JSON
+    delimitadas por saltos de línea en stdin, respondiendo una línea JSON por petición
+    en stdout y en el mismo orden. Un error en una petición se devuelve como
+    {"error": ...} sin terminar el proceso. Con las trazas activas cada petición deja
+    su traza en stderr y, si hay exportador, se actualiza el fichero de métricas.
+    """
+    entrada = entrada or sys.stdin
+    salida = salida or sys.stdout
+    if recomendador is None:
+        recomendador = preparar_recomendador()
+
+    for linea in entrada:
+        linea = linea.strip()
+        if not linea:
+            continue
+        trazas.iniciar_traza()
+        resultado = "ok"
+        try:
+            with tramo("leer_json"):
+                peticion = json.loads(linea)
+            respuesta = atender_peticion(peticion, recomendador)
+        except Exception as e:
+            respuesta = {"error": str(e)}
+            resultado = "error"
+        with tramo("salida_json"):
+            salida.write(json.dumps(respuesta) + "\n")
+            salida.flush()
+        trazas.terminar_traza(resultado)
+        if exportador is not None:
+            exportador.exportar()
+
 '''Llamada pasando id y ejecucion funciones'''
 
 if __name__ == "__main__":
-    id = sys.argv[1]  # Obtener el ID de las respuestas desde los argumentos de la línea de comandos
+    parser = argparse.ArgumentParser(description="Recomendador de gráficos por reglas e IA")
+    parser.add_argument("id", nargs="?", help="ID de las respuestas en la tabla respuestas")
+    parser.add_argument("--json", metavar="RESPUESTAS",
+                        help="Respuestas en JSON directamente, sin leerlas de la bbdd ('-' para leerlas de stdin)")
+    parser.add_argument("--guardar", action="store_true",
+                        help="Con --json, guarda respuestas y recomendación en la tabla respuestas")
+    parser.add_argument("--serve", action="store_true",
+                        help="Proceso persistente: lee peticiones JSON por stdin y responde por stdout")
+    parser.add_argument("--sin-tensor", action="store_true",
+                        help="No usar el tensor precalculado, ejecutar siempre los recomendadores")
+    parser.add_argument("--solo-reglas", action="store_true",
+                        help="Solo la recomendación por reglas (arranque rápido, sin numpy ni modelo)")
+    parser.add_argument("--cache", type=int, default=TAMANO_DEFECTO, metavar="N",
+                        help=f"Con --serve, tamaño de la caché LRU de recomendaciones (0 la desactiva, por defecto {TAMANO_DEFECTO})")
+    parser.add_argument("--trazas", action="store_true",
+                        help="Escribe en stderr una línea JSON por petición con el tiempo de cada etapa")
+    parser.add_argument("--metricas", metavar="FICHERO",
+                        help="Con --serve, mantiene en FICHERO histogramas por etapa en formato de texto de Prometheus")
+    args = parser.parse_args()
+    if args.trazas or args.metricas:
+        trazas.activar(trazas=args.trazas, metricas=bool(args.metricas))
+
+    if args.serve:
+        trazas.iniciar_traza()
+        def preparar():
+            return preparar_recomendador(usar_tensor=not args.sin_tensor, solo_reglas=args.solo_reglas)
+        recomendador = preparar()
+        if args.cache > 0:
+            # Al cambiar los artefactos se prepara un recomendador nuevo con el modelo actual
+            recomendador = con_cache(recomendador, args.cache, [REGLAS_PATH] if args.solo_reglas else None,
+                                     recargar=preparar)
+        trazas.terminar_traza(fase="arranque")
+        exportador = trazas.ExportadorMetricas(args.metricas) if args.metricas else None
+        serve(recomendador=recomendador, exportador=exportador)
+        if exportador is not None:
+            exportador.exportar(forzar=True)
+        sys.exit(0)
+    if args.id is None and args.json is None:
+        parser.error("Hay que indicar el ID de las respuestas, --json o --serve")
+    if args.guardar and args.json is None:
+        parser.error("--guardar solo tiene sentido con --json")
+
+    id = args.id  # Obtener el ID de las respuestas desde los argumentos de la línea de comandos
+    trazas.iniciar_traza()
     try:
-        responses = fetch_responses(id)
-        # obtenemos la recomendacion por reglas según las respuestas del cuestionario que recogemos de la bbdd
-        recommendation_rule = recommend_rule(responses)
-
-        required_columns = [ 'n_dimensiones' ,
-            'tipo_datos',
-            'ordenadas',
-            'n_grupos_alto',
-            'relacion',
-            'obs_grupo',
-            'proposito',
-            'dataset_size',
-            'contexto']  # Definir las columnas requeridas
-        # prediccion usando modelo entrenado y guardado
-        model_path = r".\recomendador\XGBOOST_F.sav"
-        encoder_path = r".\recomendador\feature_encoders.sav"
-        label_encoder_path = r".\recomendador\label_encoder_y.sav"
-        # Cargamos el modelo entrenado con pickle
-        loaded_model = pickle.load(open(model_path, 'rb'))
-        # Cargamos también los encoders que se usaron para las caracteristicas
-        encoders = pickle.load(open(encoder_path, 'rb'))
-        label_encoder_y = pickle.load(open(label_encoder_path, 'rb'))
-        # obtenemos la recomendacion por IA según las respuestas del cuestionario que recogemos de la bbdd
-        recommendation_ai = recommend_AI(responses,loaded_model, label_encoder_y, encoders, required_columns)
-
-        # Empaquetamos ambas recomendaciones en un diccionario
-        recommendations = {
-            "rule_based": recommendation_rule,
-            "ai_based": recommendation_ai
-        }
+        if args.json is not None:
+            responses = json.loads(sys.stdin.read() if args.json == "-" else args.json)
+            if not isinstance(responses, dict):
+                raise ValueError("--json debe ser un objeto con las respuestas del cuestionario")
+        else:
+            with tramo("fetch_responses"):
+                responses = fetch_responses(id)
+        # obtenemos ambas recomendaciones (reglas e IA); en una ejecución suelta no merece la
+        # pena reconstruir el tensor, solo lo usamos si ya está al día
+        recomendador = preparar_recomendador(usar_tensor=not args.sin_tensor, construir=False,
+                                             solo_reglas=args.solo_reglas)
+        if args.guardar:
+            recommendations = recomendar_y_guardar(responses, recomendador)
+        else:
+            recommendations = recomendador(responses)
 
         # Convertimos el diccionario a JSON y lo imprimimos para enviarlo de vuelta a node.js
-        print(json.dumps(recommendations))
+        with tramo("salida_json"):
+            print(json.dumps(recommendations))
+        trazas.terminar_traza()
 
         
     except Exception as e:
+        trazas.terminar_traza("error")
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
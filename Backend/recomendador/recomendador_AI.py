@@ -1,617 +1,472 @@
-#!/usr/bin/env python
-# coding: utf-8
-
-# In[116]:
-
-
-import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
-import pickle
-import sys 
-import datetime
+import os
+import sys
+import json
 import time
-import xgboost as xgb
-from sklearn.model_selection import GridSearchCV
-from matplotlib import pyplot as plt
-import numpy as np
-import scipy.stats as stats
-from sklearn.model_selection import cross_val_score
-from sklearn.metrics import accuracy_score
-import seaborn as sns
-from matplotlib import pyplot as plt
-from imblearn.over_sampling import SMOTE
-
-
-# Cargar el dataset desde un archivo Excel
-file_path =  r"C:\Users\34617\Documents\MASTER_DATA_SCIENCE\TFM\recomendador_AI\Dataset_entrenamiento_recomendador.xlsx"
-df = pd.read_excel(file_path)
-
-print(df)
-
-# Comprobar las columnas esperadas
-
-expected_columns = ['CASO','Nº dimensiones', 'Tipo de datos', 'Ordenadas', 'Nº grupos alto', 'Relacion entre variables', 
-                    'Observacion por grupo', 'Proposito', 'Tamano dataset', 'Contexto', 'Gráfico']
-if not all(col in df.columns for col in expected_columns):
-    raise ValueError(f"El archivo debe contener las columnas: {', '.join(expected_columns)}")
-
-# Separar características (X) y etiqueta objetivo (y)
-X = df[expected_columns[1:-1]].copy()  # Todas las columnas excepto 'Gráfico' y 'Caso'
-y = df['Gráfico'].copy()  # Columna objetivo
-
-
-# In[164]:
-
-
-# desde postgresql
-
-import psycopg2
-import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
 import pickle
-import sys 
+import argparse
 import datetime
-import time
-import xgboost as xgb
-from sklearn.model_selection import GridSearchCV
-
-
-def fetch_dataset():
-    # Conexión a PostgreSQL en mi pc local
-    try:
-        conn = psycopg2.connect(
-            dbname="vizquest",
-            user="ipizarro",
-            password="ipizarro",
-            host="localhost",
-            port=5432,
-            options="-c client_encoding=UTF8"
-        )
-        cursor = conn.cursor()
-
-        # SQL para obtener los datos para entrenar el modelo
-        cursor.execute("SELECT * FROM DATASET_ENTRENAMIENTO_GRAFICOS")
-        rows = cursor.fetchall()
-
-        # Cogemos los nombres de las columnas
-        column_names = [desc[0] for desc in cursor.description]
-
-        # Cierro conexión
-        cursor.close()
-        conn.close()
-
-        # Crear DataFrame
-        df = pd.DataFrame(rows, columns=column_names)
-        return df
-
-    except psycopg2.Error as e:
-        print(f"Error al conectar a la base de datos: {e}")
-        sys.exit(1)
-
-# Cargar dataset
-df = fetch_dataset()
-#print(df)
-
-expected_columns = ['caso','n_dimensiones', 'tipo_datos', 'ordenadas', 'n_grupos_alto', 'relacion', 
-                    'obs_grupo', 'proposito', 'dataset_size', 'contexto', 'grafico_recomendado']
-if not all(col in df.columns for col in expected_columns):
-    raise ValueError(f"El archivo debe contener las columnas: {', '.join(expected_columns)}")
-
-# Separamos características (X) y etiqueta objetivo (y)
-X = df[expected_columns[1:-1]].copy()  # Todas las columnas excepto 'Gráfico' y 'Caso'
-y = df['grafico_recomendado'].copy()  # Columna objetivo es grafico_recomendado
-
-#print(df['grafico_recomendado'])
-#print(y)
-
-
-# In[165]:
-
-
-#Preparación de datos I - División datos en Train & Test
-from sklearn.model_selection import train_test_split
-
-# Division Train (66%) y Test (33%)
-# Dividir los datos en conjuntos de entrenamiento y prueba con stratify para tener todas las clases en ambos subconjuntos
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.33, random_state=42,stratify=y)
-
-
-# In[158]:
-
-
-# visualizamos las clases antes del oversampling en el conjunto de training
 import warnings
-warnings.simplefilter(action='ignore', category=FutureWarning)
-from matplotlib import pyplot as plt
-import seaborn as sns
-
-print('Dimensiones de todo el conjunto de datos', X.shape)
-# la variable objetivo debe ser categórica no numérica para ver la tabla de frecuencias
-df['grafico_recomendado'] = df['grafico_recomendado'].astype('category')
-frec_clase = df['grafico_recomendado'].astype('category').value_counts().reset_index()
-frec_clase.columns = ['clase', 'frecuencia']
-total_obs = len(df)
-frec_clase['porcentaje'] = np.round((frec_clase['frecuencia']/total_obs)*100,2)
-#print(frec_clase)
-# Grafica la frecuencia de cada clase
-plt.figure(figsize=(30, 20))
-ax = sns.barplot(data=frec_clase, x='frecuencia', y='clase', palette='viridis')
-ax.bar_label(ax.containers[0], fontsize=12)
-#plt.xlabel('Frecuencia', fontsize=8)
-#plt.ylabel('Clase', fontsize=8)
-plt.title('Frecuencia por clase', fontsize=14)
-plt.show()
-
-
-# In[159]:
-
-
-#preparación de datos II
-
-#oversampling usando oversampling pues solo duplica y no introduce nueva lógica
-#creo datos sintéticos sobremuestreando para balancear el número de observaciones en cada clase
-
-from imblearn.over_sampling import RandomOverSampler
-
-# instanciación de objeto RandomOverSampler
-oversampler = RandomOverSampler(random_state=24)
-
-# sobremuestreamos el dataset de entrenamiento
-X_train_resampled, y_train_resampled = oversampler.fit_resample(X_train, y_train)
-
-#valores antes de reemplazar atributos en el dataset
-print('Dimensiones de Conjunto Original Train', X_train.shape)
-
-# dataframe con la variable objetivo en train
-y_train_df = pd.DataFrame(y_train, columns=['grafico_recomendado'])
-# Contar las frecuencias de las clases
-frec_clase = y_train_df['grafico_recomendado'].astype('category').value_counts().reset_index()
-frec_clase.columns = ['clase', 'frecuencia']
-#print(frec_clase)
-total_obs = len(X_train)
-frec_clase['porcentaje'] = np.round((frec_clase['frecuencia']/total_obs)*100,2)
-
-# Grafica la frecuencia de cada clase
-plt.figure(figsize=(30, 20))
-ax = sns.barplot(data=frec_clase, x='frecuencia', y='clase', palette='viridis')
-ax.bar_label(ax.containers[0], fontsize=7)
-#plt.xlabel('Frecuencia', fontsize=12)
-#plt.ylabel('Clase', fontsize=8)
-plt.title('Frecuencia por clase en Train sin sobremuestreo', fontsize=14)
-plt.show()
-
-print('Dimensiones de Training con sobremuestreo', X_train_resampled.shape)
-# la variable objetivo en tes
-y_train_resampled_df = pd.DataFrame(y_train_resampled, columns=['grafico_recomendado'])
-# Contar las frecuencias de las clases
-frec_clase = y_train_resampled_df['grafico_recomendado'].astype('category').value_counts().reset_index()
-frec_clase.columns = ['clase', 'frecuencia']
-#print(frec_clase)
-total_obs = len(X_train_resampled)
-frec_clase['porcentaje'] = np.round((frec_clase['frecuencia']/total_obs)*100,2)
-
-# Grafica la frecuencia de cada clase
-plt.figure(figsize=(30, 20))
-ax = sns.barplot(data=frec_clase, x='frecuencia', y='clase', palette='viridis')
-ax.bar_label(ax.containers[0], fontsize=7)
-#plt.xlabel('Frecuencia', fontsize=12)
-#plt.ylabel('Clase', fontsize=8)
-plt.title('Frecuencia por clase en Train con sobremuestreo', fontsize=14)
-plt.show()
-
-
-# In[167]:
-
-
-# preparación de datos III - codificamos las caracteristicas
-from sklearn.preprocessing import LabelEncoder
-
-X_train_resampled_encoded = X_train_resampled.copy()
-
-encoders = {}
-for col in X_train_resampled.columns:
-    encoder = LabelEncoder()
-    X_train_resampled_encoded.loc[:, col] = encoder.fit_transform(X_train_resampled[col])
-    encoders[col] = encoder
-
-label_encoder_y = LabelEncoder()
-y_train_resampled_encoded = label_encoder_y.fit_transform(y_train_resampled)
-
-#Aplicamos las mismas transformaciones al conjunto de prueba
-
-X_test_encoded = X_test.copy()
-
-for col, encoder in encoders.items():
-    X_test_encoded.loc[:, col] = encoder.transform(X_test[col])
-
-y_test_encoded = label_encoder_y.transform(y_test)
-
-#print(X_train_resampled)
-#print(X_train_resampled_encoded)
-#print(y_test)
-#print(y_test_encoded)
-
-
-# In[168]:
-
+from contextlib import contextmanager
+
+'''Entrenamiento del recomendador AI (XGBoost)'''
+
+# Versión ejecutable sin supervisión de recomendador_AI.ipynb (el notebook sigue siendo
+# la referencia del análisis): lee el dataset de entrenamiento de la tabla
+# DATASET_ENTRENAMIENTO_GRAFICOS o de un fichero, separa train/test estratificado,
+# sobremuestrea train con RandomOverSampler, codifica con LabelEncoder, entrena el
+# XGBClassifier, lo evalúa y guarda los artefactos en un directorio configurable:
+#   XGBOOST_F.sav, feature_encoders.sav, label_encoder_y.sav  (los de siempre, con pickle)
+#   codec.json, XGBOOST_F.ubj, XGBOOST_F.manifiesto.json, XGBOOST_F.arboles.npz
+# Las figuras se guardan como PNG con el backend Agg (sin pantalla) y el tiempo de cada
+# etapa se escribe en stderr, así que puede lanzarse desde una tarea programada. Las
+# métricas de cada ejecución se añaden a SALIDA/entrenamiento/scores.sqlite.
+#
+#   python recomendador_AI.py                                  # desde la bbdd, artefactos aquí
+#   python recomendador_AI.py --fichero ../../datasets/Dataset_entrenamiento_recomendador.xlsx
+#   python recomendador_AI.py --salida /tmp/modelo --sin-figuras
+# El dataset leído se guarda en SALIDA/cache_dataset/ (ver cache_dataset.py) y las
+# siguientes ejecuciones no vuelven a leerlo mientras el origen no cambie.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INFORME_DIR = "entrenamiento"
+SCORES_SQLITE = "scores.sqlite"
+TABLA_ENTRENAMIENTO = "DATASET_ENTRENAMIENTO_GRAFICOS"
+
+# Columnas del dataset de entrenamiento: el caso, las nueve respuestas y el gráfico
+COLUMNA_CASO = 'caso'
+COLUMNAS_CARACTERISTICAS = ['n_dimensiones', 'tipo_datos', 'ordenadas', 'n_grupos_alto', 'relacion',
+                            'obs_grupo', 'proposito', 'dataset_size', 'contexto']
+COLUMNA_ETIQUETA = 'grafico_recomendado'
+EXPECTED_COLUMNS = [COLUMNA_CASO] + COLUMNAS_CARACTERISTICAS + [COLUMNA_ETIQUETA]
+
+# Mismos parámetros que en el notebook
+TEST_SIZE = 0.33
+SEMILLA_DIVISION = 42
+SEMILLA_SOBREMUESTREO = 24
+
+# Nombres de los artefactos dentro del directorio de salida
+MODELO_SAV = "XGBOOST_F.sav"
+ENCODERS_SAV = "feature_encoders.sav"
+LABEL_ENCODER_SAV = "label_encoder_y.sav"
+CODEC_JSON = "codec.json"
+MODELO_UBJ = "XGBOOST_F.ubj"
+MANIFIESTO_JSON = "XGBOOST_F.manifiesto.json"
+ARBOLES_NPZ = "XGBOOST_F.arboles.npz"
+
+COLUMNAS_SCORES = ['Model', 'Accuracy', 'Precision', 'Recall', 'Specificity', 'F1 Score',
+                   'Avg CV Accuracy', 'Standard Deviation of CV Accuracy']
+
+
+@contextmanager
+def etapa(nombre, tiempos):
+    """
+    Mide una etapa del entrenamiento, la apunta en tiempos y la escribe en stderr.
+    """
+    inicio = time.perf_counter()
+    yield
+    tiempos[nombre] = time.perf_counter() - inicio
+    print(f"[{nombre}] {tiempos[nombre]:.2f} s", file=sys.stderr)
 
-import xgboost as xgb
-import pandas as pd
-import time
-import datetime
-import pickle
-from sklearn.metrics import accuracy_score
-import json
 
-def to_string(l):
-  s = ' '
-  for ele in l:
-    s = s + ' '.join(str(ele))
-  return(s)
+'''Lectura del dataset'''
 
-def format_importance(importance):
+def fetch_dataset(pool=None):
     """
-    Formateamos la importancia de las características como un dataframe.
+    Dataset de entrenamiento desde PostgreSQL (misma configuración que datos.py).
     """
-    importance_df = pd.DataFrame(importance, columns=["Feature Importance", "Feature"])
-    importance_df = importance_df.sort_values(by="Feature Importance", ascending=False)
-    return importance_df
-
-def build_output(duracion, accuracy, importance_df, parametros):
+    import pandas as pd
+    from datos import conexion
+    with conexion(pool) as conn:
+        with conn.cursor() as cursor:
+            # SQL para obtener los datos para entrenar el modelo
+            cursor.execute(f"SELECT * FROM {TABLA_ENTRENAMIENTO}")
+            rows = cursor.fetchall()
+            # Cogemos los nombres de las columnas
+            column_names = [desc[0] for desc in cursor.description]
+    return pd.DataFrame(rows, columns=column_names)
+
+
+def leer_fichero(path):
     """
-    Construyo un dataframe con la salida del modelo.
+    Dataset de entrenamiento desde un Excel o CSV con las columnas en el orden de
+    EXPECTED_COLUMNS. Las cabeceras del Excel original están en castellano (y alguna
+    estropeada), así que las columnas se toman por posición.
     """
-    # Crea una tabla bien formateada con los resultados
-    df = pd.DataFrame({
-        'Fecha_Lanzamiento': [datetime.datetime.now()],
-        'Accuracy': [accuracy],
-        'Tiempo_Ejecucion': [duracion],
-        'Modelo': ['XGBoost']
-    })
+    import pandas as pd
+    if path.lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(path)
+    else:
+        df = pd.read_csv(path)
+    if df.shape[1] != len(EXPECTED_COLUMNS):
+        raise ValueError(f"El archivo debe contener {len(EXPECTED_COLUMNS)} columnas en el orden: "
+                         f"{', '.join(EXPECTED_COLUMNS)}")
+    df.columns = EXPECTED_COLUMNS
     return df
 
-def train_pred(X, Xtra, ytra, Xtest, ytest):
+
+def leer_dataset_entrenamiento(fichero=None, directorio_cache=None):
     """
-    Entrena el modelo XGBoost y calcula métricas y resultados.
+    Dataset de entrenamiento de la bbdd o de fichero. Con directorio_cache se guarda en
+    un .npz con la huella del origen y, mientras no cambie, se lee de ahí sin consultar
+    la tabla entera ni parsear el Excel. Devuelve (DataFrame, desde_cache).
     """
-    # Inicializa el modelo y mide el tiempo de ejecución
-    clf = xgb.XGBClassifier()
-    start = time.time()
-    clf.fit(Xtra, ytra)
-    duracion = time.time() - start
-
-    # Predicciones
-    y_pred = clf.predict(Xtest)
-
-    # Cálculo de Accuracy
-    accuracy = accuracy_score(ytest, y_pred.round(), normalize=True)
-
-    # Importancia de características
-    names = X.columns
-    importance = sorted(zip(clf.feature_importances_, names), reverse=True)
-    importance_df = format_importance(importance)
-
-    # Parámetros del modelo
-    parametros = clf.get_params(deep=True)
-
-    return duracion, accuracy, clf, importance_df, parametros
-
-# Entrenamiento con XGBoost
-dur, accuracy, clf, importance, parametros = train_pred(
-    X, X_train_resampled_encoded, y_train_resampled_encoded, X_test_encoded, y_test_encoded
-)
-
-# Guardar el modelo entrenado
-pickle.dump(clf, open(r"C:\Users\34617\Documents\MASTER_DATA_SCIENCE\TFM\recomendador_AI\XGBOOST_F.sav", 'wb'))
-
-if 'encoders' in globals() and 'label_encoder_y' in globals():
-    # Guardar encoders de las características
-    with open(r"C:\Users\34617\Documents\MASTER_DATA_SCIENCE\TFM\recomendador_AI\feature_encoders.sav", 'wb') as encoders_file:
-        pickle.dump(encoders, encoders_file)
-    # Guardar encoder de las etiquetas
-    with open(r"C:\Users\34617\Documents\MASTER_DATA_SCIENCE\TFM\recomendador_AI\label_encoder_y.sav", 'wb') as label_encoder_file:
-        pickle.dump(label_encoder_y, label_encoder_file)  
-else:
-    print("Encoders o label_encoder_y no están definidos.")
-
-# Construir la tabla de salida
-df_modelo_f = build_output(dur, accuracy, importance, parametros)
-
-# Mostrar los resultados en un formato legible
-print("Resultados del Modelo XGBoost:")
-print(df_modelo_f)
-
-'''
-print("\Parámetros del modelo:")
-print(json.dumps(parametros, indent=2))
-'''
-
-# Muestro la tabla de importancia de características
-print("\nImportancia de Características:")
-print(importancef)
-
-
-# In[169]:
-
-
-# prediccion usando modelo entrenado y guardado
-
-model_path = r"C:\Users\34617\Documents\MASTER_DATA_SCIENCE\TFM\recomendador_AI\XGBOOST_F.sav"
-encoder_path = r"C:\Users\34617\Documents\MASTER_DATA_SCIENCE\TFM\recomendador_AI\feature_encoders.sav"
-label_encoder_path = r"C:\Users\34617\Documents\MASTER_DATA_SCIENCE\TFM\recomendador_AI\label_encoder_y.sav"
-
-# Cargar el modelo con pickle
-loaded_model = pickle.load(open(model_path, 'rb'))
-
-# Cargar los encoders
-encoders = pickle.load(open(encoder_path, 'rb'))
-label_encoder_y = pickle.load(open(label_encoder_path, 'rb'))
-
-# Evaluar el modelo
-y_pred = loaded_model.predict(X_test_encoded)
-print("Reporte de clasificación:")
-print(classification_report(y_test_encoded, y_pred, target_names=label_encoder_y.classes_))
-
-# Función para sugerir tipo de gráfico
-def suggest_chart(features, modelo):
-    input_data = []
-    for col in X.columns:
-        if col in features:
-            value = features[col]
-            if pd.isna(value) or value not in encoders[col].classes_:
-                raise ValueError(f"Valor inválido o no visto en la columna '{col}': {value}")
-            input_data.append(encoders[col].transform([value])[0])
-        else:
-            raise ValueError(f"Falta la característica '{col}' en las características proporcionadas.")
-    
-    # Convertir a DataFrame con las columnas de X para que coincidan con las características entrenadas
-    input_data = pd.DataFrame([input_data], columns=X.columns)
-    
-    predicted = modelo.predict(input_data)
-    return label_encoder_y.inverse_transform(predicted)[0]
+    from cache_dataset import CACHE_DIR, huella_bbdd, huella_fichero, cargar_dataset
+    if fichero:
+        leer, nombre = (lambda: leer_fichero(fichero)), os.path.splitext(os.path.basename(fichero))[0]
+    else:
+        leer, nombre = fetch_dataset, TABLA_ENTRENAMIENTO.lower()
+    if directorio_cache is None:
+        return leer(), False
+    huella = huella_fichero(fichero) if fichero else huella_bbdd(TABLA_ENTRENAMIENTO)
+    return cargar_dataset(leer, huella, os.path.join(directorio_cache, CACHE_DIR, nombre + ".npz"))
+
+
+def separar(df):
+    """
+    Separamos características (X) y etiqueta objetivo (y).
+    """
+    if not all(col in df.columns for col in EXPECTED_COLUMNS):
+        raise ValueError(f"El dataset debe contener las columnas: {', '.join(EXPECTED_COLUMNS)}")
+    X = df[COLUMNAS_CARACTERISTICAS].astype(str)
+    y = df[COLUMNA_ETIQUETA].astype(str)
+    return X, y
 
 
-# Ejemplo de uso
-example_features = {
-    'n_dimensiones': '2D',
-    'tipo_datos': 'Numeric',
-    'ordenadas': 'No',
-    'n_grupos_alto': 'Not applicable',
-    'relacion': 'Not applicable',
-    'obs_grupo': 'Not applicable',
-    'proposito': 'Distribution',
-    'dataset_size': 'Medium',
-    'contexto': 'Technical presentation'
-}
-
-suggested_chart = suggest_chart(example_features,loaded_model)
-print(f"El gráfico sugerido es: {suggested_chart}")
-
-
-# In[174]:
+'''Preparación de datos'''
 
+def dividir(X, y, test_size=TEST_SIZE, semilla=SEMILLA_DIVISION):
+    """
+    División Train (66%) y Test (33%) estratificada para tener todas las clases en ambos.
+    """
+    from sklearn.model_selection import train_test_split
+    return train_test_split(X, y, test_size=test_size, random_state=semilla, stratify=y)
 
-# Evaluacion modelo
 
-import numpy as np
-import pandas as pd
-import pickle
-import seaborn as sns
-import matplotlib.pyplot as plt
-get_ipython().run_line_magic('matplotlib', 'inline')
-import matplotlib.ticker as ticker
-import warnings
-warnings.filterwarnings('ignore', message='^.*will change.*$', category=FutureWarning)
-
-modelo=clf
-titulo='XGBoost'
-
-df_scores = pd.DataFrame()
-
-if 'df_scores' not in globals():
-    df_scores = pd.DataFrame(columns=['Model', 'Accuracy', 'Precision','Recall', 'Specificity', 'F1 Score', 'Avg CV Accuracy', 'Standard Deviation of CV Accuracy'])
-
-def plot_matrizconfusion(titulo, cm):
-    # La figura y los ejes
-    fig, ax = plt.subplots(figsize=(12, 10))  # Aumentamos el tamaño de la figura
-
-    # matriz de confusión como una imagen
-    im = ax.imshow(cm, interpolation='nearest', cmap=plt.cm.Blues)
-
-    # barra de color
-    fig.colorbar(im, ax=ax)
-
-    # número de clases (número de ticks)
-    n_clases = cm.shape[0]
-
-    # etiquetas de los ejes (usamos las etiquetas originales)
-    ax.set(yticks=np.arange(n_clases),
-           xticks=np.arange(n_clases),
-           yticklabels=np.unique(y_test),  # Etiquetas reales
-           xticklabels=np.unique(y_test))  # Etiquetas reales
-
-    # Rotar las etiquetas del eje X para que se vean verticales
-    plt.xticks(rotation=90, ha='center')
-
-    # Ajustar la posición de las etiquetas de los ejes
-    ax.xaxis.set_major_locator(ticker.IndexLocator(base=1, offset=0.5))
-    ax.yaxis.set_major_locator(ticker.IndexLocator(base=1, offset=0.5))
+def sobremuestrear(X_train, y_train, semilla=SEMILLA_SOBREMUESTREO):
+    """
+    Balanceamos las clases de train duplicando observaciones (no introduce datos nuevos).
+    """
+    from imblearn.over_sampling import RandomOverSampler
+    oversampler = RandomOverSampler(random_state=semilla)
+    return oversampler.fit_resample(X_train, y_train)
 
-    # iteramos ahora sobre los valores de la matriz de confusión y para añadirlos como texto en cada celda
-    for i in range(cm.shape[0]):
-        for j in range(cm.shape[1]):
-            ax.text(j, i, str(cm[i, j]), ha='center', va='center', color='black', fontsize=8)
 
-    # Etiquetas
-    plt.xlabel('Etiquetas Predichas')
-    plt.ylabel('Etiquetas Verdaderas')
-    plt.title(f'Matriz de Confusión {titulo}')
+def colapsar_con_pesos(X_train, y_train):
+    """
+    Alternativa a sobremuestrear: agrupa las filas idénticas (características y etiqueta)
+    en una sola y expresa el balanceo de clases como peso por fila. Cada fila pesa sus
+    repeticiones multiplicadas por (n de la clase mayoritaria / n de su clase), que es el
+    número de copias que tendría en media tras el RandomOverSampler.
+    Devuelve (X único, y único, pesos).
+    """
+    import pandas as pd
+    columnas = list(X_train.columns)
+    datos = X_train.assign(**{COLUMNA_ETIQUETA: pd.Series(y_train).to_numpy()})
+    unicas = datos.groupby(columnas + [COLUMNA_ETIQUETA], sort=False).size().reset_index(name='repeticiones')
+    frecuencia = pd.Series(y_train).value_counts()
+    pesos = unicas['repeticiones'] * (frecuencia.max() / unicas[COLUMNA_ETIQUETA].map(frecuencia))
+    return unicas[columnas], unicas[COLUMNA_ETIQUETA], pesos.to_numpy(dtype=float)
 
-    # Ajustar los márgenes para evitar que las etiquetas se corten
-    plt.tight_layout()
 
-    plt.show()
+def codificar(X_train, y_train, X_test, y_test):
+    """
+    Ajusta un LabelEncoder por característica y otro para la etiqueta sobre train y
+    aplica las mismas transformaciones a test. Devuelve arrays enteros.
+    """
+    import numpy as np
+    from sklearn.preprocessing import LabelEncoder
+    encoders = {}
+    X_train_encoded = np.empty(X_train.shape, dtype=np.int64)
+    X_test_encoded = np.empty(X_test.shape, dtype=np.int64)
+    for j, col in enumerate(X_train.columns):
+        encoder = LabelEncoder()
+        X_train_encoded[:, j] = encoder.fit_transform(X_train[col])
+        X_test_encoded[:, j] = encoder.transform(X_test[col])
+        encoders[col] = encoder
+    label_encoder_y = LabelEncoder()
+    y_train_encoded = label_encoder_y.fit_transform(y_train)
+    y_test_encoded = label_encoder_y.transform(y_test)
+    return encoders, label_encoder_y, X_train_encoded, y_train_encoded, X_test_encoded, y_test_encoded
+
+
+'''Entrenamiento y evaluación'''
+
+def train_pred(Xtra, ytra, parametros=None, pesos=None):
+    """
+    Entrena el modelo XGBoost y devuelve (modelo, segundos de entrenamiento).
+    """
+    import xgboost as xgb
+    clf = xgb.XGBClassifier(**(parametros or {}))
+    start = time.perf_counter()
+    clf.fit(Xtra, ytra, sample_weight=pesos)
+    return clf, time.perf_counter() - start
 
 
-def entrenamiento_prediccion_evaluacion(modelo,titulo,accuracy_cv,accuracy_cv_std,X_train,y_train,X_test,y_test):
+def validacion_cruzada(Xtra, ytra, particiones, parametros=None, pesos=None):
+    """
+    Accuracy media y desviación estándar en validación cruzada sobre train. Con pesos
+    el modelo se ajusta con ellos en cada partición, pero la accuracy es por fila única.
+    """
+    import xgboost as xgb
+    from sklearn.model_selection import cross_val_score
+    if particiones < 2:
+        return float("nan"), float("nan")
+    with warnings.catch_warnings():
+        # Con filas únicas alguna clase tiene menos filas que particiones
+        warnings.simplefilter('ignore', UserWarning)
+        scores = cross_val_score(xgb.XGBClassifier(**(parametros or {})), Xtra, ytra, cv=particiones,
+                                 scoring='accuracy', params=None if pesos is None else {"sample_weight": pesos})
+    return float(scores.mean()), float(scores.std())
+
+
+def format_importance(clf, columnas):
+    """
+    Formateamos la importancia de las características como un dataframe.
+    """
+    import pandas as pd
+    importance = sorted(zip(clf.feature_importances_.astype(float), columnas), reverse=True)
+    return pd.DataFrame(importance, columns=["Feature Importance", "Feature"])
 
-  #entrenamiento
-  modelo.fit(X_train,y_train)
-  # predicción en set test
-  y_test_pred = modelo.predict(X_test)
-  # predicción en set training
-  y_train_pred = modelo.predict(X_train)
 
-  # calculo de matriz de confusión
-  cm = metrics.confusion_matrix(y_test.squeeze(), y_test_pred.squeeze())
+def evaluar(modelo, titulo, X_train, y_train, X_test, y_test, etiquetas, accuracy_cv, accuracy_cv_std):
+    """
+    Informe de train y test con evaluacion.informe (todas las métricas salen de la
+    matriz de confusión). Devuelve (fila de df_scores, métricas macro de train, matriz de
+    confusión de test, informe largo de ambos conjuntos).
+    """
+    import pandas as pd
+    from evaluacion import informe, resumen_macro
+    tabla_train, _ = informe(y_train, modelo.predict(X_train), etiquetas, "train")
+    tabla_test, cm = informe(y_test, modelo.predict(X_test), etiquetas, "test")
+    test = resumen_macro(tabla_test, "test")
+    fila = dict(zip(COLUMNAS_SCORES, [titulo, test["accuracy"], test["precision"], test["recall"],
+                                      test["especificidad"], test["f1"], accuracy_cv, accuracy_cv_std]))
+    return fila, resumen_macro(tabla_train, "train"), cm, pd.concat([tabla_train, tabla_test], ignore_index=True)
 
-  n_clases=cm.shape[0]
 
-  tp = np.zeros(n_clases)
-  fp = np.zeros(n_clases)
-  fn = np.zeros(n_clases)
-  tn = np.zeros(n_clases)
-  specificity = []
-  fpr = dict()
-  tpr = dict()
-  roc_auc = dict()
+'''Figuras'''
 
-  for i in range(n_clases):
-    tp[i] = cm[i, i]
-    print(f"True positive clase  {titulo} " , i, ":", tp[i])
-    fp[i] = np.sum(cm[:, i]) - tp[i]
-    print(f"False positive clase {titulo} " , i, ":",fp[i])
-    fn[i] = np.sum(cm[i, :]) - tp[i]
-    print(f"False negative clase {titulo} " , i, ":",fn[i])
-    tn[i] = np.sum(cm) - tp[i] - fp[i] - fn[i]
-    print(f"True negative clase {titulo} " , i, ":",tn[i],"\n")
-    spe = tn[i] / (tn[i] + fp[i])
-    specificity.append(spe)
-
-  # calculamos las métricas principales para train
-  accuracy = metrics.accuracy_score(y_train, y_train_pred) # fracción de clasificaciones correctas
-  f1 = metrics.f1_score(y_train, y_train_pred, average='macro') # media ponderada o media armonizada
-  prec = metrics.precision_score(y_train, y_train_pred, average='macro', zero_division=0) # fracción de positivos que son correctos TP / TP + FP
-  recall = metrics.recall_score(y_train, y_train_pred, average='macro') # francción de verdaderos positivos (sensibilidad) TP / TP + FN
-
-  print(f"Accuracy set train {titulo} =  {accuracy:.2%}")
-  print(f"Precisión set train {titulo}   =  {prec:.2%}")
-  print(f"Recall set train {titulo} =   {recall:.2%} ")
-  print(f"F1 score set train {titulo}   =  {f1:.2%}")
-  print("\n")
-
-  # calculamos las métricas principales para test
-  accuracy = metrics.accuracy_score(y_test, y_test_pred) # fracción de clasificaciones correctas
-  f1 = metrics.f1_score(y_test, y_test_pred, average='macro') # media ponderada o media armonizada
-  prec = metrics.precision_score(y_test, y_test_pred, average='macro', zero_division=0) # fracción de positivos que son correctos TP / TP + FP
-  recall = metrics.recall_score(y_test, y_test_pred, average='macro') # francción de verdaderos positivos (sensibilidad) TP / TP + FN
-  specificity_avg = np.mean(specificity) # francción de verdaderos negativos (specificity) tn / (tn + fp)
-
-  print(f"Accuracy set test {titulo} =  {accuracy:.2%}")
-  print(f"Precisión set test {titulo}   =  {prec:.2%}")
-  print(f"Recall set test {titulo} =   {recall:.2%}")
-  print(f"Specificity set test {titulo} =  {specificity_avg:.2%}")
-  print(f"F1 score set test {titulo}   =  {f1:.2%}")
-  print("\n")
-
-  lscores = [(accuracy, prec, recall, specificity_avg, f1, accuracy_cv, accuracy_cv_std)]
-
-  global df_scores
-  if 'df_scores' not in globals():
-    df_scores = pd.DataFrame(columns=['Model', 'Accuracy', 'Precision', 'Recall', 'Specificity', 'F1 Score', 'Avg CV Accuracy', 'Standard Deviation of CV Accuracy'])
-
-  nuevoregistro = pd.DataFrame(data=lscores, columns=['Accuracy', 'Precision', 'Recall', 'Specificity', 'F1 Score', 'Avg CV Accuracy', 'Standard Deviation of CV Accuracy'])
-  nuevoregistro.insert(0, 'Model', titulo)
-  df_scores = pd.concat([df_scores, nuevoregistro], ignore_index=True)
-
-  print(f"Training MSE {titulo} = %f" % metrics.mean_squared_error(y_train_resampled_encoded, y_train_pred))
-  print(f"Test MSE {titulo} = %f" % metrics.mean_squared_error(y_test, y_test_pred))
-  print("\n")
-  print("Resumen scores modelos")
-  print(df_scores)
-
-  plot_matrizconfusion(titulo, cm)
-
-
-
-entrenamiento_prediccion_evaluacion(modelo,titulo,accuracy_cv,accuracy_cv_std,X_train_resampled_encoded, y_train_resampled_encoded, X_test_encoded, y_test_encoded)
-
-
-
-# In[180]:
-
-
-# Integracion con Herramienta 
-
-required_columns = [ 'n_dimensiones' ,
-            'tipo_datos',
-            'ordenadas',
-            'n_grupos_alto',
-            'relacion',
-            'obs_grupo',
-            'proposito',
-            'dataset_size',
-            'contexto']  # Definir las columnas requeridas
-
-# prediccion usando modelo entrenado y guardado
-
-model_path = r"C:\Users\34617\Documents\MASTER_DATA_SCIENCE\TFM\recomendador_AI\XGBOOST_F.sav"
-encoder_path = r"C:\Users\34617\Documents\MASTER_DATA_SCIENCE\TFM\recomendador_AI\feature_encoders.sav"
-label_encoder_path = r"C:\Users\34617\Documents\MASTER_DATA_SCIENCE\TFM\recomendador_AI\label_encoder_y.sav"
-
-# Cargar el modelo con pickle
-loaded_model = pickle.load(open(model_path, 'rb'))
-# Cargar los encoders
-encoders = pickle.load(open(encoder_path, 'rb'))
-label_encoder_y = pickle.load(open(label_encoder_path, 'rb'))
-
-# Función para sugerir tipo de gráfico
-def recommend_AI(features, modelo, label_encoder_y, encoders, required_columns):
-    input_data = []
-    for col in required_columns:
-        if col in features:
-            value = features[col]
-
-            # Verificar si la característica es categórica y usar el codificador adecuado
-            if col in encoders:  # Si existe un encoder para la columna
-                if pd.isna(value) or value not in encoders[col].classes_:
-                    raise ValueError(f"Valor inválido o no visto en la columna '{col}': {value}")
-                # Codificar la característica
-                encoded_value = encoders[col].transform([value])[0]
-                input_data.append(encoded_value)
-            else:
-                # Si la columna no es categórica, simplemente la agregamos
-                input_data.append(value)
-        else:
-            raise ValueError(f"Falta la característica '{col}' en las características proporcionadas.")
-    
-    input_array = np.array(input_data).reshape(1, -1)
-    predicted = modelo.predict(input_array)
-    #return input_array
-    return label_encoder_y.inverse_transform(predicted)[0]
+def _pyplot():
+    # Backend sin pantalla: las figuras solo se guardan a fichero
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib import pyplot as plt
+    return plt
 
 
-# Ejemplo de uso
-example_features = {
-    'n_dimensiones': '2D',
-    'tipo_datos': 'Numeric',
-    'ordenadas': 'No',
-    'n_grupos_alto': 'Not applicable',
-    'relacion': 'Not applicable',
-    'obs_grupo': 'Not applicable',
-    'proposito': 'Distribution',
-    'dataset_size': 'Medium',
-    'contexto': 'Technical presentation'
-}
+def grafico_frecuencias(y, titulo, path):
+    """
+    Frecuencia de cada clase como gráfico de barras horizontales.
+    """
+    import seaborn as sns
+    plt = _pyplot()
+    frec_clase = y.astype('category').value_counts().reset_index()
+    frec_clase.columns = ['clase', 'frecuencia']
+    fig = plt.figure(figsize=(30, 20))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        ax = sns.barplot(data=frec_clase, x='frecuencia', y='clase', hue='clase', palette='viridis', legend=False)
+    for contenedor in ax.containers:
+        ax.bar_label(contenedor, fontsize=10)
+    plt.title(titulo, fontsize=14)
+    fig.savefig(path, bbox_inches='tight')
+    plt.close(fig)
+
+
+'''Artefactos'''
+
+def _guardar_pickle(objeto, path):
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        pickle.dump(objeto, f)
+    os.replace(tmp, path)
+
+
+def guardar_artefactos(clf, encoders, label_encoder_y, columnas, directorio):
+    """
+    Escribe en directorio los tres .sav de siempre y, a partir de ellos, el codec, el
+    modelo nativo con su manifiesto y los árboles para NumPy. Devuelve {artefacto: path}.
+    """
+    import shutil
+    import tempfile
+    from codec import CodecCategorico
+    from modelo_nativo import exportar_modelo
+    from arboles_numpy import volcar_arboles, guardar_arboles
+    from tensor_recomendaciones import firma_fuentes
+
+    # Todo se escribe primero en un directorio temporal dentro de directorio; si algo falla
+    # no se publica nada. Después se renombran en este orden, con el manifiesto el último:
+    # hasta entonces el modelo nativo y los árboles nuevos no cuadran con el manifiesto
+    # viejo y recomendador.cargar_artefactos usa los .sav, que ya son los nuevos.
+    nombres = (MODELO_SAV, ENCODERS_SAV, LABEL_ENCODER_SAV, CODEC_JSON, MODELO_UBJ, ARBOLES_NPZ, MANIFIESTO_JSON)
+    os.makedirs(directorio, exist_ok=True)
+    temporal = tempfile.mkdtemp(prefix=".artefactos.", dir=directorio)
+    try:
+        en_temporal = {nombre: os.path.join(temporal, nombre) for nombre in nombres}
+        _guardar_pickle(clf, en_temporal[MODELO_SAV])
+        _guardar_pickle(encoders, en_temporal[ENCODERS_SAV])
+        _guardar_pickle(label_encoder_y, en_temporal[LABEL_ENCODER_SAV])
 
-suggested_chart = recommend_AI(example_features,loaded_model,label_encoder_y, encoders, required_columns)
-print(f"El gráfico sugerido es: {suggested_chart}")
+        # El codec lleva la firma de los encoders para que el recomendador sepa que está al día
+        firma = firma_fuentes([en_temporal[ENCODERS_SAV], en_temporal[LABEL_ENCODER_SAV]])
+        codec = CodecCategorico.desde_encoders(encoders, label_encoder_y, columnas, firma)
+        codec.guardar(en_temporal[CODEC_JSON])
+        manifiesto = exportar_modelo(clf, codec, en_temporal[MODELO_UBJ], en_temporal[MANIFIESTO_JSON])
+        guardar_arboles(volcar_arboles(clf.get_booster()), manifiesto["sha256"], en_temporal[ARBOLES_NPZ])
 
+        paths = {nombre: os.path.join(directorio, nombre) for nombre in nombres}
+        for nombre in nombres:
+            os.replace(en_temporal[nombre], paths[nombre])
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+    return paths
 
-# In[ ]:
 
+'''Entrenamiento completo'''
 
+# Modos de balancear las clases de train
+MODOS = ["sobremuestreo", "pesos"]
 
 
+def preparar_datos(df, modo="sobremuestreo"):
+    """
+    Separa, divide, balancea y codifica el dataset. Con modo "sobremuestreo" train se
+    balancea duplicando filas (como en el notebook); con "pesos" las filas idénticas se
+    colapsan y el balanceo va en sample_weight, con una matriz mucho más pequeña.
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo de entrenamiento no soportado: {modo}")
+    X, y = separar(df)
+    X_train, X_test, y_train, y_test = dividir(X, y)
+    if modo == "pesos":
+        X_train_balanceado, y_train_balanceado, pesos = colapsar_con_pesos(X_train, y_train)
+    else:
+        X_train_balanceado, y_train_balanceado = sobremuestrear(X_train, y_train)
+        pesos = None
+    (encoders, label_encoder_y, X_train_encoded, y_train_encoded,
+     X_test_encoded, y_test_encoded) = codificar(X_train_balanceado, y_train_balanceado, X_test, y_test)
+    return dict(X=X, y=y, y_train=y_train, y_train_balanceado=y_train_balanceado, pesos=pesos,
+                encoders=encoders, label_encoder_y=label_encoder_y,
+                X_train=X_train_encoded, y_train_encoded=y_train_encoded,
+                X_test=X_test_encoded, y_test=y_test_encoded)
+
+
+def entrenar(df, salida=BASE_DIR, informe=None, figuras=True, particiones_cv=5, parametros=None, tiempos=None,
+             modo="sobremuestreo", cv_externa=None):
+    """
+    Pipeline completo sobre el DataFrame del dataset de entrenamiento. Devuelve el
+    resumen que también se guarda en informe/resultados.json. Los tiempos por etapa se
+    añaden a tiempos si se pasa (p. ej. con el de la lectura). cv_externa = (media,
+    desviación) evita repetir la validación cruzada si ya se ha hecho (busqueda.py).
+    """
+    import pandas as pd
+    from evaluacion import guardar_scores, plot_matrizconfusion
+    tiempos = {} if tiempos is None else tiempos
+    informe = informe or os.path.join(salida, INFORME_DIR)
+    if figuras:
+        os.makedirs(informe, exist_ok=True)
+    titulo = 'XGBoost'
+
+    with etapa("preparacion", tiempos):
+        datos = preparar_datos(df, modo)
+    X, pesos = datos["X"], datos["pesos"]
+    encoders, label_encoder_y = datos["encoders"], datos["label_encoder_y"]
+    X_train_encoded, y_train_encoded = datos["X_train"], datos["y_train_encoded"]
+    X_test_encoded, y_test_encoded = datos["X_test"], datos["y_test"]
+    print(f"Dimensiones de todo el conjunto de datos {X.shape}, de train {datos['y_train'].shape[0]}, "
+          f"de train con {modo} {X_train_encoded.shape} y de test {X_test_encoded.shape}", file=sys.stderr)
+
+    if figuras:
+        with etapa("figuras_clases", tiempos):
+            grafico_frecuencias(datos["y"], 'Frecuencia por clase', os.path.join(informe, "frecuencia_clases.png"))
+            grafico_frecuencias(datos["y_train"], 'Frecuencia por clase en Train sin sobremuestreo',
+                                os.path.join(informe, "frecuencia_clases_train.png"))
+            if pesos is None:
+                grafico_frecuencias(pd.Series(datos["y_train_balanceado"]),
+                                    'Frecuencia por clase en Train con sobremuestreo',
+                                    os.path.join(informe, "frecuencia_clases_train_sobremuestreo.png"))
+
+    with etapa("entrenamiento", tiempos):
+        clf, duracion = train_pred(X_train_encoded, y_train_encoded, parametros, pesos)
+
+    if cv_externa is not None:
+        accuracy_cv, accuracy_cv_std = cv_externa
+    else:
+        with etapa("validacion_cruzada", tiempos):
+            accuracy_cv, accuracy_cv_std = validacion_cruzada(X_train_encoded, y_train_encoded, particiones_cv,
+                                                              parametros, pesos)
+
+    with etapa("evaluacion", tiempos):
+        scores, train, cm, tabla = evaluar(clf, titulo, X_train_encoded, y_train_encoded, X_test_encoded,
+                                           y_test_encoded, list(label_encoder_y.classes_), accuracy_cv, accuracy_cv_std)
+        importancia = format_importance(clf, list(X.columns))
+        # Cada ejecución se añade al histórico de scores (evaluacion.leer_scores para consultarlo)
+        os.makedirs(informe, exist_ok=True)
+        guardar_scores(os.path.join(informe, SCORES_SQLITE), titulo, tabla,
+                       {"modo": modo, "parametros": parametros or {}, "filas": len(df),
+                        "accuracy_cv": accuracy_cv, "accuracy_cv_std": accuracy_cv_std})
+
+    if figuras:
+        with etapa("figura_confusion", tiempos):
+            plot_matrizconfusion(titulo, cm, list(label_encoder_y.classes_),
+                                 os.path.join(informe, "matriz_confusion.png"))
+
+    with etapa("artefactos", tiempos):
+        paths = guardar_artefactos(clf, encoders, label_encoder_y, list(X.columns), salida)
+
+    resumen = {
+        "fecha": datetime.datetime.now().isoformat(timespec='seconds'),
+        "filas": len(df),
+        "modo": modo,
+        "filas_train": len(X_train_encoded),
+        "clases": len(label_encoder_y.classes_),
+        "tiempo_entrenamiento": duracion,
+        "scores": scores,
+        "train": train,
+        "importancia": importancia.to_dict(orient="records"),
+        "parametros": {k: v for k, v in clf.get_params(deep=True).items() if v is not None and k != 'missing'},
+        "tiempos": tiempos,
+        "artefactos": paths,
+    }
+    os.makedirs(informe, exist_ok=True)
+    with open(os.path.join(informe, "resultados.json"), 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=1, default=str)
+    return resumen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entrena el recomendador AI y guarda sus artefactos")
+    parser.add_argument("--fichero", metavar="XLSX_O_CSV",
+                        help=f"Lee el dataset de un fichero en vez de la tabla {TABLA_ENTRENAMIENTO}")
+    parser.add_argument("--salida", default=BASE_DIR,
+                        help="Directorio donde se escriben los artefactos (por defecto el del recomendador)")
+    parser.add_argument("--informe", metavar="DIR",
+                        help=f"Directorio de figuras y resultados.json (por defecto SALIDA/{INFORME_DIR})")
+    parser.add_argument("--modo", choices=MODOS, default="sobremuestreo",
+                        help="Balanceo de clases: duplicando filas (por defecto) o con filas únicas y sample_weight")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="Lee siempre el origen sin usar ni actualizar la caché del dataset en SALIDA")
+    parser.add_argument("--sin-figuras", action="store_true", help="No genera las figuras")
+    parser.add_argument("--cv", type=int, default=5,
+                        help="Particiones de la validación cruzada sobre train (0 la omite, por defecto 5)")
+    parser.add_argument("--parametros", metavar="JSON", default="{}",
+                        help="Parámetros de XGBClassifier en JSON, p. ej. '{\"max_depth\": 4}'")
+    args = parser.parse_args()
+
+    tiempos = {}
+    with etapa("lectura", tiempos):
+        df, desde_cache = leer_dataset_entrenamiento(args.fichero, None if args.sin_cache else args.salida)
+    if desde_cache:
+        print("Dataset leído de la caché (el origen no ha cambiado)", file=sys.stderr)
+    resumen = entrenar(df, args.salida, args.informe, not args.sin_figuras, args.cv, json.loads(args.parametros),
+                       tiempos, args.modo)
+
+    scores = resumen["scores"]
+    print("Resultados del Modelo XGBoost:")
+    print("  " + ", ".join(f"{k} {v:.2%}" for k, v in scores.items() if k != 'Model'))
+    print(f"  Entrenamiento {resumen['tiempo_entrenamiento']:.2f} s con {resumen['filas_train']} "
+          f"filas, {resumen['clases']} clases")
+    print("Importancia de Características:")
+    for fila in resumen["importancia"]:
+        print(f"  {fila['Feature']:15s} {fila['Feature Importance']:.4f}")
+    print(f"Artefactos en {args.salida}; tiempo total {sum(resumen['tiempos'].values()):.2f} s", file=sys.stderr)
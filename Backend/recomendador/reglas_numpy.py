@@ -0,0 +1,178 @@
+import sys
+import numpy as np
+
+'''Evaluador de la tabla de reglas con NumPy para lotes de respuestas codificadas'''
+
+# recommend_rule y TablaReglas recomiendan un diccionario de respuestas cada vez. Para
+# trabajo fuera de línea (auditar la cobertura de las reglas, recalcular millones de
+# respuestas registradas) aquí se compila la misma tabla a máscaras booleanas sobre
+# columnas de códigos enteros (los del codec):
+#   - por columna y código, una máscara de las reglas cuya condición sobre esa columna se
+#     cumple (las reglas que no la restringen siempre la cumplen), empaquetada en bits
+#     de palabras uint64 (97 reglas caben en dos);
+#   - las reglas que se cumplen en una fila son el AND de las máscaras de sus nueve
+#     códigos: nueve indexaciones por palabra para todo el bloque;
+#   - la primera regla que se cumple es el bit más bajo de la primera palabra no vacía,
+#     que elige np.select, como la tabla.
+# Con máscaras por regla (un array booleano por condición y un AND por condición de cada
+# regla) el mismo lote tardaba unas 4 veces más.
+# Las máscaras tienen 256 entradas, así que un código sin clase en el codec (hasta 255)
+# se trata como un valor que no aparece en ninguna regla, igual que None o
+# 'Not applicable' en recommend_rule. El lote se recorre por bloques para que los
+# intermedios quepan en caché.
+#
+#   python reglas_numpy.py     # comprueba que coincide con recommend_rule en todas las combinaciones
+
+# Código del gráfico cuando no se cumple ninguna regla ('No suggestion available')
+SIN_SUGERENCIA = -1
+
+# Filas por bloque
+FILAS_BLOQUE = 1 << 14
+
+# Entradas de cada máscara: cualquier código uint8
+N_CODIGOS = 256
+
+BITS_PALABRA = 64
+
+
+class ReglasNumpy:
+    """
+    Tabla de reglas compilada a máscaras de bits por columna y código del codec.
+    """
+
+    def __init__(self, tabla, codec):
+        self.columnas = list(codec.columnas)
+        self.por_defecto = tabla.por_defecto
+        self.n_reglas = len(tabla.reglas)
+        # Gráficos distintos en el orden de la tabla; código de gráfico de cada regla
+        self.graficos = list(dict.fromkeys(grafico for _, grafico in tabla.reglas))
+        self.grafico_regla = np.array([self.graficos.index(g) for _, g in tabla.reglas], dtype=np.int16)
+
+        palabras = max(1, -(-self.n_reglas // BITS_PALABRA))
+        cumple = np.ones((len(self.columnas), N_CODIGOS, palabras * BITS_PALABRA), dtype=bool)
+        cumple[:, :, self.n_reglas:] = False
+        for regla, (condiciones, _) in enumerate(tabla.reglas):
+            for campo, (valores, excluye) in condiciones.items():
+                if campo not in codec.codigos:
+                    # El campo no llega nunca en las respuestas codificadas: vale como ausente (None)
+                    cumple[:, :, regla] &= (None in valores) != excluye
+                    continue
+                j = self.columnas.index(campo)
+                cumple[j, :, regla] &= excluye
+                for valor, codigo in codec.codigos[campo].items():
+                    cumple[j, codigo, regla] = (valor in valores) != excluye
+        # Bits de cada palabra: la regla 64 * w + b es el bit b de la palabra w
+        pesos = np.left_shift(np.uint64(1), np.arange(BITS_PALABRA, dtype=np.uint64))
+        bits = cumple.reshape(len(self.columnas), N_CODIGOS, palabras, BITS_PALABRA).astype(np.uint64) * pesos
+        # mascaras[w][j]: array (N_CODIGOS,) uint64 contiguo para indexar con take
+        self.mascaras = [[np.ascontiguousarray(bits[j, :, w].sum(axis=-1, dtype=np.uint64))
+                          for j in range(len(self.columnas))] for w in range(palabras)]
+
+    def _columnas(self, codigos):
+        """
+        Lista de columnas 1-D en el orden del codec a partir de un array (n, columnas) o
+        de un dict {columna: array}.
+        """
+        if isinstance(codigos, dict):
+            return [np.asarray(codigos[col]) for col in self.columnas]
+        codigos = np.asarray(codigos)
+        if codigos.ndim != 2 or codigos.shape[1] != len(self.columnas):
+            raise ValueError(f"Se esperaba un array (n, {len(self.columnas)}) de códigos y llegó {codigos.shape}")
+        return [codigos[:, j] for j in range(codigos.shape[1])]
+
+    def reglas_aplicadas(self, codigos):
+        """
+        Índice de la primera regla que se cumple en cada fila, o -1 si ninguna.
+        """
+        columnas = self._columnas(codigos)
+        n = len(columnas[0])
+        resultado = np.empty(n, dtype=np.int16)
+        for inicio in range(0, n, FILAS_BLOQUE):
+            bloque = [np.ascontiguousarray(c[inicio:inicio + FILAS_BLOQUE]) for c in columnas]
+            no_vacias, primeras = [], []
+            for w, mascaras in enumerate(self.mascaras):
+                acumulada = mascaras[0].take(bloque[0])
+                for mascara, columna in zip(mascaras[1:], bloque[1:]):
+                    acumulada &= mascara.take(columna)
+                # x & -x deja solo el bit más bajo; su exponente es la posición
+                bajo = acumulada & (~acumulada + np.uint64(1))
+                no_vacias.append(acumulada != 0)
+                primeras.append(np.frexp(bajo.astype(np.float64))[1] - 1 + w * BITS_PALABRA)
+            resultado[inicio:inicio + len(bloque[0])] = np.select(no_vacias, primeras, default=SIN_SUGERENCIA)
+        return resultado
+
+    def evaluar(self, codigos):
+        """
+        Código de gráfico (índice en self.graficos) de cada fila, o SIN_SUGERENCIA.
+        """
+        return self.graficos_de_reglas(self.reglas_aplicadas(codigos))
+
+    def graficos_de_reglas(self, reglas):
+        """
+        Índices de regla (de reglas_aplicadas) -> códigos de gráfico.
+        """
+        return np.where(reglas == SIN_SUGERENCIA, SIN_SUGERENCIA, self.grafico_regla[reglas])
+
+    def etiquetas_de(self, codigos_grafico):
+        """
+        Códigos de gráfico -> array de nombres (SIN_SUGERENCIA es el por_defecto de la tabla).
+        """
+        nombres = np.array(self.graficos + [self.por_defecto], dtype=object)
+        return nombres[np.asarray(codigos_grafico)]
+
+    def recomendar(self, codigos):
+        return self.etiquetas_de(self.evaluar(codigos))
+
+
+def compilar(reglas, codec):
+    """
+    ReglasNumpy de una TablaReglas o de unas ReglasRecargables (con la tabla vigente).
+    """
+    return ReglasNumpy(getattr(reglas, "tabla", reglas), codec)
+
+
+def todas_las_combinaciones(codec, desconocido=False):
+    """
+    Array (combinaciones, columnas) de códigos en el orden C de np.indices. Con
+    desconocido se añade por columna un código sin clase.
+    """
+    forma = tuple(n + 1 for n in codec.forma) if desconocido else codec.forma
+    return np.indices(forma, dtype=np.uint8).reshape(len(forma), -1).T
+
+
+if __name__ == "__main__":
+    # Verificación exhaustiva contra recommend_rule, también con un valor desconocido por campo
+    import time
+    import warnings
+    warnings.simplefilter('ignore')
+    import recomendador
+    from codec import cargar_codec
+    from tabla_reglas import cargar_reglas
+
+    codec = cargar_codec()
+    reglas = compilar(cargar_reglas(), codec)
+    codigos = todas_las_combinaciones(codec, desconocido=True)
+    inicio = time.perf_counter()
+    aplicadas = reglas.reglas_aplicadas(codigos)
+    obtenido = reglas.etiquetas_de(reglas.graficos_de_reglas(aplicadas))
+    segundos = time.perf_counter() - inicio
+
+    valores = [list(codec.clases[col]) + [None] for col in codec.columnas]
+    diferencias = 0
+    for fila, obtenida in zip(codigos, obtenido):
+        data = {col: valores[j][c] for j, (col, c) in enumerate(zip(codec.columnas, fila))}
+        esperado = recomendador.recommend_rule(data)
+        if esperado != obtenida:
+            diferencias += 1
+            if diferencias <= 20:
+                print(f"{data}: recommend_rule={esperado!r} numpy={obtenida!r}", file=sys.stderr)
+    print(f"{len(codigos) - diferencias}/{len(codigos)} combinaciones coinciden "
+          f"(evaluadas en {segundos * 1000:.0f} ms)")
+
+    # Cobertura: reglas que no decide ninguna combinación (las tapa una anterior)
+    veces = np.bincount(aplicadas[aplicadas != SIN_SUGERENCIA], minlength=reglas.n_reglas)
+    muertas = np.flatnonzero(veces == 0)
+    print(f"{reglas.n_reglas - len(muertas)}/{reglas.n_reglas} reglas deciden alguna "
+          f"combinación; sin sugerencia {int((aplicadas == SIN_SUGERENCIA).sum())}"
+          + (f"; reglas que nunca se aplican: {', '.join(map(str, muertas))}" if len(muertas) else ""))
+    sys.exit(1 if diferencias else 0)
@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import itertools
+
+'''Recomendador por reglas compilado desde una tabla de decisión declarativa'''
+
+# Las reglas viven en reglas.json (condiciones -> gráfico) y al cargarlas se compilan a
+# un árbol de decisión: cada nodo mira una respuesta y salta al hijo de su valor (o al de
+# OTRO si el valor no aparece en ninguna regla o falta), hasta una hoja con el gráfico.
+# Cada nodo representa las reglas que aún pueden cumplirse, en el orden de la tabla, con
+# las condiciones que les quedan; en cuanto la primera no tiene condiciones pendientes
+# es la que se aplica. Los nodos con el mismo conjunto de reglas pendientes se comparten,
+# así que el árbol es un grafo pequeño y recomendar son unas pocas búsquedas en
+# diccionarios, sin recorrer las reglas.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REGLAS_PATH = os.path.join(BASE_DIR, "reglas.json")
+
+# Valor de la clave para respuestas que no aparecen en ninguna regla
+OTRO = object()
+
+
+def _expandir_valores(valores, conjuntos):
+    """
+    Convierte una condición de la tabla en (frozenset de valores, excluye).
+    """
+    excluye = False
+    if isinstance(valores, dict):
+        if set(valores) != {"excepto"}:
+            raise ValueError(f"Condición no soportada: {valores}")
+        valores, excluye = valores["excepto"], True
+    if not isinstance(valores, list):
+        valores = [valores]
+    expandidos = set()
+    for valor in valores:
+        if isinstance(valor, str) and valor.startswith("$"):
+            if valor[1:] not in conjuntos:
+                raise ValueError(f"Conjunto no definido en la tabla de reglas: {valor}")
+            expandidos.update(conjuntos[valor[1:]])
+        else:
+            expandidos.add(valor)
+    return frozenset(expandidos), excluye
+
+
+class TablaReglas:
+    """
+    Árbol de decisión compilado a partir de la tabla de reglas.
+    """
+
+    def __init__(self, tabla):
+        conjuntos = tabla.get("conjuntos", {})
+        self.por_defecto = tabla.get("por_defecto", "No suggestion available")
+        self.reglas = []
+        for n, regla in enumerate(tabla["reglas"]):
+            if "si" not in regla or "grafico" not in regla:
+                raise ValueError(f"La regla {n} debe tener 'si' y 'grafico': {regla}")
+            condiciones = {campo: _expandir_valores(valores, conjuntos)
+                           for campo, valores in regla["si"].items()}
+            self.reglas.append((condiciones, regla["grafico"]))
+
+        # Dominio de cada respuesta: valores que aparecen en las reglas
+        self._dominios = {}
+        for condiciones, _ in self.reglas:
+            for campo, (valores, _) in condiciones.items():
+                self._dominios.setdefault(campo, set()).update(valores)
+
+        nodos = {}
+        self._raiz = self._compilar(tuple((n, frozenset(condiciones))
+                                          for n, (condiciones, _) in enumerate(self.reglas)), nodos)
+        self.n_nodos = sum(isinstance(nodo, tuple) for nodo in nodos.values())
+
+    def _compilar(self, pendientes, nodos):
+        """
+        Nodo para unas reglas candidatas: tupla de (índice de regla, campos que le quedan
+        por mirar). Una hoja es el gráfico; un nodo interno, (campo, {valor: hijo}, hijo
+        para OTRO).
+        """
+        try:
+            return nodos[pendientes]
+        except KeyError:
+            pass
+        if not pendientes:
+            nodo = self.por_defecto
+        elif not pendientes[0][1]:
+            nodo = self.reglas[pendientes[0][0]][1]
+        else:
+            # Se mira un campo de la primera regla, el que más reglas candidatas restringe
+            campo = max(sorted(pendientes[0][1]), key=lambda c: sum(c in campos for _, campos in pendientes))
+            otro = self._compilar(self._filtrar(pendientes, campo, OTRO), nodos)
+            ramas = {}
+            for valor in self._dominios[campo]:
+                hijo = self._compilar(self._filtrar(pendientes, campo, valor), nodos)
+                if hijo is not otro:
+                    ramas[valor] = hijo
+            nodo = (campo, ramas, otro) if ramas else otro
+        nodos[pendientes] = nodo
+        return nodo
+
+    def _filtrar(self, pendientes, campo, valor):
+        """
+        Reglas candidatas que siguen cumpliéndose cuando campo vale valor.
+        """
+        quedan = []
+        for n, campos in pendientes:
+            if campo in campos:
+                valores, excluye = self.reglas[n][0][campo]
+                if (valor in valores) == excluye:
+                    continue
+                campos = campos - {campo}
+            quedan.append((n, campos))
+        return tuple(quedan)
+
+    def recommend(self, data):
+        """
+        Mismo contrato que recommend_rule: diccionario de respuestas -> gráfico.
+        """
+        nodo = self._raiz
+        while type(nodo) is tuple:
+            campo, ramas, otro = nodo
+            try:
+                nodo = ramas.get(data.get(campo), otro)
+            except TypeError:  # valor no hashable, no puede aparecer en ninguna regla
+                nodo = otro
+        return nodo
+
+    __call__ = recommend
+
+
+def cargar_reglas(path=REGLAS_PATH):
+    """
+    Lee y compila la tabla de reglas.
+    """
+    with open(path, encoding='utf-8') as f:
+        return TablaReglas(json.load(f))
+
+
+class ReglasRecargables:
+    """
+    Tabla de reglas que se recompila sola cuando cambia el fichero, para poder
+    modificar las reglas sin tocar código ni reiniciar el proceso.
+    """
+
+    def __init__(self, path=REGLAS_PATH):
+        self.path = path
+        self._mtime = os.stat(path).st_mtime_ns
+        self.tabla = cargar_reglas(path)
+
+    def recargar_si_cambia(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime != self._mtime:
+            tabla = cargar_reglas(self.path)  # si la tabla nueva es inválida seguimos con la anterior
+            self.tabla, self._mtime = tabla, mtime
+            return True
+        return False
+
+    def recommend(self, data):
+        self.recargar_si_cambia()
+        return self.tabla.recommend(data)
+
+    __call__ = recommend
+
+
+def verificar_equivalencia(tabla, reglas, clases, required_columns):
+    """
+    Compara la tabla con la función de reglas en todas las combinaciones de clases.
+    Devuelve la lista de diferencias (respuestas, esperado, obtenido).
+    """
+    diferencias = []
+    listas = [list(clases[col]) for col in required_columns]
+    for combinacion in itertools.product(*listas):
+        data = dict(zip(required_columns, combinacion))
+        esperado = reglas(data)
+        obtenido = tabla.recommend(data)
+        if esperado != obtenido:
+            diferencias.append((data, esperado, obtenido))
+    return diferencias
+
+
+if __name__ == "__main__":
+    # Verificación exhaustiva de la tabla contra recommend_rule
+    import warnings
+    warnings.simplefilter('ignore')
+    import recomendador
+
+    _, _, encoders = recomendador.cargar_artefactos()
+    clases = {col: list(encoders[col].classes_) for col in recomendador.REQUIRED_COLUMNS}
+    # Añadimos un valor ausente por campo para cubrir también respuestas fuera de los encoders
+    clases = {col: valores + [None] for col, valores in clases.items()}
+    diferencias = verificar_equivalencia(cargar_reglas(), recomendador.recommend_rule, clases,
+                                         recomendador.REQUIRED_COLUMNS)
+    total = 1
+    for valores in clases.values():
+        total *= len(valores)
+    for data, esperado, obtenido in diferencias[:20]:
+        print(f"{data}: recommend_rule={esperado!r} tabla={obtenido!r}", file=sys.stderr)
+    print(f"{total - len(diferencias)}/{total} combinaciones coinciden")
+    sys.exit(1 if diferencias else 0)
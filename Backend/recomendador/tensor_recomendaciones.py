@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import itertools
+import numpy as np
+from codec import CodecCategorico
+from cache_dataset import sha256_fichero
+
+'''Tensor precalculado de recomendaciones sobre todo el espacio del cuestionario'''
+
+# Las nueve respuestas son categóricas y sus valores son exactamente los classes_ de los
+# encoders, así que el espacio de entrada es un producto cartesiano finito (243.000
+# combinaciones). Calculamos ambos recomendadores una vez para todas ellas y guardamos
+# las etiquetas codificadas en un array de 9+1 dimensiones:
+#   tensor[c_1, ..., c_9, 0] -> recomendación por reglas
+#   tensor[c_1, ..., c_9, 1] -> recomendación IA
+# donde c_i es el código de la respuesta i en su encoder. Los valores del tensor son
+# índices en la lista de etiquetas del manifiesto, que empieza por label_encoder_y.classes_
+# y añade al final las etiquetas de las reglas que el modelo no conoce.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TENSOR_PATH = os.path.join(BASE_DIR, "tensor_recomendaciones.npy")
+MANIFEST_PATH = os.path.join(BASE_DIR, "tensor_recomendaciones.json")
+
+METODOS = ["rule_based", "ai_based"]
+
+
+def firma_fuentes(paths):
+    """
+    Firma de todo aquello de lo que depende el tensor: los ficheros del modelo, los
+    encoders y la tabla de reglas.
+    """
+    return {os.path.basename(p): sha256_fichero(p) for p in paths}
+
+
+def columna_reglas(reglas, codec, etiquetas):
+    """
+    Recomendación por reglas de todas las combinaciones, en el orden C de np.indices,
+    como índices en etiquetas (a la que se añaden las que falten). Una TablaReglas (o
+    ReglasRecargables) se evalúa con reglas_numpy de una vez; cualquier otra función
+    de reglas, combinación a combinación.
+    """
+    indice_etiqueta = {e: i for i, e in enumerate(etiquetas)}
+
+    def indice(etiqueta):
+        if etiqueta not in indice_etiqueta:
+            indice_etiqueta[etiqueta] = len(etiquetas)
+            etiquetas.append(etiqueta)
+        return indice_etiqueta[etiqueta]
+
+    if hasattr(getattr(reglas, "tabla", reglas), "reglas"):
+        from reglas_numpy import compilar, todas_las_combinaciones
+        compiladas = compilar(reglas, codec)
+        graficos = compiladas.evaluar(todas_las_combinaciones(codec))
+        # SIN_SUGERENCIA (-1) indexa el último nombre, el por_defecto de la tabla
+        nombres = compiladas.graficos + [compiladas.por_defecto]
+        traduccion = np.zeros(len(nombres), dtype=np.int64)
+        for g in np.unique(graficos):
+            traduccion[g] = indice(nombres[g])
+        return traduccion[graficos]
+
+    clases = [codec.clases[col] for col in codec.columnas]
+    columna = np.empty(int(np.prod(codec.forma)), dtype=np.int64)
+    # itertools.product recorre las combinaciones en el mismo orden (C) que np.indices
+    for fila, combinacion in enumerate(itertools.product(*clases)):
+        columna[fila] = indice(reglas(dict(zip(codec.columnas, combinacion))))
+    return columna
+
+
+def construir_tensor(reglas, modelo, codec):
+    """
+    Ejecuta ambos recomendadores sobre todas las combinaciones posibles de respuestas.
+    Devuelve el tensor uint8 y la lista de etiquetas a la que apuntan sus valores.
+    """
+    forma = codec.forma
+
+    # El índice de cada valor en su lista de clases es su código: la rejilla de índices
+    # es directamente la entrada codificada del modelo
+    codigos = np.indices(forma).reshape(len(forma), -1).T
+    prediccion_ai = modelo.predict(codigos)
+
+    etiquetas = list(codec.etiquetas)
+    prediccion_reglas = columna_reglas(reglas, codec, etiquetas)
+
+    if len(etiquetas) > np.iinfo(np.uint8).max + 1:
+        raise ValueError(f"Demasiadas etiquetas para codificar en uint8: {len(etiquetas)}")
+
+    tensor = np.stack([prediccion_reglas, prediccion_ai], axis=-1).astype(np.uint8)
+    return tensor.reshape(forma + (len(METODOS),)), etiquetas
+
+
+def manifiesto_tensor(tensor, etiquetas, codec, firma):
+    return {
+        "columnas": list(codec.columnas),
+        "clases": codec.clases,
+        "metodos": METODOS,
+        "etiquetas": etiquetas,
+        "forma": list(tensor.shape),
+        "firma": firma,
+    }
+
+
+def guardar_tensor(tensor, etiquetas, codec, firma, tensor_path=TENSOR_PATH, manifest_path=MANIFEST_PATH):
+    """
+    Guarda el tensor en .npy (para poder mapearlo en memoria) y su manifiesto en JSON.
+    """
+    manifiesto = manifiesto_tensor(tensor, etiquetas, codec, firma)
+    # Escribimos a un temporal y renombramos para que un lector nunca vea un fichero a medias
+    tmp_tensor = tensor_path + ".tmp"
+    with open(tmp_tensor, 'wb') as f:
+        np.save(f, tensor)
+    os.replace(tmp_tensor, tensor_path)
+    tmp_manifest = manifest_path + ".tmp"
+    with open(tmp_manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_manifest, manifest_path)
+
+
+class TensorRecomendaciones:
+    """
+    Tensor de recomendaciones mapeado en memoria. Recomendar es una indexación.
+    """
+
+    def __init__(self, tensor, manifiesto):
+        self.tensor = tensor
+        self.manifiesto = manifiesto
+        self.columnas = manifiesto["columnas"]
+        self.etiquetas = manifiesto["etiquetas"]
+        self.codec = CodecCategorico({col: manifiesto["clases"][col] for col in self.columnas}, self.etiquetas)
+
+    def recomendar(self, features):
+        fila = self.tensor[self.codec.codificar(features)]
+        return {metodo: self.etiquetas[fila[i]] for i, metodo in enumerate(self.manifiesto["metodos"])}
+
+    def recomendar_codigos(self, codigos):
+        """
+        Versión por lotes de recomendar sobre un array (n, columnas) de códigos: una sola
+        indexación. Devuelve {método: array de etiquetas}.
+        """
+        filas = self.tensor[tuple(np.asarray(codigos, dtype=np.intp).T)]
+        etiquetas = np.array(self.etiquetas, dtype=object)
+        return {metodo: etiquetas[filas[:, i]] for i, metodo in enumerate(self.manifiesto["metodos"])}
+
+    def vigente(self, firma):
+        return self.manifiesto.get("firma") == firma
+
+    def recalcular_reglas(self, reglas):
+        """
+        Recalcula en memoria solo la parte de reglas del tensor, p. ej. tras recargar la
+        tabla de reglas. La parte IA no cambia.
+        """
+        etiquetas = list(self.etiquetas)
+        columna = columna_reglas(reglas, self.codec, etiquetas)
+        if len(etiquetas) > np.iinfo(np.uint8).max + 1:
+            raise ValueError(f"Demasiadas etiquetas para codificar en uint8: {len(etiquetas)}")
+        tensor = np.array(self.tensor)  # copia en memoria, el mmap es de solo lectura
+        tensor[..., self.manifiesto["metodos"].index("rule_based")] = columna.reshape(tensor.shape[:-1])
+        self.tensor, self.etiquetas = tensor, etiquetas
+
+
+def cargar_tensor(tensor_path=TENSOR_PATH, manifest_path=MANIFEST_PATH):
+    """
+    Carga el manifiesto y mapea el tensor en memoria (mmap de solo lectura).
+    """
+    with open(manifest_path, encoding='utf-8') as f:
+        manifiesto = json.load(f)
+    tensor = np.load(tensor_path, mmap_mode='r')
+    if list(tensor.shape) != manifiesto["forma"]:
+        raise ValueError(f"El tensor {tensor_path} no coincide con su manifiesto")
+    return TensorRecomendaciones(tensor, manifiesto)
+
+
+if __name__ == "__main__":
+    # Reconstruye el tensor con el modelo y las reglas actuales
+    import warnings
+    import time
+    warnings.simplefilter('ignore')
+    import recomendador
+    from tabla_reglas import cargar_reglas
+
+    inicio = time.time()
+    modelo, codec, _ = recomendador.cargar_artefactos(usar_codec=True)
+    tensor, etiquetas = construir_tensor(cargar_reglas(), modelo, codec)
+    guardar_tensor(tensor, etiquetas, codec, recomendador.firma_tensor())
+    print(f"Tensor {tensor.shape} guardado en {TENSOR_PATH} en {time.time() - inicio:.1f}s", file=sys.stderr)
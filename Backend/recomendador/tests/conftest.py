@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del recomendador se importan por nombre, como cuando se lanzan desde su directorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,44 @@
+from cache import CacheRecomendaciones
+
+COLUMNAS = ["a", "b"]
+
+
+def _cache(tmp_path, funcion, recargar):
+    fuente = tmp_path / "modelo.sav"
+    fuente.write_text("1")
+    cache = CacheRecomendaciones(funcion, COLUMNAS, fuentes=[str(fuente)], intervalo_comprobacion=0,
+                                 recargar=recargar)
+    return cache, fuente
+
+
+def test_recarga_el_recomendador_al_cambiar_las_fuentes(tmp_path):
+    cache, fuente = _cache(tmp_path, lambda r: {"modelo": 1}, lambda: (lambda r: {"modelo": 2}))
+    assert cache({"a": "x", "b": "y"}) == {"modelo": 1}
+    assert cache({"a": "x", "b": "y"}) == {"modelo": 1}
+    fuente.write_text("22")
+    assert cache({"a": "x", "b": "y"}) == {"modelo": 2}
+    assert cache.estadisticas()["invalidaciones"] == 1
+
+
+def test_sin_recargar_si_falla_se_sigue_con_el_anterior(tmp_path):
+    def recargar():
+        raise OSError("artefactos a medio escribir")
+
+    cache, fuente = _cache(tmp_path, lambda r: {"modelo": 1}, recargar)
+    cache({"a": "x", "b": "y"})
+    fuente.write_text("22")
+    assert cache({"a": "x", "b": "y"}) == {"modelo": 1}
+    assert cache.estadisticas()["aciertos"] == 1
+    assert cache.estadisticas()["invalidaciones"] == 0
+
+
+def test_no_guarda_resultados_de_antes_de_vaciar(tmp_path):
+    cache = None
+
+    def funcion(respuestas):
+        cache.invalidar()  # otro hilo vacía la caché mientras se calcula
+        return {"modelo": 1}
+
+    cache, _ = _cache(tmp_path, funcion, None)
+    cache({"a": "x", "b": "y"})
+    assert cache.estadisticas()["tamano"] == 0
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bench_importtime import ESCENARIOS, medir_imports
+
+
+@pytest.mark.parametrize("nombre", sorted(ESCENARIOS))
+def test_arranque_sin_modulos_pesados(nombre):
+    # Los tiempos dependen de la máquina (los mide el propio bench_importtime.py); los
+    # módulos que se cargan no
+    argumentos, prohibidos, _ = ESCENARIOS[nombre]
+    _, modulos = medir_imports(argumentos)
+    assert sorted(p for p in prohibidos if p in modulos) == []
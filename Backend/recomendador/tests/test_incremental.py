@@ -0,0 +1,38 @@
+import json
+import pickle
+import warnings
+
+import pytest
+
+import incremental
+from tabla_reglas import REGLAS_PATH
+from recomendador_AI import BASE_DIR, LABEL_ENCODER_SAV
+
+
+def _label_encoder_y():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        with open(f"{BASE_DIR}/{LABEL_ENCODER_SAV}", 'rb') as f:
+            return pickle.load(f)
+
+
+def test_graficos_de_reglas_con_nombre_del_modelo():
+    # Cualquier rule_based que guarde el servidor tiene que poder codificarse
+    with open(REGLAS_PATH, encoding='utf-8') as f:
+        tabla = json.load(f)
+    graficos = {regla["grafico"] for regla in tabla["reglas"]} | {tabla.get("por_defecto", "No suggestion available")}
+    clases = set(_label_encoder_y().classes_)
+    desconocidos = {g for g in graficos if incremental.ETIQUETAS_MODELO.get(g, g) not in clases}
+    assert not desconocidos
+
+
+def test_filas_guardadas_se_codifican():
+    from datos import conexion
+    try:
+        with conexion():
+            pass
+    except Exception as e:
+        pytest.skip(f"Sin bbdd: {e}")
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        incremental.comprobar(BASE_DIR)
@@ -0,0 +1,21 @@
+import recomendador
+from codec import cargar_codec
+from reglas_numpy import compilar, todas_las_combinaciones
+from tabla_reglas import cargar_reglas
+
+
+def test_coincide_con_recommend_rule_en_todas_las_combinaciones():
+    codec = cargar_codec()
+    reglas = compilar(cargar_reglas(), codec)
+    # Con un código más por columna para un valor que no está en los encoders (None)
+    codigos = todas_las_combinaciones(codec, desconocido=True)
+    obtenido = reglas.recomendar(codigos)
+
+    valores = [list(codec.clases[col]) + [None] for col in codec.columnas]
+    diferencias = []
+    for fila, obtenida in zip(codigos, obtenido):
+        data = {col: valores[j][c] for j, (col, c) in enumerate(zip(codec.columnas, fila))}
+        esperado = recomendador.recommend_rule(data)
+        if esperado != obtenida:
+            diferencias.append((data, esperado, obtenida))
+    assert diferencias[:5] == []
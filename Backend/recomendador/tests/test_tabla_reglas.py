@@ -0,0 +1,30 @@
+import recomendador
+from codec import cargar_codec
+from tabla_reglas import TablaReglas, cargar_reglas, verificar_equivalencia
+
+
+def test_coincide_con_recommend_rule_en_todas_las_combinaciones():
+    codec = cargar_codec()
+    # Un valor ausente por campo cubre también las respuestas que no están en los encoders
+    clases = {col: list(codec.clases[col]) + [None] for col in recomendador.REQUIRED_COLUMNS}
+    diferencias = verificar_equivalencia(cargar_reglas(), recomendador.recommend_rule, clases,
+                                         recomendador.REQUIRED_COLUMNS)
+    assert diferencias[:5] == []
+
+
+def test_primera_regla_que_se_cumple():
+    tabla = TablaReglas({
+        "conjuntos": {"pocos": ["1D", "2D"]},
+        "por_defecto": "Nada",
+        "reglas": [
+            {"si": {"n": "$pocos", "tipo": {"excepto": ["Texto"]}}, "grafico": "Barras"},
+            {"si": {"n": "1D"}, "grafico": "Nube"},
+            {"si": {"tipo": "Texto", "orden": "Sí"}, "grafico": "Lista"},
+        ],
+    })
+    assert tabla({"n": "2D", "tipo": "Número"}) == "Barras"
+    assert tabla({"n": "2D"}) == "Barras"  # falta tipo: no es Texto
+    assert tabla({"n": "1D", "tipo": "Texto"}) == "Nube"
+    assert tabla({"n": "3D", "tipo": "Texto", "orden": "Sí"}) == "Lista"
+    assert tabla({"n": "3D", "tipo": "Texto", "orden": ["no hashable"]}) == "Nada"
+    assert tabla({}) == "Nada"
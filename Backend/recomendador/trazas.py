@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import nullcontext
+
+'''Trazas de latencia por etapa del recomendador'''
+
+# Cada etapa (leer respuestas de la bbdd, cargar artefactos, reglas, IA, salida JSON...)
+# se envuelve en un tramo con nombre. Con las trazas activas, al terminar cada petición
+# se escribe en stderr una línea JSON con lo que ha tardado cada etapa, y en el modo
+# --serve se pueden acumular además histogramas por etapa en formato de texto de
+# Prometheus. Desactivadas, tramo() devuelve siempre el mismo contexto vacío y el coste
+# es una llamada a función.
+#
+# Se activan con --trazas / --metricas FICHERO o con RECOMENDADOR_TRAZAS=1.
+
+ACTIVO = os.environ.get("RECOMENDADOR_TRAZAS", "") not in ("", "0")
+METRICAS = False
+
+# Límites (segundos) de los buckets de los histogramas
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+_NULO = nullcontext()
+_local = threading.local()
+_lock = threading.Lock()
+_histogramas = {}  # etapa -> [cuentas por bucket, suma, total]
+_peticiones = {}   # resultado -> total
+
+
+def activar(trazas=True, metricas=False):
+    global ACTIVO, METRICAS
+    ACTIVO = trazas or metricas
+    METRICAS = metricas
+
+
+class _Tramo:
+    __slots__ = ("nombre", "inicio")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registrar(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+
+def tramo(nombre):
+    """
+    Contexto que mide una etapa: with tramo("recommend_AI"): ...
+    """
+    if not ACTIVO:
+        return _NULO
+    return _Tramo(nombre)
+
+
+def registrar(nombre, segundos):
+    etapas = getattr(_local, "etapas", None)
+    if etapas is not None:
+        etapas.append((nombre, segundos))
+    if METRICAS:
+        with _lock:
+            histograma = _histogramas.setdefault(nombre, [[0] * len(BUCKETS), 0.0, 0])
+            for i, limite in enumerate(BUCKETS):
+                if segundos <= limite:
+                    histograma[0][i] += 1
+            histograma[1] += segundos
+            histograma[2] += 1
+
+
+def iniciar_traza():
+    """
+    Empieza a recoger los tramos de una petición en este hilo.
+    """
+    if ACTIVO:
+        _local.etapas = []
+        _local.inicio = time.perf_counter()
+
+
+def terminar_traza(resultado="ok", salida=None, **extra):
+    """
+    Cierra la traza de la petición: la escribe como una línea JSON en salida (stderr por
+    defecto) con los milisegundos de cada etapa sumados por nombre, y cuenta la petición.
+    """
+    if not ACTIVO:
+        return
+    etapas = getattr(_local, "etapas", None)
+    if etapas is None:
+        return
+    total = time.perf_counter() - _local.inicio
+    _local.etapas = None
+    if METRICAS:
+        with _lock:
+            _peticiones[resultado] = _peticiones.get(resultado, 0) + 1
+        registrar("peticion", total)
+    ms = {}
+    for nombre, segundos in etapas:
+        ms[nombre] = ms.get(nombre, 0.0) + segundos * 1000
+    traza = {"traza": "recomendador", "resultado": resultado, "total_ms": round(total * 1000, 3),
+             "etapas_ms": {nombre: round(v, 3) for nombre, v in ms.items()}}
+    traza.update(extra)
+    salida = salida or sys.stderr
+    salida.write(json.dumps(traza) + "\n")
+    salida.flush()
+
+
+def texto_prometheus():
+    """
+    Histogramas por etapa y contador de peticiones en el formato de texto de Prometheus.
+    """
+    lineas = ["# HELP recomendador_etapa_segundos Duración de cada etapa del recomendador",
+              "# TYPE recomendador_etapa_segundos histogram"]
+    with _lock:
+        for etapa, (cuentas, suma, total) in sorted(_histogramas.items()):
+            for limite, cuenta in zip(BUCKETS, cuentas):
+                lineas.append(f'recomendador_etapa_segundos_bucket{{etapa="{etapa}",le="{limite:g}"}} {cuenta}')
+            lineas.append(f'recomendador_etapa_segundos_bucket{{etapa="{etapa}",le="+Inf"}} {total}')
+            lineas.append(f'recomendador_etapa_segundos_sum{{etapa="{etapa}"}} {suma:.9f}')
+            lineas.append(f'recomendador_etapa_segundos_count{{etapa="{etapa}"}} {total}')
+        lineas += ["# HELP recomendador_peticiones_total Peticiones atendidas por resultado",
+                   "# TYPE recomendador_peticiones_total counter"]
+        for resultado, total in sorted(_peticiones.items()):
+            lineas.append(f'recomendador_peticiones_total{{resultado="{resultado}"}} {total}')
+    return "\n".join(lineas) + "\n"
+
+
+class ExportadorMetricas:
+    """
+    Escribe las métricas en un fichero (para el textfile collector de node_exporter)
+    como mucho una vez por intervalo, siempre de forma atómica.
+    """
+
+    def __init__(self, path, intervalo=1.0):
+        self.path = path
+        self.intervalo = intervalo
+        self._ultima = 0.0
+
+    def exportar(self, forzar=False):
+        ahora = time.monotonic()
+        if not forzar and ahora - self._ultima < self.intervalo:
+            return
+        self._ultima = ahora
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(texto_prometheus())
+        os.replace(tmp, self.path)
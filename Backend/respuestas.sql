@@ -14,6 +14,8 @@ CREATE TABLE respuestas
   proposito character varying(100),
   dataset_size character varying(50),
   contexto character varying(100),
+  -- JSON con las recomendaciones {"rule_based": ..., "ai_based": ...}
+  grafico_recomendado character varying(400),
   CONSTRAINT respuestas_pkey PRIMARY KEY (id)
 )
 WITH (
@@ -2,6 +2,9 @@ const express = require('express');
 const bodyParser = require('body-parser');
 const { Pool } = require('pg');
 const { spawn } = require('child_process');
+const path = require('path');
+// Mismas variables DB_* que usa el recomendador Python (datos.py lee el mismo .env)
+require('dotenv').config({ path: path.join(__dirname, '.env') });
 const cors = require('cors');
 
 const app = express();
@@ -13,14 +16,71 @@ app.use(cors({ origin: 'http://localhost:3000' }));
 
 // Configuración de conexión a PostgreSQL
 const pool = new Pool({
-  user: 'ipizarro',
-  host: 'localhost',
-  database: 'vizquest', 
-  password: 'ipizarro', 
-  port: 5432,
+  user: process.env.DB_USER || 'ipizarro',
+  host: process.env.DB_HOST || 'localhost',
+  database: process.env.DB_NAME || 'vizquest',
+  password: process.env.DB_PASSWORD || 'ipizarro',
+  port: Number(process.env.DB_PORT || 5432),
   options: '-c client_encoding=UTF8' // Asegura que se use UTF-8
 });
 
+// Recomendador Python persistente: carga modelo y encoders una vez y atiende
+// peticiones JSON por stdin (una por línea), respondiendo en el mismo orden por stdout
+let recomendador = null;
+let pendientes = [];
+
+function arrancarRecomendador() {
+  recomendador = spawn('python', ['./recomendador/recomendador.py', '--serve']);
+  let buffer = '';
+
+  recomendador.stdout.on('data', (data) => {
+    buffer += data.toString();
+    let salto;
+    while ((salto = buffer.indexOf('\n')) >= 0) {
+      const linea = buffer.slice(0, salto);
+      buffer = buffer.slice(salto + 1);
+      const pendiente = pendientes.shift();
+      if (!pendiente) continue;
+      try {
+        pendiente.resolve(JSON.parse(linea));
+      } catch (error) {
+        pendiente.reject(error);
+      }
+    }
+  });
+
+  // Por stderr llegan también las trazas y tiempos que escribe trazas.py a propósito, así
+  // que se registran como información; los errores de cada petición vuelven en {error}
+  recomendador.stderr.on('data', (data) => {
+    console.log(`[recomendador.py] ${data.toString().trimEnd()}`);
+  });
+
+  // Escribir mientras el proceso se reinicia da EPIPE; sin este manejador Node lanzaría la
+  // excepción y tiraría el servidor. Las peticiones pendientes ya no tendrán respuesta
+  recomendador.stdin.on('error', (error) => {
+    console.error(`No se pudo escribir al recomendador Python: ${error.message}`);
+    pendientes.forEach(({ reject }) => reject(error));
+    pendientes = [];
+  });
+
+  // Si el proceso muere rechazamos lo pendiente y lo volvemos a arrancar
+  recomendador.on('close', (code) => {
+    console.error(`El recomendador Python terminó con código ${code}, reiniciando`);
+    pendientes.forEach(({ reject }) => reject(new Error('El recomendador Python terminó')));
+    pendientes = [];
+    setTimeout(arrancarRecomendador, 1000);
+  });
+}
+
+function pedirRecomendacion(peticion) {
+  return new Promise((resolve, reject) => {
+    pendientes.push({ resolve, reject });
+    recomendador.stdin.write(JSON.stringify(peticion) + '\n');
+  });
+}
+
+arrancarRecomendador();
+
 // API para manejar el formulario
 app.post('/submit-form', async (req, res) => {
   const { tipo_datos,n_dimensiones,proposito,contexto,dataset_size,ordenadas,n_grupos_alto,relacion,obs_grupo } = req.body;
@@ -28,50 +88,64 @@ app.post('/submit-form', async (req, res) => {
 
   try {
 
-    const { tipo_datos, n_dimensiones, proposito, contexto } = req.body;
-
-    // Insertarmos las respuestas en la base de datos
-    const result = await pool.query(
-      `INSERT INTO respuestas (n_dimensiones,tipo_datos,ordenadas,n_grupos_alto,relacion,obs_grupo,proposito,dataset_size,contexto)
-VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9) RETURNING id` ,
-      [n_dimensiones,tipo_datos,ordenadas,n_grupos_alto,relacion,obs_grupo,proposito,dataset_size,contexto]
-    );
-
-    const id = result.rows[0].id; // ID recién creado
-
-    // Llamamos al recomendador Python
-    const pythonProcess = spawn('python', ['./recomendador/recomendador.py', id]);
-
-    let pythonOutput = '';
-    pythonProcess.stdout.on('data', (data) => {
-      pythonOutput += data.toString();
+    // Pasamos las respuestas directamente al proceso Python persistente, que recomienda y
+    // guarda respuestas y recomendaciones en la tabla respuestas con un único INSERT
+    // (así la uso como dataset sintetico para IA)
+    const recomendacion = await pedirRecomendacion({
+      n_dimensiones, tipo_datos, ordenadas, n_grupos_alto, relacion, obs_grupo, proposito, dataset_size, contexto,
+      guardar: true
     });
-
-    pythonProcess.stderr.on('data', (data) => {
-      console.error(`Error en el script Python: ${data}`);
+    if (recomendacion.error) {
+      console.error(`Error en el recomendador Python: ${recomendacion.error}`);
+      return res.status(500).send('Error al ejecutar el recomendador.');
+    }
+    const recommendedGraph = JSON.stringify({
+      rule_based: recomendacion.rule_based,
+      ai_based: recomendacion.ai_based
     });
 
-    pythonProcess.on('close', async (code) => {
-      if (code === 0) {
-        const recommendedGraph = pythonOutput.trim();
-
-        // Actualizo la base de datos con la recomendación del gráfico así lo uso como dataset sintetico para IA
-        await pool.query(
-          `UPDATE respuestas SET grafico_recomendado = $1 WHERE id = $2`,
-          [recommendedGraph, id]
-        );
-
-        res.json({ recommendation: pythonOutput.trim() }); // Enviamos la recomendación al cliente
-      } else {
-        res.status(500).send('Error al ejecutar el recomendador.');
-      }
-    });
+    res.json({ recommendation: recommendedGraph }); // Enviamos la recomendación al cliente
   } catch (error) {
     console.error('Error al manejar el formulario:', error);
     res.status(500).send('Error interno del servidor.');
   }
 });
 
+// Histogramas, rejillas 2D y curvas de densidad de un dataset grande calculados en Python
+// (agregacion.py) para no descargar el CSV entero en el navegador. Se lanza un proceso por
+// petición para no retener al recomendador mientras se recorre el fichero; el dataset se
+// busca solo dentro del directorio de datasets del front y los agregados repetidos salen de
+// la caché en disco
+const DATASETS_DIR = path.join(__dirname, '..', 'questionaire-app', 'public', 'datasets');
+
+app.post('/agregado', (req, res) => {
+  const { dataset, grafico, columnas, regla, nucleo } = req.body;
+  if (!dataset || !grafico || !Array.isArray(columnas) || columnas.length === 0) {
+    return res.status(400).send('Faltan dataset, grafico o columnas.');
+  }
+  // Cada columna como --columnas=NOMBRE para que un nombre que empieza por '-' no se lea como opción
+  const argumentos = ['./recomendador/agregacion.py', `--datasets=${DATASETS_DIR}`, `--grafico=${grafico}`,
+    ...columnas.map((columna) => `--columnas=${columna}`)];
+  if (regla !== undefined) argumentos.push(`--regla=${regla}`);
+  if (nucleo !== undefined) argumentos.push(`--nucleo=${nucleo}`);
+  argumentos.push('--', String(dataset));
+
+  const agregacion = spawn('python', argumentos);
+  let salida = '';
+  agregacion.stdout.on('data', (data) => { salida += data.toString(); });
+  agregacion.stderr.on('data', (data) => { console.error(`agregacion.py: ${data}`); });
+  agregacion.on('close', (code) => {
+    let agregado;
+    try {
+      agregado = JSON.parse(salida);
+    } catch (error) {
+      console.error('Salida no válida de agregacion.py:', error);
+      return res.status(500).send('Error al agregar el dataset.');
+    }
+    res.status(code === 0 ? 200 : 400).json(agregado);
+  });
+});
+
 // Inicia el servidor
 app.listen(PORT, () => {
   console.log(`Servidor corriendo en http://localhost:${PORT}`);